@@ -0,0 +1,307 @@
+"""Reproducible offline benchmarks for Whiplash collections
+
+Builds collections over synthetic (or .npy) datasets on a local storage
+backend or moto, then reports insert throughput, search latency
+percentiles, candidates scanned per query and recall@k against exact brute
+force search. Every run appends one JSON object per configuration to the
+output file, so results can be diffed across commits.
+
+    python benchmarks/benchmark.py --sizes 1000 10000 --dims 128 384 \\
+        --n-planes 4 6 --output bench_results.jsonl
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from contextlib import nullcontext
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from whiplash import Vector, Whiplash  # noqa: E402
+from whiplash.local_storage import MemoryStorage, SQLiteStorage  # noqa: E402
+from whiplash.vector_math import normalize_bulk, score_bulk  # noqa: E402
+
+
+def make_dataset(
+    kind: str, n_vectors: int, n_features: int, n_queries: int, seed: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Generate (data, queries) as float32 matrices, or load data from .npy"""
+    rng = np.random.default_rng(seed)
+    if kind.endswith(".npy"):
+        data = np.load(kind, mmap_mode="r")[:n_vectors].astype(np.float32)
+        queries = data[rng.choice(len(data), n_queries, replace=False)]
+        noise = rng.normal(0, 0.05 * data.std(), queries.shape)
+        return data, (queries + noise).astype(np.float32)
+    if kind == "gaussian":
+        data = rng.standard_normal((n_vectors, n_features))
+        queries = rng.standard_normal((n_queries, n_features))
+        return data.astype(np.float32), queries.astype(np.float32)
+    if kind == "clustered":
+        # Embedding-like data: points scattered around a few hundred centers
+        n_clusters = max(1, min(256, n_vectors // 50))
+        centers = rng.standard_normal((n_clusters, n_features))
+        data = centers[rng.integers(n_clusters, size=n_vectors)]
+        data = data + 0.3 * rng.standard_normal((n_vectors, n_features))
+        queries = centers[rng.integers(n_clusters, size=n_queries)]
+        queries = queries + 0.3 * rng.standard_normal((n_queries, n_features))
+        return data.astype(np.float32), queries.astype(np.float32)
+    raise ValueError(f"Unknown dataset: {kind}")
+
+
+def exact_neighbors(
+    data: np.ndarray, queries: np.ndarray, k: int, metric: str
+) -> list[set[int]]:
+    """Brute force top k row indices for every query"""
+    if metric == "cosine":
+        data = normalize_bulk(data)
+        queries = normalize_bulk(queries)
+        metric = "dot"
+    neighbors = []
+    for query in queries:
+        scores = score_bulk(query, data, metric)
+        order = np.argsort(scores if metric == "l2" else -scores)
+        neighbors.append(set(order[:k].tolist()))
+    return neighbors
+
+
+def make_storage(backend: str, tmp_dir: str, run_id: str):
+    if backend == "memory":
+        return MemoryStorage(), nullcontext()
+    if backend == "sqlite":
+        path = os.path.join(tmp_dir, f"{run_id}.db")
+        if os.path.exists(path):
+            os.remove(path)
+        return SQLiteStorage(path), nullcontext()
+    if backend == "moto":
+        from moto import mock_dynamodb
+
+        os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+        return None, mock_dynamodb()
+    raise ValueError(f"Unknown backend: {backend}")
+
+
+def run_benchmark(
+    dataset: str = "clustered",
+    n_vectors: int = 10000,
+    n_features: int = 128,
+    n_planes: int = 6,
+    bit_start: int = 8,
+    bit_scale_factor: float = 2,
+    metric: str = "cosine",
+    int_ids: bool = False,
+    precision: str = "float32",
+    rerank: int = 0,
+    sketch_bits: int = 0,
+    pq_subvectors: int = 0,
+    n_probes: int = 0,
+    max_candidates: int | None = None,
+    k: int = 10,
+    n_queries: int = 100,
+    batch_size: int = 500,
+    backend: str = "memory",
+    seed: int = 0,
+    tmp_dir: str = ".",
+) -> dict:
+    """Build one collection and measure it, returning a flat result dict"""
+    # Uniform planes are drawn from the global generator
+    np.random.seed(seed)
+    data, queries = make_dataset(dataset, n_vectors, n_features, n_queries, seed)
+    n_vectors, n_features = data.shape
+    ids = [str(i) for i in range(n_vectors)]
+
+    run_id = f"bench_{n_vectors}_{n_features}_{n_planes}_{bit_start}_{seed}"
+    storage, context = make_storage(backend, tmp_dir, run_id)
+    with context:
+        whiplash = Whiplash("us-east-1", "bench", storage=storage)
+        whiplash.setup()
+        collection = whiplash.create_collection(
+            run_id,
+            n_features=n_features,
+            n_planes=n_planes,
+            bit_start=bit_start,
+            bit_scale_factor=bit_scale_factor,
+            metric=metric,
+            int_ids=int_ids,
+            precision=precision,
+            keep_full_precision=rerank > 0,
+            sketch_bits=sketch_bits,
+            index_type="pq" if pq_subvectors else "lsh",
+            pq_subvectors=pq_subvectors,
+            training_vectors=data[:10000] if pq_subvectors else None,
+        )
+
+        start = time.perf_counter()
+        for i in range(0, n_vectors, batch_size):
+            collection.insert_many(
+                [
+                    Vector(ids[j], data[j])
+                    for j in range(i, min(i + batch_size, n_vectors))
+                ]
+            )
+        insert_seconds = time.perf_counter() - start
+
+        truth = exact_neighbors(data, queries, k, metric)
+        latencies = []
+        candidates = []
+        recalls = []
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            results, stats = collection.search_with_stats(
+                query,
+                k=k,
+                n_probes=n_probes,
+                max_candidates=max_candidates,
+                rerank=rerank,
+            )
+            latencies.append(time.perf_counter() - start)
+            candidates.append(stats.scored)
+            found = {int(result.id) for result in results}
+            recalls.append(len(found & expected) / len(expected))
+
+    latency_ms = np.array(latencies) * 1000
+    return {
+        "dataset": dataset,
+        "backend": backend,
+        "n_vectors": n_vectors,
+        "n_features": n_features,
+        "n_planes": n_planes,
+        "bit_start": bit_start,
+        "bit_scale_factor": bit_scale_factor,
+        "metric": metric,
+        "int_ids": int_ids,
+        "precision": precision,
+        "rerank": rerank,
+        "sketch_bits": sketch_bits,
+        "pq_subvectors": pq_subvectors,
+        "n_probes": n_probes,
+        "max_candidates": max_candidates,
+        "k": k,
+        "n_queries": len(queries),
+        "seed": seed,
+        "insert_per_second": n_vectors / insert_seconds,
+        "search_p50_ms": float(np.percentile(latency_ms, 50)),
+        "search_p95_ms": float(np.percentile(latency_ms, 95)),
+        "search_p99_ms": float(np.percentile(latency_ms, 99)),
+        "candidates_mean": float(np.mean(candidates)),
+        "candidates_p95": float(np.percentile(candidates, 95)),
+        f"recall_at_{k}": float(np.mean(recalls)),
+    }
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--dataset", default="clustered", help="gaussian, clustered or a .npy path"
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000])
+    parser.add_argument("--dims", type=int, nargs="+", default=[128])
+    parser.add_argument("--n-planes", type=int, nargs="+", default=[6])
+    parser.add_argument("--bit-start", type=int, nargs="+", default=[8])
+    parser.add_argument("--bit-scale-factor", type=float, nargs="+", default=[2])
+    parser.add_argument("--metric", default="cosine", choices=["cosine", "dot", "l2"])
+    parser.add_argument(
+        "--int-ids", action="store_true", help="store buckets as packed postings"
+    )
+    parser.add_argument(
+        "--precision", default="float32", choices=["float32", "float16", "int8"]
+    )
+    parser.add_argument(
+        "--rerank", type=int, default=0, help="rescore the top N at full precision"
+    )
+    parser.add_argument(
+        "--sketch-bits", type=int, default=0, help="inline bucket sketch bits"
+    )
+    parser.add_argument(
+        "--pq-subvectors", type=int, default=0, help="use a pq index (lsh)"
+    )
+    parser.add_argument("--n-probes", type=int, nargs="+", default=[0])
+    parser.add_argument(
+        "--max-candidates", type=int, help="candidate budget per search (no limit)"
+    )
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument(
+        "--backend", default="memory", choices=["memory", "sqlite", "moto"]
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tmp-dir", default=".")
+    parser.add_argument("--output", default="bench_results.jsonl")
+    args = parser.parse_args()
+
+    env = environment()
+    grid = itertools.product(
+        args.sizes,
+        args.dims,
+        args.n_planes,
+        args.bit_start,
+        args.bit_scale_factor,
+        args.n_probes,
+    )
+    with open(args.output, "a") as output:
+        for n_vectors, n_features, n_planes, bit_start, scale, n_probes in grid:
+            result = run_benchmark(
+                dataset=args.dataset,
+                n_vectors=n_vectors,
+                n_features=n_features,
+                n_planes=n_planes,
+                bit_start=bit_start,
+                bit_scale_factor=scale,
+                metric=args.metric,
+                int_ids=args.int_ids,
+                precision=args.precision,
+                rerank=args.rerank,
+                sketch_bits=args.sketch_bits,
+                pq_subvectors=args.pq_subvectors,
+                n_probes=n_probes,
+                max_candidates=args.max_candidates,
+                k=args.k,
+                n_queries=args.queries,
+                batch_size=args.batch_size,
+                backend=args.backend,
+                seed=args.seed,
+                tmp_dir=args.tmp_dir,
+            )
+            result.update(env)
+            output.write(json.dumps(result) + "\n")
+            print(
+                f"n={n_vectors} dim={n_features} planes={n_planes} "
+                f"bits={bit_start}+{scale} probes={n_probes} | "
+                f"insert {result['insert_per_second']:.0f}/s | "
+                f"search p50 {result['search_p50_ms']:.2f}ms "
+                f"p95 {result['search_p95_ms']:.2f}ms "
+                f"p99 {result['search_p99_ms']:.2f}ms | "
+                f"candidates {result['candidates_mean']:.0f} | "
+                f"recall@{args.k} {result[f'recall_at_{args.k}']:.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
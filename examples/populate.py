@@ -24,3 +24,9 @@ print(f"Average Insert time: {insert_time}")
 
 # Inserted 100 vectors
 # Average Insert time: 0.40521308183670046
+
+# Bulk load a file in chunks, resuming from its checkpoint if interrupted
+np.save("vectors.npy", np.random.rand(10000, 256).astype(np.float32))
+start = time.time()
+imported = collection.import_file("vectors.npy")
+print(f"Imported {imported} vectors in {time.time() - start} seconds")
@@ -0,0 +1,40 @@
+import pytest
+from moto import mock_dynamodb
+
+from whiplash import Whiplash
+from whiplash.local_storage import MemoryStorage
+from whiplash.storage import DynamoStorage
+
+
+@pytest.fixture(params=["memory", "dynamo"])
+def storage(request):
+    """Every storage backend, DynamoDB mocked by moto
+
+    Pin a test to one backend with
+    @pytest.mark.parametrize("storage", ["dynamo"], indirect=True).
+    """
+    if request.param == "memory":
+        yield MemoryStorage()
+        return
+    with mock_dynamodb():
+        yield DynamoStorage("us-east-1")
+
+
+@pytest.fixture
+def whiplash(storage):
+    whiplash = Whiplash("us-east-1", "dev", storage=storage)
+    whiplash.setup()
+    return whiplash
+
+
+@pytest.fixture
+def create_collection(whiplash):
+    """Create small collections, 16 features with 2 and 3 bit planes by default"""
+
+    def create(n_features=16, name="test_collection", **kwargs):
+        kwargs.setdefault("n_planes", 2)
+        kwargs.setdefault("bit_start", 2)
+        kwargs.setdefault("bit_scale_factor", 1)
+        return whiplash.create_collection(name, n_features, **kwargs)
+
+    return create
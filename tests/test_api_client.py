@@ -0,0 +1,270 @@
+import asyncio
+import json
+
+import pytest
+import requests
+from urllib3.exceptions import ConnectTimeoutError, ReadTimeoutError
+
+from whiplash.api.client import (
+    BadRequestError,
+    Collection,
+    NotFoundError,
+    ServerError,
+    ThrottledError,
+    Vector,
+    Whiplash,
+    WhiplashConnectionError,
+    WhiplashTimeoutError,
+)
+from whiplash.api.client.aio import AsyncWhiplash
+from whiplash.api.encoding import BASE64_CONTENT_TYPE, BINARY_CONTENT_TYPE
+from whiplash.encoding import decode_batch, encode_vector
+
+
+class FakeResponse:
+    def __init__(self, data, status_code=200):
+        self.data = data
+        self.status_code = status_code
+
+    def json(self):
+        return self.data
+
+
+class RequestLog(list):
+    # Body and status returned by the fake API for every request
+    response = {}
+    status_code = 200
+
+
+@pytest.fixture
+def requests_log(monkeypatch):
+    log = RequestLog()
+
+    def request(self, method, url, headers=None, json=None, data=None, timeout=None):
+        log.append(
+            {
+                "url": url,
+                "headers": headers,
+                "json": json,
+                "data": data,
+                "timeout": timeout,
+                "session": self,
+            }
+        )
+        return FakeResponse(log.response, log.status_code)
+
+    monkeypatch.setattr(requests.Session, "request", request)
+    return log
+
+
+def make_collection(content_type="application/json"):
+    whiplash = Whiplash("https://example.com/dev", "key", content_type=content_type)
+    return Collection(whiplash.api, "test", whiplash.project_name)
+
+
+def test_json_payloads(requests_log):
+    collection = make_collection()
+    collection.insert_batch([Vector("a", [1.0, 2.0])])
+
+    request = requests_log[0]
+    assert request["headers"]["Content-Type"] == "application/json"
+    assert "Accept" not in request["headers"]
+    assert request["json"] == {"vectors": [{"id": "a", "vector": [1.0, 2.0]}]}
+
+
+def test_base64_payloads(requests_log):
+    collection = make_collection(BASE64_CONTENT_TYPE)
+    requests_log.response = [
+        {"id": "a", "vector": encode_vector([1.0, 2.0]), "dist": 1.0}
+    ]
+
+    results = collection.search([1.0, 2.0], limit=1)
+
+    request = requests_log[0]
+    assert request["headers"]["Content-Type"] == BASE64_CONTENT_TYPE
+    assert request["headers"]["Accept"] == BASE64_CONTENT_TYPE
+    assert request["json"]["query"] == encode_vector([1.0, 2.0])
+    assert results[0].vector == [1.0, 2.0]
+
+
+def test_binary_batch_payload(requests_log):
+    collection = make_collection(BINARY_CONTENT_TYPE)
+    collection.insert_batch([Vector("a", [1.0, 2.0]), Vector("b", [3.0, 4.0])])
+
+    request = requests_log[0]
+    assert request["headers"]["Content-Type"] == BINARY_CONTENT_TYPE
+    assert decode_batch(request["data"]) == (["a", "b"], [[1.0, 2.0], [3.0, 4.0]])
+
+    # Single inserts fall back to base64 JSON
+    collection.insert(Vector("c", [5.0, 6.0]))
+    assert requests_log[1]["headers"]["Content-Type"] == BASE64_CONTENT_TYPE
+    assert json.dumps(requests_log[1]["json"])
+
+
+def test_unknown_content_type():
+    with pytest.raises(ValueError):
+        Whiplash("https://example.com/dev", "key", content_type="text/csv")
+
+
+def test_search_batch(requests_log):
+    collection = make_collection()
+    requests_log.response = [[{"id": "a", "dist": 1.0}], []]
+
+    results = collection.search_batch([[1.0, 2.0], [3.0, 4.0]], limit=1, n_probes=2)
+
+    request = requests_log[0]
+    assert request["url"].endswith("/collections/test/search/batch")
+    assert request["json"] == {
+        "queries": [[1.0, 2.0], [3.0, 4.0]],
+        "limit": 1,
+        "include_vectors": False,
+        "n_probes": 2,
+    }
+    assert [[result.id for result in query] for query in results] == [["a"], []]
+
+
+def test_pooled_session(requests_log):
+    whiplash = Whiplash("https://example.com/dev", "key", pool_size=4, max_retries=2)
+    whiplash.get_collections()
+    whiplash.get_collections()
+
+    assert requests_log[0]["session"] is requests_log[1]["session"]
+    assert requests_log[0]["timeout"] == 30
+    adapter = whiplash.api.session.get_adapter("https://example.com")
+    assert adapter._pool_maxsize == 4
+    assert adapter.max_retries.total == 2
+    assert 429 in adapter.max_retries.status_forcelist
+
+    whiplash.close()
+    assert whiplash.api._session is None
+
+
+def test_typed_errors(requests_log):
+    whiplash = Whiplash("https://example.com/dev", "key")
+    collection = make_collection()
+
+    requests_log.status_code = 404
+    requests_log.response = {"message": "Collection not found"}
+    assert whiplash.get_collection("missing") is None
+    with pytest.raises(NotFoundError) as error:
+        collection.get_item("a")
+    assert error.value.status_code == 404
+    assert "Collection not found" in str(error.value)
+    assert not error.value.retryable
+
+    requests_log.status_code = 429
+    with pytest.raises(ThrottledError) as error:
+        collection.search([1.0, 2.0])
+    assert error.value.retryable
+
+    requests_log.status_code = 503
+    with pytest.raises(ServerError):
+        collection.insert(Vector("a", [1.0, 2.0]))
+
+
+def test_connection_error(monkeypatch):
+    def request(self, *args, **kwargs):
+        raise requests.exceptions.ConnectTimeout("timed out")
+
+    monkeypatch.setattr(requests.Session, "request", request)
+    with pytest.raises(WhiplashConnectionError):
+        make_collection().search([1.0, 2.0])
+
+    def read_timeout(self, *args, **kwargs):
+        raise requests.exceptions.ReadTimeout("timed out")
+
+    monkeypatch.setattr(requests.Session, "request", read_timeout)
+    with pytest.raises(WhiplashTimeoutError):
+        make_collection().insert(Vector("a", [1.0, 2.0]))
+
+
+def test_posts_only_retried_when_unprocessed():
+    whiplash = Whiplash("https://example.com/dev", "key")
+    retry = whiplash.api.session.get_adapter("https://example.com").max_retries
+
+    assert retry.is_retry("GET", 503)
+    assert retry.is_retry("POST", 429)
+    # The POST may have taken effect before the error
+    assert not retry.is_retry("POST", 503)
+    with pytest.raises(ReadTimeoutError):
+        retry.increment("POST", "/", error=ReadTimeoutError(None, "/", "timed out"))
+    retried = retry.increment("POST", "/", error=ConnectTimeoutError("timed out"))
+    assert retried.total == retry.total - 1
+
+
+def test_async_client(requests_log):
+    requests_log.response = [{"id": "a", "dist": 1.0}]
+
+    async def run():
+        async with AsyncWhiplash("https://example.com/dev", "key") as whiplash:
+            collection = await whiplash.get_collection("test")
+            return await asyncio.gather(
+                *(collection.search([1.0, float(i)]) for i in range(4))
+            )
+
+    results = asyncio.run(run())
+    assert [result[0].id for result in results] == ["a"] * 4
+    assert len(requests_log) == 5
+    assert len({id(request["session"]) for request in requests_log}) == 1
+
+
+def test_writer_batches(requests_log):
+    collection = make_collection()
+    with collection.writer(batch_size=4, concurrency=2) as writer:
+        writer.add_many(Vector(str(i), [float(i), 1.0]) for i in range(10))
+        writer.add(Vector("last", [0.0, 0.0]))
+
+    assert writer.inserted == 11
+    sizes = sorted(len(request["json"]["vectors"]) for request in requests_log)
+    assert sizes == [3, 4, 4]
+    ids = {v["id"] for request in requests_log for v in request["json"]["vectors"]}
+    assert len(ids) == 11
+
+
+def test_writer_payload_limit(requests_log):
+    collection = make_collection(BINARY_CONTENT_TYPE)
+    with collection.writer(max_payload_bytes=200) as writer:
+        writer.add_many(Vector(str(i), [1.0] * 10) for i in range(10))
+
+    batches = [decode_batch(request["data"])[0] for request in requests_log]
+    assert all(len(request["data"]) <= 200 for request in requests_log)
+    assert sorted(i for batch in batches for i in batch) == sorted(map(str, range(10)))
+
+
+def test_writer_retries_and_splits(monkeypatch):
+    calls = []
+
+    def request(self, method, url, headers=None, json=None, data=None, timeout=None):
+        calls.append(len(json["vectors"]))
+        if len(calls) == 1:
+            return FakeResponse({"message": "Service Unavailable"}, 503)
+        if len(json["vectors"]) > 2:
+            return FakeResponse({"message": "Request Too Long"}, 413)
+        return FakeResponse({"message": "success"})
+
+    monkeypatch.setattr(requests.Session, "request", request)
+    with make_collection().writer(batch_size=8, backoff_factor=0) as writer:
+        writer.add_many(Vector(str(i), [1.0, 2.0]) for i in range(8))
+
+    assert writer.inserted == 8
+    assert calls == [8, 8, 4, 2, 2, 4, 2, 2]
+
+
+def test_writer_leaves_throttling_to_the_session(requests_log):
+    requests_log.status_code = 429
+    writer = make_collection().writer(backoff_factor=0)
+    with pytest.raises(ThrottledError):
+        with writer:
+            writer.add(Vector("a", [1.0, 2.0]))
+    assert len(requests_log) == 1
+
+
+def test_writer_reports_failed_vectors(requests_log):
+    requests_log.status_code = 400
+    requests_log.response = {"message": "'id' required"}
+    writer = make_collection().writer(batch_size=2)
+    with pytest.raises(BadRequestError):
+        with writer:
+            writer.add_many(Vector(str(i), [1.0, 2.0]) for i in range(3))
+    assert len(requests_log) == 2
+    assert sorted(vector.id for vector in writer.failed) == ["0", "1", "2"]
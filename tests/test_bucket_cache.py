@@ -0,0 +1,72 @@
+from whiplash.bucket_cache import BucketCache, bucket_size
+
+
+def make_bucket(key, n_ids):
+    return {"id": key, "ids": {f"{key}_{i}" for i in range(n_ids)}}
+
+
+def test_bucket_cache_hits_and_misses():
+    cache = BucketCache(max_bytes=10_000, ttl=None)
+    cache.put_many({"A": make_bucket("A", 3)})
+
+    found, missing = cache.get_many(["A", "B"])
+
+    assert list(found) == ["A"]
+    assert missing == ["B"]
+    stats = cache.stats()
+    assert stats.hits == 1
+    assert stats.misses == 1
+    assert stats.hit_rate == 0.5
+    assert stats.size_bytes == bucket_size(make_bucket("A", 3))
+
+
+def test_bucket_cache_evicts_least_recently_used():
+    bucket = make_bucket("A", 10)
+    cache = BucketCache(max_bytes=bucket_size(bucket) * 2, ttl=None)
+    cache.put_many({"A": make_bucket("A", 10), "B": make_bucket("B", 10)})
+
+    # Touch A so B is the least recently used
+    cache.get_many(["A"])
+    cache.put_many({"C": make_bucket("C", 10)})
+
+    found, missing = cache.get_many(["A", "B", "C"])
+    assert set(found) == {"A", "C"}
+    assert missing == ["B"]
+    assert cache.stats().evictions == 1
+    assert cache.stats().size_bytes <= cache.max_bytes
+
+
+def test_bucket_cache_staleness_window():
+    cache = BucketCache(max_bytes=10_000, ttl=-1)
+    cache.put_many({"A": make_bucket("A", 1)})
+
+    _, missing = cache.get_many(["A"])
+
+    assert missing == ["A"]
+    assert len(cache) == 0
+
+
+def test_bucket_cache_invalidate():
+    cache = BucketCache(max_bytes=10_000, ttl=None)
+    cache.put_many({"A": make_bucket("A", 1), "B": make_bucket("B", 1)})
+
+    cache.invalidate(["A"])
+    assert cache.get_many(["A", "B"])[1] == ["A"]
+
+    cache.invalidate()
+    assert len(cache) == 0
+    assert cache.stats().size_bytes == 0
+
+
+def test_bucket_cache_skips_items_invalidated_while_read():
+    cache = BucketCache(max_bytes=10_000, ttl=None)
+    generation = cache.generation
+    # A write invalidates A while a search is still reading A and B
+    cache.invalidate(["A"])
+    cache.put_many(
+        {"A": make_bucket("A", 1), "B": make_bucket("B", 1)}, since=generation
+    )
+    assert cache.get_many(["A", "B"])[1] == ["A"]
+
+    cache.put_many({"A": make_bucket("A", 2)}, since=cache.generation)
+    assert cache.get_many(["A"])[1] == []
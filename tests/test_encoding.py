@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from whiplash.api.encoding import media_type
+from whiplash.encoding import (
+    decode_batch,
+    decode_batch_bytes,
+    decode_vector,
+    decode_vector_bytes,
+    encode_batch,
+    encode_vector,
+)
+
+
+def test_vector_round_trip():
+    values = [0.5, -1.25, 3.0]
+    encoded = encode_vector(values)
+
+    assert isinstance(encoded, str)
+    assert decode_vector(encoded) == values
+    assert encode_vector(np.array(values, dtype=np.float64)) == encoded
+    assert np.frombuffer(decode_vector_bytes(encoded), dtype="<f4").tolist() == values
+
+
+def test_vector_is_smaller_than_json():
+    values = np.linspace(-1, 1, 384).tolist()
+    assert len(encode_vector(values)) < len(str(values)) / 3
+
+
+def test_invalid_vector():
+    with pytest.raises(ValueError):
+        decode_vector("not base64!")
+    with pytest.raises(ValueError):
+        decode_vector("AAA=")
+
+
+def test_batch_round_trip():
+    ids = ["a", "ünïcode", "c"]
+    vectors = [[1.0, 2.0], [3.0, 4.0], [5.0, 6.0]]
+    data = encode_batch(ids, vectors)
+
+    assert decode_batch(data) == (ids, vectors)
+    decoded_ids, n_features, raw = decode_batch_bytes(data)
+    assert n_features == 2
+    assert np.frombuffer(raw, dtype="<f4").reshape(3, 2).tolist() == vectors
+
+
+def test_invalid_batch():
+    data = encode_batch(["a", "b"], [[1.0, 2.0], [3.0, 4.0]])
+    with pytest.raises(ValueError):
+        decode_batch(data[:-4])
+    with pytest.raises(ValueError):
+        decode_batch(b"XXXX" + data[4:])
+    with pytest.raises(ValueError):
+        decode_batch(data[:14])
+    with pytest.raises(ValueError):
+        encode_batch(["a", "b"], [[1.0, 2.0], [3.0]])
+
+
+def test_media_type():
+    assert media_type(None) == "application/json"
+    assert media_type("Application/JSON; charset=utf-8") == "application/json"
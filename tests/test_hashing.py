@@ -1,7 +1,8 @@
 import numpy as np
 import pytest
 
-from whiplash.hashing import vector_plane_hash
+from whiplash.collection_config import CollectionConfig
+from whiplash.hashing import probe_flips, vector_plane_hash
 
 np.random.seed(42)
 
@@ -43,3 +44,36 @@ def test_vector_plane_hash_with_empty_input():
     hash_code_empty = np.array([], dtype=np.uint8)
     with pytest.raises(ValueError):
         vector_plane_hash(hash_code_empty, np.random.rand(10))
+
+
+def test_collection_config_hash_vectors_matches_single():
+    config = CollectionConfig("test", "us-east-1", "dev", "whiplash", 16, 4, 8, 20)
+    config.create_uniform_planes()
+    vectors = np.random.randn(50, 16)
+    keys = config.hash_vectors(vectors)
+
+    assert keys.shape == (50, 4)
+    for vector, row in zip(vectors, keys):
+        assert row.tolist() == [
+            vector_plane_hash(vector, plane) for plane in config.uniform_planes.values()
+        ]
+
+
+def test_probe_flips_orders_by_projection_magnitude():
+    magnitudes = np.array([0.5, 0.1, 0.3, 2.0])
+    assert probe_flips(magnitudes, 6) == [(1,), (2,), (1, 2), (0,), (1, 0), (2, 0)]
+    assert probe_flips(magnitudes, 0) == []
+
+
+def test_collection_config_probe_keys():
+    config = CollectionConfig("test", "us-east-1", "dev", "whiplash", 16, 3, 6, 2)
+    config.create_uniform_planes()
+    vector = np.random.randn(16)
+
+    keys = config.probe_keys(vector, n_probes=4)
+
+    base_keys = config.hash_vectors(vector)[0].tolist()
+    assert [plane_keys[0] for plane_keys in keys] == base_keys
+    for plane_keys in keys:
+        assert len(plane_keys) == 5
+        assert len(set(plane_keys)) == 5
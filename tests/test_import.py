@@ -0,0 +1,87 @@
+import json
+
+import numpy as np
+import pytest
+
+from whiplash.importer import read_chunks
+
+
+def test_import_npy(create_collection, tmp_path):
+    vectors = np.random.randn(25, 8).astype(np.float32)
+    path = str(tmp_path / "vectors.npy")
+    np.save(path, vectors)
+    collection = create_collection(8)
+
+    assert collection.import_file(path, chunk_size=10) == 25
+    assert collection.search(vectors[17], k=1)[0].id == "17"
+    assert not (tmp_path / "vectors.npy.whiplash-checkpoint").exists()
+
+
+def test_import_npz_in_chunks(create_collection, tmp_path):
+    vectors = np.random.randn(23, 8)
+    ids = np.array([f"v{i}" for i in range(23)])
+    path = str(tmp_path / "vectors.npz")
+    np.savez_compressed(path, ids=ids, vectors=vectors)
+
+    chunks = list(read_chunks(path, 10, start=5))
+    assert [len(chunk_ids) for chunk_ids, _ in chunks] == [10, 8]
+    assert chunks[0][0][0] == "v5"
+    assert np.allclose(chunks[1][1], vectors[15:], atol=1e-6)
+
+    collection = create_collection(8, int_ids=True)
+    assert collection.import_file(path) == 23
+    assert collection.search(vectors[4], k=1)[0].id == "v4"
+
+
+def test_import_jsonl_resumes(create_collection, tmp_path, monkeypatch):
+    vectors = np.random.randn(30, 8).astype(np.float32)
+    path = tmp_path / "vectors.jsonl"
+    path.write_text(
+        "\n".join(
+            json.dumps({"key": f"k{i}", "embedding": row.tolist()})
+            for i, row in enumerate(vectors)
+        )
+    )
+    collection = create_collection(8)
+    insert_many = collection.insert_many
+    inserted = []
+
+    def crash_on_third_chunk(batch):
+        if len(inserted) == 2:
+            raise RuntimeError("crash")
+        inserted.append([vector.id for vector in batch])
+        insert_many(batch)
+
+    monkeypatch.setattr(collection, "insert_many", crash_on_third_chunk)
+    options = {"id_column": "key", "vector_column": "embedding", "chunk_size": 8}
+    with pytest.raises(RuntimeError):
+        collection.import_file(str(path), **options)
+    checkpoint = json.loads(
+        (tmp_path / "vectors.jsonl.whiplash-checkpoint").read_text()
+    )
+    assert checkpoint["rows"] == 16
+
+    monkeypatch.setattr(collection, "insert_many", insert_many)
+    assert collection.import_file(str(path), **options) == 14
+    assert collection.get_item("k15").id == "k15"
+    assert collection.search(vectors[29], k=1)[0].id == "k29"
+
+
+def test_import_parquet(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    parquet = pytest.importorskip("pyarrow.parquet")
+    vectors = np.random.randn(12, 8).astype(np.float32)
+    table = pa.table({"id": [f"p{i}" for i in range(12)], "vector": vectors.tolist()})
+    path = str(tmp_path / "vectors.parquet")
+    parquet.write_table(table, path)
+
+    chunks = list(read_chunks(path, 5, start=3))
+    assert chunks[0][0][0] == "p3"
+    assert np.allclose(np.concatenate([m for _, m in chunks]), vectors[3:])
+
+
+def test_import_bad_files(tmp_path):
+    with pytest.raises(ValueError):
+        read_chunks(str(tmp_path / "vectors.csv"))
+    with pytest.raises(ValueError):
+        read_chunks(str(tmp_path / "vectors.npy"), id_column="id")
@@ -0,0 +1,64 @@
+import numpy as np
+from moto import mock_dynamodb
+
+from whiplash import Vector
+from whiplash.whiplash import Whiplash
+
+
+def create_random_vector(n_features, id="test_id"):
+    return Vector(id=id, vector=np.random.rand(n_features))
+
+
+def create_collection(n_features, n_planes):
+    whiplash = Whiplash("us-west-1", "dev")
+    whiplash.setup()
+    return whiplash.create_collection(
+        "test_collection",
+        n_features=n_features,
+        n_planes=n_planes,
+        bit_start=8,
+        bit_scale_factor=2,
+    )
+
+
+@mock_dynamodb
+def test_insert_many():
+    n_features = 10
+    n_planes = 3
+    collection = create_collection(n_features, n_planes)
+
+    # Insert more vectors than fit in a single batch write
+    vectors = [create_random_vector(n_features, str(i)) for i in range(60)]
+    collection.insert_many(vectors)
+
+    ids = [vector.id for vector in vectors]
+    bulk_items = collection.get_bulk_items(ids)
+    assert len(bulk_items) == len(vectors)
+
+    # Every vector should be findable through its own buckets
+    for vector in vectors[:5]:
+        result = collection.search(vector.vector, k=5)
+        assert any(item.id == vector.id for item in result)
+
+
+@mock_dynamodb
+def test_insert_many_coalesces_buckets():
+    n_features = 10
+    n_planes = 3
+    collection = create_collection(n_features, n_planes)
+
+    # Identical vectors share every bucket
+    vector = np.random.rand(n_features)
+    vectors = [Vector(str(i), vector) for i in range(5)]
+    collection.insert_many(vectors)
+
+    buckets = collection.bucket_table.dump()
+    assert len(buckets) <= n_planes
+    assert all(bucket["ids"] == {str(i) for i in range(5)} for bucket in buckets)
+
+
+@mock_dynamodb
+def test_insert_many_empty():
+    collection = create_collection(10, 3)
+    collection.insert_many([])
+    assert collection.vector_table.dump() == []
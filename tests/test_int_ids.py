@@ -0,0 +1,146 @@
+import numpy as np
+import pytest
+
+from whiplash import Vector
+from whiplash import collection as collection_module
+from whiplash.postings import (
+    decode_postings,
+    encode_postings,
+    rank_postings,
+    union_postings,
+)
+
+
+def test_postings_round_trip():
+    chunks = [encode_postings([3, 1, 2]), encode_postings([7])]
+    assert decode_postings(chunks).tolist() == [3, 1, 2, 7]
+    assert decode_postings([]).tolist() == []
+
+
+def test_union_and_rank_postings():
+    buckets = [
+        {"id": "A", "postings": [encode_postings([1, 2])]},
+        {"id": "B", "postings": [encode_postings([2, 3])]},
+        {"id": "C", "postings": [encode_postings([3]), encode_postings([4])]},
+        {"id": "D"},
+    ]
+    assert union_postings(buckets).tolist() == [1, 2, 3, 4]
+    ranked = rank_postings(buckets, {"A": 4, "B": 8}).tolist()
+    assert ranked[:3] == [2, 3, 1]
+    assert ranked[3] == 4
+
+
+def test_insert_assigns_dense_internal_ids(create_collection):
+    collection = create_collection(8, int_ids=True)
+    vectors = np.random.randn(20, 8)
+    collection.insert_many([Vector(f"vec_{i}", vectors[i]) for i in range(10)])
+    # Re-inserting keeps the id, new vectors continue the sequence
+    collection.insert_many([Vector(f"vec_{i}", vectors[i]) for i in range(5, 20)])
+
+    aliases = {item["id"]: item["iid"] for item in collection.id_table.dump()}
+    assert sorted(aliases.values()) == list(range(20))
+    assert aliases["vec_5"] == 5
+
+    item = collection.get_item("vec_7")
+    assert item.id == "vec_7"
+    assert np.allclose(item.vector, vectors[7] / np.linalg.norm(vectors[7]), atol=1e-6)
+    assert {v.id for v in collection.get_bulk_items(["vec_1", "vec_19", "nope"])} == {
+        "vec_1",
+        "vec_19",
+    }
+    with pytest.raises(ValueError):
+        collection.get_item("nope")
+
+    # Buckets hold packed postings, not vector id strings
+    for bucket in collection.bucket_table.dump():
+        if bucket["id"].startswith("#"):
+            continue
+        assert "ids" not in bucket
+        postings = decode_postings(bucket["postings"])
+        assert bucket["postings_count"] == len(postings)
+        # Re-inserted ids were not posted again
+        assert len(np.unique(postings)) == len(postings)
+
+
+def test_concurrent_inserts_agree_on_internal_ids(create_collection, monkeypatch):
+    collection = create_collection(8, int_ids=True)
+    get_bulk = collection.id_table.get_bulk
+    # Another insert aliases vec_0 between this insert's lookup and its write
+    lookups = []
+
+    def stale_get_bulk(ids):
+        lookups.append(ids)
+        if len(lookups) == 1:
+            collection.id_table.put({"id": "vec_0", "iid": 42})
+            return []
+        return get_bulk(ids)
+
+    monkeypatch.setattr(collection.id_table, "get_bulk", stale_get_bulk)
+    internal_ids, assigned = collection._internal_ids(["vec_0", "vec_1"])
+
+    assert internal_ids[0] == 42
+    assert assigned == {"vec_1"}
+    assert collection.id_table.get("vec_0")["iid"] == 42
+
+
+def test_search_matches_string_ids(create_collection):
+    int_collection = create_collection(8, int_ids=True)
+    str_collection = create_collection(8, name="str_collection")
+    str_collection.config.uniform_planes = int_collection.config.uniform_planes
+    vectors = [Vector(f"vec_{i}", np.random.randn(8)) for i in range(100)]
+    int_collection.insert_many(vectors)
+    str_collection.insert_many(vectors)
+
+    query = np.random.randn(8)
+    for max_candidates in (None, 20):
+        int_results, int_stats = int_collection.search_with_stats(
+            query, k=5, include_vectors=True, max_candidates=max_candidates
+        )
+        str_results, str_stats = str_collection.search_with_stats(
+            query, k=5, max_candidates=max_candidates
+        )
+        assert int_stats.candidates == str_stats.candidates
+        if max_candidates is None:
+            assert [r.id for r in int_results] == [r.id for r in str_results]
+        assert all(r.id.startswith("vec_") for r in int_results)
+        assert all(r.vector is not None for r in int_results)
+
+
+def test_postings_spill_into_shards(create_collection, monkeypatch):
+    monkeypatch.setattr(collection_module, "BUCKET_SHARD_SIZE", 4)
+    monkeypatch.setattr(collection_module, "MAX_ITEMS_PER_BUCKET", 1000)
+    collection = create_collection(8, int_ids=True, n_planes=1, bit_start=1)
+    vectors = np.random.randn(30, 8)
+    for i in range(0, 30, 3):
+        collection.insert_many([Vector(str(j), vectors[j]) for j in range(i, i + 3)])
+
+    assert collection.bucket_shards
+    buckets = collection.get_buckets(["0", "1"])
+    ids = np.concatenate([decode_postings(bucket["postings"]) for bucket in buckets])
+    assert sorted(ids.tolist()) == list(range(30))
+
+
+def test_search_by_internal_ids(create_collection):
+    collection = create_collection(8, int_ids=True)
+    vectors = [Vector(f"vec_{i}", np.random.randn(8)) for i in range(30)]
+    collection.insert_many(vectors)
+
+    results = collection.search(vectors[3].vector, k=3)
+    assert results[0].id == "vec_3"
+    assert collection.get_item("vec_3").id == "vec_3"
+    assert collection.bucket_table.get("#next_id")["next_id"] == 30
+
+
+def test_backfill_writes_postings(create_collection, monkeypatch):
+    monkeypatch.setattr(collection_module, "MAX_ITEMS_PER_BUCKET", 10)
+    collection = create_collection(8, int_ids=True, n_planes=1, bit_start=1)
+    collection.background_backfill = False
+    vectors = np.random.randn(40, 8)
+    for i in range(0, 40, 4):
+        collection.insert_many([Vector(str(j), vectors[j]) for j in range(i, i + 4)])
+    assert collection.config.n_planes >= 2
+
+    new_plane_keys = set(collection.config.hash_vectors(vectors)[:, 1].tolist())
+    buckets = collection.get_buckets(list(new_plane_keys))
+    backfilled = np.concatenate([decode_postings(b["postings"]) for b in buckets])
+    assert len(np.unique(backfilled)) > 10
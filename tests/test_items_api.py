@@ -0,0 +1,192 @@
+import base64
+import json
+
+import numpy as np
+import pytest
+from moto import mock_dynamodb
+
+from whiplash import Vector
+from whiplash.api import cache, items
+from whiplash.api.encoding import BASE64_CONTENT_TYPE, BINARY_CONTENT_TYPE
+from whiplash.encoding import decode_vector, encode_batch, encode_vector
+
+N_FEATURES = 8
+
+
+@pytest.fixture
+def collection(monkeypatch):
+    with mock_dynamodb():
+        monkeypatch.setattr(cache, "REGION", "us-east-1")
+        monkeypatch.setattr(cache, "STAGE", "dev")
+        monkeypatch.setattr(cache, "_whiplash", {})
+        monkeypatch.setattr(cache, "_collections", {})
+        whiplash = cache.get_whiplash("test_project")
+        whiplash.setup()
+        yield whiplash.create_collection("test_collection", N_FEATURES, n_planes=3)
+
+
+def make_event(body=None, headers=None, **path):
+    return {
+        "pathParameters": {
+            "projectId": "test_project",
+            "collectionId": "test_collection",
+            **path,
+        },
+        "headers": headers or {},
+        "body": body,
+    }
+
+
+def test_create_batch_json(collection):
+    vectors = np.random.rand(3, N_FEATURES)
+    body = json.dumps(
+        {
+            "vectors": [
+                {"id": str(i), "vector": v.tolist()} for i, v in enumerate(vectors)
+            ]
+        }
+    )
+
+    resp = items.create_batch(make_event(body), None)
+
+    assert resp["statusCode"] == 200
+    assert len(collection.vector_table.dump()) == 3
+
+
+def test_create_batch_base64(collection):
+    vectors = np.random.rand(3, N_FEATURES)
+    body = json.dumps(
+        {
+            "vectors": [
+                {"id": str(i), "vector": encode_vector(v)}
+                for i, v in enumerate(vectors)
+            ]
+        }
+    )
+    headers = {"content-type": BASE64_CONTENT_TYPE}
+
+    resp = items.create_batch(make_event(body, headers), None)
+
+    assert resp["statusCode"] == 200
+    assert np.allclose(
+        collection.get_item("1").vector, vectors[1] / np.linalg.norm(vectors[1])
+    )
+
+
+def test_create_batch_binary(collection):
+    vectors = np.random.rand(30, N_FEATURES)
+    data = encode_batch([str(i) for i in range(30)], vectors)
+    event = make_event(
+        base64.b64encode(data).decode(), {"Content-Type": BINARY_CONTENT_TYPE}
+    )
+    event["isBase64Encoded"] = True
+
+    resp = items.create_batch(event, None)
+
+    assert resp["statusCode"] == 200
+    assert len(collection.vector_table.dump()) == 30
+
+
+def test_create_batch_binary_wrong_size(collection):
+    data = encode_batch(["a"], [[1.0, 2.0]])
+    event = make_event(
+        base64.b64encode(data).decode(), {"Content-Type": BINARY_CONTENT_TYPE}
+    )
+    event["isBase64Encoded"] = True
+
+    resp = items.create_batch(event, None)
+
+    assert resp["statusCode"] == 400
+
+
+def test_search_base64(collection):
+    vector = np.random.rand(N_FEATURES)
+    items.create(make_event(json.dumps({"id": "a", "vector": vector.tolist()})), None)
+    headers = {"Content-Type": BASE64_CONTENT_TYPE, "Accept": BASE64_CONTENT_TYPE}
+    body = json.dumps(
+        {"query": encode_vector(vector), "limit": 1, "include_vectors": True}
+    )
+
+    resp = items.search(make_event(body, headers), None)
+
+    results = json.loads(resp["body"])
+    assert results[0]["id"] == "a"
+    assert isinstance(results[0]["vector"], str)
+    assert len(decode_vector(results[0]["vector"])) == N_FEATURES
+
+
+def test_search_rejects_base64_query_without_content_type(collection):
+    body = json.dumps({"query": encode_vector(np.random.rand(N_FEATURES))})
+
+    resp = items.search(make_event(body), None)
+
+    assert resp["statusCode"] == 400
+
+
+def test_search_include_vectors_top_n(collection):
+    # Near duplicates share buckets, so the search always has 5 candidates
+    vectors = np.random.rand(N_FEATURES) + 0.001 * np.random.rand(10, N_FEATURES)
+    collection.insert_many([Vector(str(i), v) for i, v in enumerate(vectors)])
+    query = vectors[0].tolist()
+
+    body = json.dumps({"query": query, "limit": 5, "include_vectors": 2})
+    results = json.loads(items.search(make_event(body), None)["body"])
+    assert ["vector" in result for result in results] == [True, True] + [False] * (
+        len(results) - 2
+    )
+
+    body = json.dumps({"query": query, "limit": 5})
+    results = json.loads(items.search(make_event(body), None)["body"])
+    assert results and all(set(result) == {"id", "dist"} for result in results)
+
+
+def test_search_reports_scored_candidates(collection):
+    vectors = np.random.rand(N_FEATURES) + 0.001 * np.random.rand(10, N_FEATURES)
+    collection.insert_many([Vector(str(i), v) for i, v in enumerate(vectors)])
+    query = vectors[0].tolist()
+
+    body = json.dumps({"query": query, "limit": 3, "max_candidates": 4})
+    resp = items.search(make_event(body), None)
+    assert resp["statusCode"] == 200
+    assert int(resp["headers"]["X-Whiplash-Scored"]) == 4
+    assert int(resp["headers"]["X-Whiplash-Candidates"]) >= 4
+    assert len(json.loads(resp["body"])) == 3
+
+    body = json.dumps({"query": query, "max_candidates": -1})
+    assert items.search(make_event(body), None)["statusCode"] == 400
+
+
+@pytest.mark.parametrize("option", ["n_probes", "max_candidates", "rerank"])
+def test_search_rejects_boolean_counts(collection, option):
+    body = json.dumps({"query": [0.5] * N_FEATURES, option: True})
+    assert items.search(make_event(body), None)["statusCode"] == 400
+
+
+@pytest.mark.parametrize("limit", ["abc", None, 0, -1, True])
+def test_search_rejects_invalid_limits(collection, limit):
+    body = json.dumps({"query": [0.5] * N_FEATURES, "limit": limit})
+    assert items.search(make_event(body), None)["statusCode"] == 400
+    body = json.dumps({"queries": [[0.5] * N_FEATURES], "limit": limit})
+    assert items.search_batch(make_event(body), None)["statusCode"] == 400
+
+
+def test_search_batch(collection):
+    vectors = np.random.rand(10, N_FEATURES)
+    collection.insert_many([Vector(str(i), v) for i, v in enumerate(vectors)])
+
+    body = json.dumps({"queries": [vectors[2].tolist(), vectors[7].tolist()]})
+    resp = items.search_batch(make_event(body), None)
+    assert resp["statusCode"] == 200
+    results = json.loads(resp["body"])
+    assert [query[0]["id"] for query in results] == ["2", "7"]
+    assert int(resp["headers"]["X-Whiplash-Scored"]) <= 10
+
+    body = json.dumps({"queries": [encode_vector(vectors[7])], "limit": 1})
+    headers = {"Content-Type": BASE64_CONTENT_TYPE}
+    resp = items.search_batch(make_event(body, headers), None)
+    assert [query[0]["id"] for query in json.loads(resp["body"])] == ["7"]
+
+    body = json.dumps({"queries": [[1.0]]})
+    assert items.search_batch(make_event(body), None)["statusCode"] == 400
+    body = json.dumps({"queries": []})
+    assert items.search_batch(make_event(body), None)["statusCode"] == 400
@@ -0,0 +1,55 @@
+import pytest
+from moto import mock_dynamodb
+
+from whiplash.api import cache
+
+
+@pytest.fixture
+def api_cache(monkeypatch):
+    monkeypatch.setattr(cache, "REGION", "us-east-1")
+    monkeypatch.setattr(cache, "STAGE", "dev")
+    monkeypatch.setattr(cache, "_whiplash", {})
+    monkeypatch.setattr(cache, "_collections", {})
+    return cache
+
+
+@mock_dynamodb
+def test_collection_is_cached_across_invocations(api_cache):
+    whiplash = api_cache.get_whiplash("test_project")
+    whiplash.setup()
+    whiplash.create_collection("test_collection", 8)
+
+    reads = []
+    get = whiplash.metadata_table.get
+    whiplash.metadata_table.get = lambda item_id: reads.append(item_id) or get(item_id)
+
+    collection = api_cache.get_collection("test_project", "test_collection")
+    assert collection is not None
+    assert api_cache.get_whiplash("test_project") is whiplash
+    assert api_cache.get_collection("test_project", "test_collection") is collection
+    assert len(reads) == 1
+
+    api_cache.invalidate(collection.collection_id)
+    reloaded = api_cache.get_collection("test_project", "test_collection")
+    assert reloaded is not collection
+    assert len(reads) == 2
+
+
+@mock_dynamodb
+def test_collection_cache_expires(api_cache, monkeypatch):
+    whiplash = api_cache.get_whiplash("test_project")
+    whiplash.setup()
+    whiplash.create_collection("test_collection", 8)
+
+    collection = api_cache.get_collection("test_project", "test_collection")
+    monkeypatch.setattr(api_cache, "COLLECTION_CACHE_TTL", 0)
+
+    assert api_cache.get_collection("test_project", "test_collection") is not collection
+
+
+@mock_dynamodb
+def test_missing_collection_is_not_cached(api_cache):
+    api_cache.get_whiplash("test_project").setup()
+
+    assert api_cache.get_collection("test_project", "missing") is None
+    assert api_cache._collections == {}
@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+
+from whiplash import Vector, Whiplash
+from whiplash.local_storage import MemoryStorage, SQLiteStorage
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def storage(request, tmp_path):
+    if request.param == "memory":
+        return MemoryStorage()
+    return SQLiteStorage(str(tmp_path / "whiplash.db"))
+
+
+def test_table_operations(storage):
+    table = storage.get_table("test_table")
+    assert not table.exists()
+    table.create_table()
+    assert table.exists()
+
+    table.put({"id": "a", "vector": b"\x00\x01"})
+    table.put_bulk([{"id": str(i), "value": i} for i in range(10)])
+    table.update_column("bucket", "ids", "a")
+    table.update_column_bulk("bucket", "ids", {"b", "c"})
+
+    assert table.get("a") == {"id": "a", "vector": b"\x00\x01"}
+    assert table.get("missing") is None
+    assert table.get("bucket")["ids"] == {"a", "b", "c"}
+    assert len(table.get_bulk([str(i) for i in range(10)] + ["missing", "0"])) == 10
+    assert len(table.dump()) == 12
+
+    table.delete("a")
+    assert table.get("a") is None
+
+
+def test_items_are_copied(storage):
+    table = storage.get_table("test_table")
+    table.create_table()
+    table.update_column("bucket", "ids", "a")
+
+    table.get("bucket")["ids"].add("b")
+
+    assert table.get("bucket")["ids"] == {"a"}
+
+
+def test_collection_on_local_storage(storage):
+    whiplash = Whiplash("us-east-1", "dev", storage=storage)
+    whiplash.setup()
+    collection = whiplash.create_collection("test_collection", 10, n_planes=3)
+    assert collection.storage is storage
+
+    vectors = [Vector(str(i), np.random.rand(10)) for i in range(50)]
+    collection.insert_many(vectors)
+
+    loaded = whiplash.get_collection("test_collection")
+    assert loaded is not None
+    assert (
+        loaded.config.uniform_planes.keys() == collection.config.uniform_planes.keys()
+    )
+    assert loaded.get_item("3").id == "3"
+    result = loaded.search(vectors[3].vector, k=5)
+    assert result[0].id == "3"
+    assert [c.collection_id for c in whiplash.get_all_collections()] == [
+        collection.collection_id
+    ]
+
+
+def test_update_column_bulk_capped(storage):
+    table = storage.get_table("test_table")
+    table.create_table()
+
+    assert table.update_column_bulk_capped("bucket", "ids", {"a", "b"}, 3)
+    assert table.update_column_bulk_capped("bucket", "ids", {"c", "d"}, 3)
+    assert not table.update_column_bulk_capped("bucket", "ids", {"e"}, 3)
+    assert table.get("bucket")["ids"] == {"a", "b", "c", "d"}
+
+
+def test_increment_column(storage):
+    table = storage.get_table("test_table")
+    table.create_table()
+    table.update_column_bulk("bucket", "ids", {"a"})
+
+    assert table.increment_column("bucket", "shards") == 1
+    assert table.increment_column("bucket", "shards", 2) == 3
+    assert table.get("bucket") == {"id": "bucket", "ids": {"a"}, "shards": 3}
+
+
+def test_append_binary_capped(storage):
+    table = storage.get_table("test_table")
+    table.create_table()
+
+    assert table.append_binary_capped("bucket", "postings", b"\x01\x02", 2, 3)
+    assert table.append_binary_capped("bucket", "postings", b"\x03\x04", 2, 3)
+    assert not table.append_binary_capped("bucket", "postings", b"\x05", 1, 3)
+    item = table.get("bucket")
+    assert item["postings"] == [b"\x01\x02", b"\x03\x04"]
+    assert item["postings_count"] == 4
+
+
+def test_conditional_puts(storage):
+    table = storage.get_table("test_table")
+    table.create_table()
+
+    assert table.put_if_absent({"id": "a", "value": 1})
+    assert not table.put_if_absent({"id": "a", "value": 2})
+    assert table.put_if_version({"id": "a", "value": 3, "version": 1}, 0)
+    assert not table.put_if_version({"id": "a", "value": 4, "version": 1}, 0)
+    assert table.get("a") == {"id": "a", "value": 3, "version": 1}
+    items = [{"id": "a"}, {"id": "b"}, {"id": "c"}]
+    assert table.put_bulk_if_absent(items) == [False, True, True]
+
+
+def test_scan_after(storage):
+    table = storage.get_table("test_table")
+    table.create_table()
+    table.put_bulk([{"id": f"{i:02d}"} for i in range(25)])
+
+    items, cursor = table.scan_after(None, 10)
+    assert [item["id"] for item in items] == [f"{i:02d}" for i in range(10)]
+    items, cursor = table.scan_after(cursor, 20)
+    assert len(items) == 15
+    assert cursor is None
@@ -0,0 +1,231 @@
+import numpy as np
+import pytest
+
+from whiplash import Vector
+from whiplash import collection as collection_module
+from whiplash import collection_config
+from whiplash.postings import (
+    decode_postings,
+    decode_sketch_postings,
+    parse_internal_key,
+)
+
+
+@pytest.fixture(autouse=True)
+def small_buckets(monkeypatch):
+    monkeypatch.setattr(collection_module, "MAX_ITEMS_PER_BUCKET", 10)
+
+
+@pytest.fixture
+def create_growing(create_collection):
+    """Create 1 bit collections that saturate fast and backfill synchronously"""
+
+    def create(n_planes=2):
+        collection = create_collection(8, n_planes=n_planes, bit_start=1)
+        collection.background_backfill = False
+        return collection
+
+    return create
+
+
+def insert_random(collection, n_vectors, start=0, batch_size=5):
+    for i in range(start, start + n_vectors, batch_size):
+        collection.insert_many(
+            [Vector(str(j), np.random.randn(8)) for j in range(i, i + batch_size)]
+        )
+
+
+def test_saturated_plane_grows_a_finer_plane(whiplash, create_growing):
+    collection = create_growing()
+    insert_random(collection, 60)
+
+    config = collection.config
+    assert 0 in config.saturated_buckets
+    assert config.n_planes > 2
+    assert len(config.uniform_planes) == config.n_planes
+    new_plane = config.uniform_planes[2]
+    assert new_plane.shape == (8, 3)
+
+    # Buckets stop taking ids once full
+    for key in config.saturated_keys():
+        assert len(collection.bucket_table.get(key)["ids"]) == 10
+
+    # The growth is saved, so other containers pick it up
+    reloaded = whiplash.get_collection("test_collection")
+    assert reloaded.config.n_planes == config.n_planes
+    assert reloaded.config.saturated_buckets == config.saturated_buckets
+    assert np.array_equal(reloaded.config.uniform_planes[2], new_plane)
+
+
+def test_backfill_indexes_existing_vectors(create_growing):
+    collection = create_growing(n_planes=1)
+    insert_random(collection, 40)
+    assert collection.config.n_planes >= 2
+
+    items = collection.vector_table.dump()
+    matrix = np.stack(
+        [np.frombuffer(item["vector"], dtype=np.float32) for item in items]
+    )
+    keys = collection.config.hash_vectors(matrix)
+    saturated = collection.config.saturated_keys()
+    for item, key in zip(items, keys[:, 1]):
+        if key not in saturated:
+            assert item["id"] in collection.bucket_table.get(key)["ids"]
+
+
+def test_search_skips_saturated_buckets(create_growing, monkeypatch):
+    monkeypatch.setattr(collection_module, "AUTO_GROW_PLANES", False)
+    collection = create_growing()
+    insert_random(collection, 60)
+    assert collection.config.n_planes == 2
+
+    query = np.random.randn(8)
+    base_keys = collection.config.hash_vectors(query)[0].tolist()
+    saturated = collection.config.saturated_keys()
+    results, stats = collection.search_with_stats(query, k=3)
+
+    expected = len(set(base_keys) - saturated) or len(set(base_keys))
+    assert stats.buckets == expected
+    assert len(results) == 3
+
+
+def test_background_backfill(create_growing):
+    collection = create_growing(n_planes=1)
+    collection.background_backfill = True
+    insert_random(collection, 40)
+
+    assert collection.backfill_thread is not None
+    collection.wait_for_backfill(timeout=10)
+    assert not collection.backfill_thread.is_alive()
+
+
+def test_stale_config_does_not_overwrite_growth(whiplash, create_growing):
+    collection = create_growing()
+    stale = whiplash.get_collection("test_collection")
+    stale.background_backfill = False
+
+    assert collection.grow_planes(1) == [2]
+    new_plane = collection.config.uniform_planes[2]
+    # The stale container reads the saved plane 2 instead of adding its own
+    assert stale.grow_planes(1) == []
+    assert np.array_equal(stale.config.uniform_planes[2], new_plane)
+    assert stale.grow_planes(1) == [3]
+
+    saved = whiplash.get_collection("test_collection").config
+    assert sorted(saved.uniform_planes) == [0, 1, 2, 3]
+    assert np.array_equal(saved.uniform_planes[2], new_plane)
+    assert saved.version == stale.config.version
+
+
+def test_backfill_resumes_from_saved_cursor(whiplash, create_growing, monkeypatch):
+    monkeypatch.setattr(collection_module, "AUTO_GROW_PLANES", False)
+    monkeypatch.setattr(collection_module, "BACKFILL_PAGE_SIZE", 10)
+    collection = create_growing(n_planes=1)
+    insert_random(collection, 40)
+    saturated = collection.config.saturated_keys()
+    assert saturated
+
+    # A container that stops before backfilling leaves the cursor saved
+    with collection._backfill_lock:
+        assert collection.grow_planes(1) == [1]
+    resumed = whiplash.get_collection("test_collection")
+    assert resumed.config.backfill_cursors == {1: ""}
+
+    # Saturated buckets are searched until the new plane is backfilled
+    query = np.random.randn(8)
+    base_key = resumed.config.hash_vectors(query)[0, 0]
+    assert resumed._unsaturated_keys([[base_key], ["x"]]) == [base_key, "x"]
+
+    assert not resumed.backfill(max_pages=1)
+    cursor = whiplash.get_collection("test_collection").config.backfill_cursors[1]
+    assert cursor
+    assert resumed.backfill()
+    assert whiplash.get_collection("test_collection").config.backfill_cursors == {}
+
+    items = resumed.vector_table.dump()
+    matrix = np.stack(
+        [np.frombuffer(item["vector"], dtype=np.float32) for item in items]
+    )
+    keys = resumed.config.hash_vectors(matrix)[:, 1]
+    for item, key in zip(items, keys):
+        bucket = resumed.bucket_table.get(key)
+        assert key in resumed.config.saturated_keys() or item["id"] in bucket["ids"]
+
+
+def test_lambda_backfills_synchronously(whiplash, monkeypatch):
+    monkeypatch.setenv("AWS_LAMBDA_FUNCTION_NAME", "whiplash")
+    collection = whiplash.create_collection("test_collection", 8, n_planes=1)
+    assert not collection.background_backfill
+
+
+def test_planes_grow_up_to_the_config_item_size(whiplash, create_collection):
+    # 384 features with the default planes leave room for a single 20 bit plane
+    collection = create_collection(384, n_planes=6, bit_start=8, bit_scale_factor=2)
+    collection.background_backfill = False
+
+    assert collection.grow_planes(1) == [6]
+    assert not collection.config.can_add_plane()
+    assert collection.grow_planes(1) == []
+    assert collection.config.plane_bytes() <= collection_config.MAX_PLANE_BYTES
+    saved = whiplash.get_collection("test_collection").config
+    assert sorted(saved.uniform_planes) == list(range(7))
+
+
+def test_saturation_with_a_full_config_item_keeps_inserting(
+    create_growing, monkeypatch
+):
+    collection = create_growing(n_planes=1)
+    monkeypatch.setattr(
+        collection_config, "MAX_PLANE_BYTES", collection.config.plane_bytes()
+    )
+    insert_random(collection, 40)
+
+    assert collection.config.saturated_buckets
+    assert collection.config.n_planes == 1
+
+
+def test_failed_config_write_leaves_config_unchanged(create_growing, monkeypatch):
+    collection = create_growing()
+
+    def fail(item, version):
+        raise RuntimeError("write failed")
+
+    monkeypatch.setattr(collection.metadata_table, "put_if_version", fail)
+    with pytest.raises(RuntimeError):
+        collection.grow_planes(1)
+    assert sorted(collection.config.uniform_planes) == [0, 1]
+    assert collection.config.backfill_cursors == {}
+    assert collection.config.version == 0
+
+
+@pytest.mark.parametrize("sketch_bits", [0, 64])
+def test_inserts_during_backfill_are_posted_once(
+    create_collection, monkeypatch, sketch_bits
+):
+    monkeypatch.setattr(collection_module, "BACKFILL_PAGE_SIZE", 5)
+    # Planes share bucket keys, no bucket may saturate and skip an id
+    monkeypatch.setattr(collection_module, "MAX_ITEMS_PER_BUCKET", 1000)
+    collection = create_collection(
+        8, n_planes=1, bit_start=4, int_ids=True, sketch_bits=sketch_bits
+    )
+    collection.background_backfill = False
+    insert_random(collection, 20)
+
+    # Hold the backfill so it is left unfinished while new vectors arrive
+    with collection._backfill_lock:
+        assert collection.grow_planes(1) == [1]
+    collection.backfill(max_pages=1)
+    with collection._backfill_lock:
+        insert_random(collection, 20, start=20)
+    assert collection.backfill()
+
+    items = collection.vector_table.dump()
+    keys = collection.config.hash_vectors(collection._decode_matrix(items))[:, 1]
+    for item, key in zip(items, keys):
+        chunks = collection.bucket_table.get(key)["postings"]
+        if sketch_bits:
+            ids, _ = decode_sketch_postings(chunks, sketch_bits // 8)
+        else:
+            ids = decode_postings(chunks)
+        ids = ids.tolist()
+        assert ids.count(parse_internal_key(item["id"])) == 1
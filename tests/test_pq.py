@@ -0,0 +1,177 @@
+import numpy as np
+import pytest
+
+from whiplash import Vector, Whiplash
+from whiplash.collection import Collection
+from whiplash.collection_config import CollectionConfig
+from whiplash.pq import (
+    MIN_TRAINING_VECTORS,
+    adc_scores,
+    adc_tables,
+    decode,
+    encode,
+    train_codebooks,
+)
+from whiplash.vector_math import score_bulk
+
+
+def test_train_encode_decode():
+    sample = np.random.randn(300, 16).astype(np.float32)
+    codebooks = train_codebooks(sample, 4)
+    assert codebooks.shape == (4, 256, 4)
+    codes = encode(sample, codebooks)
+    assert codes.shape == (300, 4)
+    assert codes.dtype == np.uint8
+    error = np.linalg.norm(decode(codes, codebooks) - sample, axis=1).mean()
+    assert error < 0.5 * np.linalg.norm(sample, axis=1).mean()
+
+
+def test_small_sample_and_bad_subvectors():
+    assert train_codebooks(np.random.randn(10, 8), 2).shape == (2, 10, 4)
+    with pytest.raises(ValueError):
+        train_codebooks(np.random.randn(10, 8), 3)
+
+
+@pytest.mark.parametrize("metric", ["dot", "l2"])
+def test_adc_matches_reconstruction(metric):
+    sample = np.random.randn(100, 16).astype(np.float32)
+    codebooks = train_codebooks(sample, 4, iterations=5)
+    codes = encode(sample, codebooks)
+    query = np.random.randn(16).astype(np.float32)
+    expected = score_bulk(query, decode(codes, codebooks), metric)
+    scores = adc_scores(adc_tables(query, codebooks, metric), codes, metric)
+    assert np.allclose(scores, expected, atol=1e-4)
+
+
+def test_pq_config():
+    with pytest.raises(ValueError):
+        CollectionConfig("c", "r", "dev", "p", 16, 1, 2, 1, index_type="ivf")
+    with pytest.raises(ValueError):
+        CollectionConfig(
+            "c", "r", "dev", "p", 16, 1, 2, 1, index_type="pq", pq_subvectors=5
+        )
+    with pytest.raises(ValueError):
+        CollectionConfig(
+            "c", "r", "dev", "p", 16, 1, 2, 1, index_type="pq", pq_subvectors=4
+        )
+    config = CollectionConfig(
+        "c",
+        "r",
+        "dev",
+        "p",
+        16,
+        1,
+        2,
+        1,
+        normalized=True,
+        index_type="pq",
+        pq_subvectors=4,
+    )
+    config.create_uniform_planes()
+    config.pq_codebooks = np.random.randn(4, 20, 4).astype(np.float32)
+    # Codebooks are stored in items of their own, not in the config item
+    assert "pq_codebooks" not in config.to_dynamo()
+    assert CollectionConfig.from_dict(config.to_dynamo()).index_type == "pq"
+
+
+def test_pq_collection_needs_training_vectors(create_collection):
+    with pytest.raises(ValueError):
+        create_collection(index_type="pq", pq_subvectors=4)
+    with pytest.raises(ValueError):
+        create_collection(
+            index_type="pq",
+            pq_subvectors=4,
+            training_vectors=np.random.randn(100, 16),
+        )
+
+    vectors = np.random.randn(MIN_TRAINING_VECTORS, 16).astype(np.float32)
+    collection = create_collection(
+        index_type="pq", pq_subvectors=4, training_vectors=vectors
+    )
+    collection.insert_many([Vector(str(i), row) for i, row in enumerate(vectors)])
+
+    assert collection.config.pq_codebooks.shape == (4, 256, 4)
+    item = collection.vector_table.get("5")
+    assert len(item["pq"]) == 4
+    assert "vector" not in item
+
+    results = collection.search(vectors[5], k=5, include_vectors=True)
+    assert "5" in [result.id for result in results]
+    assert results[0].vector.shape == (16,)
+    approx = collection.get_item("5").vector
+    unit = vectors[5] / np.linalg.norm(vectors[5])
+    assert np.dot(approx, unit) > 0.8
+
+
+def test_pq_codebooks_are_trained_once(whiplash, create_collection):
+    vectors = np.random.randn(MIN_TRAINING_VECTORS, 16).astype(np.float32)
+    collection = create_collection(
+        index_type="pq", pq_subvectors=4, training_vectors=vectors
+    )
+    other = Collection(
+        CollectionConfig.from_dict(collection.config.to_dynamo()),
+        storage=whiplash.storage,
+        metadata_table=whiplash.metadata_table,
+    )
+    other.config.pq_codebooks = None
+
+    # A second training keeps the stored codebooks and leaves no chunks behind
+    assert not other.train_pq(np.random.randn(MIN_TRAINING_VECTORS, 16))
+    assert np.array_equal(other.config.pq_codebooks, collection.config.pq_codebooks)
+    assert len(whiplash.metadata_table.dump()) == 3
+    assert len(whiplash.get_all_collections()) == 1
+
+
+def test_pq_rerank_with_full_precision(create_collection):
+    vectors = np.random.randn(MIN_TRAINING_VECTORS, 16).astype(np.float32)
+    collection = create_collection(
+        index_type="pq",
+        pq_subvectors=4,
+        keep_full_precision=True,
+        training_vectors=vectors,
+    )
+    collection.insert_many([Vector(str(i), row) for i, row in enumerate(vectors)])
+
+    results = collection.search(vectors[8], k=3, rerank=20)
+    assert results[0].id == "8"
+    assert np.isclose(results[0].dist, 1, atol=1e-5)
+    unit = vectors[8] / np.linalg.norm(vectors[8])
+    assert np.allclose(collection.get_item("8").vector, unit, atol=1e-6)
+
+
+def test_pq_codebooks_saved_in_metadata(storage, create_collection):
+    vectors = np.random.randn(MIN_TRAINING_VECTORS, 16).astype(np.float32)
+    collection = create_collection(
+        index_type="pq", pq_subvectors=4, training_vectors=vectors, metric="l2"
+    )
+    collection.insert_many([Vector(str(i), row) for i, row in enumerate(vectors)])
+
+    loaded = Whiplash("us-east-1", "dev", storage=storage).get_collection(
+        "test_collection"
+    )
+    assert np.array_equal(loaded.config.pq_codebooks, collection.config.pq_codebooks)
+    results = loaded.search(vectors[2], k=5)
+    assert "2" in [result.id for result in results]
+
+
+@pytest.mark.parametrize("storage", ["dynamo"], indirect=True)
+def test_pq_codebooks_at_realistic_size(storage, create_collection):
+    # float32 codebooks alone are 384KB here, past the 400KB item limit with planes
+    vectors = np.random.randn(1000, 384).astype(np.float32)
+    collection = create_collection(
+        384,
+        n_planes=6,
+        bit_start=8,
+        bit_scale_factor=2,
+        index_type="pq",
+        pq_subvectors=48,
+        training_vectors=vectors,
+    )
+    collection.insert_many([Vector(str(i), row) for i, row in enumerate(vectors[:50])])
+
+    loaded = Whiplash("us-east-1", "dev", storage=storage).get_collection(
+        "test_collection"
+    )
+    assert loaded.config.pq_codebooks.shape == (48, 256, 8)
+    assert np.array_equal(loaded.config.pq_codebooks, collection.config.pq_codebooks)
+    assert "7" in [result.id for result in loaded.search(vectors[7], k=5)]
@@ -0,0 +1,139 @@
+import numpy as np
+import pytest
+
+from whiplash import Vector
+from whiplash.collection_config import CollectionConfig
+from whiplash.quantization import PRECISIONS, dequantize, quantize, score_int8
+from whiplash.vector_math import METRICS, score_many
+
+
+@pytest.mark.parametrize(
+    "precision, n_bytes, tolerance",
+    [("float32", 64, 0), ("float16", 32, 1e-3), ("int8", 20, 2e-2)],
+)
+def test_quantize_round_trip(precision, n_bytes, tolerance):
+    matrix = np.random.randn(5, 16).astype(np.float32)
+    blobs = quantize(matrix, precision)
+    assert [len(blob) for blob in blobs] == [n_bytes] * 5
+    decoded = dequantize(blobs, 16, precision)
+    assert decoded.dtype == np.float32
+    assert decoded.shape == (5, 16)
+    assert np.abs(decoded - matrix).max() <= tolerance * np.abs(matrix).max()
+
+
+def test_quantize_int8_zero_vector():
+    blobs = quantize(np.zeros((1, 4)), "int8")
+    assert dequantize(blobs, 4, "int8").tolist() == [[0, 0, 0, 0]]
+
+
+def test_unknown_precision():
+    with pytest.raises(ValueError):
+        quantize(np.zeros((1, 4)), "int4")
+    with pytest.raises(ValueError):
+        CollectionConfig("c", "us-east-1", "dev", "p", 4, 1, 2, 1, precision="int4")
+
+
+def test_config_round_trip():
+    config = CollectionConfig(
+        "c",
+        "us-east-1",
+        "dev",
+        "p",
+        4,
+        1,
+        2,
+        1,
+        precision="int8",
+        keep_full_precision=True,
+    )
+    config.create_uniform_planes()
+    loaded = CollectionConfig.from_dict(config.to_dynamo())
+    assert loaded.precision == "int8"
+    assert loaded.keep_full_precision
+    data = config.to_dynamo()
+    del data["precision"], data["keep_full_precision"]
+    assert CollectionConfig.from_dict(data).precision == "float32"
+
+
+@pytest.mark.parametrize("metric", METRICS)
+def test_score_int8_matches_float_scores(metric):
+    vectors = np.random.randn(30, 16).astype(np.float32)
+    queries = np.random.randn(4, 16).astype(np.float32)
+    queries[0] = 0
+
+    scores = score_int8(queries, quantize(vectors, "int8"), 16, metric)
+    expected = score_many(queries, vectors, metric)
+    assert scores.shape == (4, 30)
+    assert np.allclose(scores, expected, atol=0.05 * np.abs(expected).max())
+
+
+def test_quantized_collections_need_full_precision_to_grow(create_collection):
+    collection = create_collection(precision="int8")
+    assert not collection.can_grow_planes
+    with pytest.raises(ValueError):
+        collection.grow_planes(1)
+
+    full = create_collection(name="full", precision="int8", keep_full_precision=True)
+    full.background_backfill = False
+    full.insert_many([Vector(str(i), row) for i, row in enumerate(np.eye(16))])
+    assert full.grow_planes(1) == [2]
+
+
+@pytest.mark.parametrize("precision", PRECISIONS)
+def test_quantized_collection(create_collection, precision):
+    collection = create_collection(precision=precision)
+    vectors = np.random.randn(50, 16).astype(np.float32)
+    collection.insert_many([Vector(str(i), row) for i, row in enumerate(vectors)])
+
+    stored = collection.vector_table.get("7")["vector"]
+    assert len(stored) == len(quantize(vectors[:1], precision)[0])
+    unit = vectors[7] / np.linalg.norm(vectors[7])
+    assert np.allclose(collection.get_item("7").vector, unit, atol=2e-2)
+    assert [v.id for v in collection.get_bulk_items(["3", "4"])] == ["3", "4"]
+
+    results = collection.search(vectors[7], k=3, include_vectors=True)
+    assert results[0].id == "7"
+    assert results[0].vector.dtype == np.float32
+
+
+def test_rerank_scores_full_precision(create_collection):
+    collection = create_collection(precision="int8", keep_full_precision=True)
+    vectors = np.random.randn(50, 16).astype(np.float32)
+    collection.insert_many([Vector(str(i), row) for i, row in enumerate(vectors)])
+
+    query = vectors[3] + 0.1 * np.random.randn(16).astype(np.float32)
+    results, stats = collection.search_with_stats(query, k=3, rerank=10)
+    assert len(results) == 3
+    full = {str(i): row / np.linalg.norm(row) for i, row in enumerate(vectors)}
+    unit_query = query / np.linalg.norm(query)
+    for result in results:
+        assert np.isclose(result.dist, np.dot(full[result.id], unit_query), atol=1e-5)
+    assert [result.dist for result in results] == sorted(
+        [result.dist for result in results], reverse=True
+    )
+
+
+def test_rerank_needs_full_precision(create_collection):
+    collection = create_collection(precision="float16")
+    collection.insert(Vector("a", np.ones(16)))
+    with pytest.raises(ValueError):
+        collection.search(np.ones(16), rerank=5)
+    assert collection.full_table.exists() is False
+
+    float32 = create_collection(name="float32")
+    float32.insert(Vector("a", np.ones(16)))
+    assert [r.id for r in float32.search(np.ones(16), rerank=5)] == ["a"]
+
+
+def test_rerank_with_int_ids(create_collection):
+    collection = create_collection(
+        precision="int8", keep_full_precision=True, int_ids=True
+    )
+    vectors = np.random.randn(20, 16).astype(np.float32)
+    collection.insert_many([Vector(f"v{i}", row) for i, row in enumerate(vectors)])
+
+    assert collection.full_table.get("#0")["id"] == "#0"
+    results = collection.search(vectors[5], k=2, rerank=5, include_vectors=True)
+    assert results[0].id == "v5"
+    assert np.isclose(results[0].dist, 1, atol=1e-5)
+    assert collection.get_item("v5").id == "v5"
@@ -0,0 +1,211 @@
+import numpy as np
+import pytest
+
+from whiplash import Vector
+from whiplash.bucket_cache import BucketCache
+from whiplash.collection import rank_candidates
+from whiplash.vector_math import cosine_similarity
+
+
+def create_random_vector(n_features, id="test_id"):
+    return Vector(id=id, vector=np.random.rand(n_features))
+
+
+def test_search_ranks_by_returned_dist(create_collection):
+    n_features = 10
+    collection = create_collection(n_features, n_planes=3)
+    vectors = [create_random_vector(n_features, str(i)) for i in range(50)]
+    collection.insert_many(vectors)
+
+    query = np.random.rand(n_features)
+    result = collection.search(query, k=10)
+
+    dists = [item.dist for item in result]
+    assert dists == sorted(dists, reverse=True)
+    for item in result:
+        expected = cosine_similarity(query, vectors[int(item.id)].vector)
+        assert item.dist == pytest.approx(expected, abs=1e-5)
+
+
+def test_cosine_collection_stores_normalized_vectors(create_collection):
+    n_features = 10
+    collection = create_collection(n_features, n_planes=3)
+    assert collection.config.metric == "cosine"
+    assert collection.config.normalized
+
+    vector = create_random_vector(n_features)
+    collection.insert(vector)
+
+    stored = collection.get_item(vector.id).vector
+    assert np.linalg.norm(stored) == pytest.approx(1.0, abs=1e-5)
+    result = collection.search(vector.vector * 3, k=1)
+    assert result[0].id == vector.id
+    assert result[0].dist == pytest.approx(1.0, abs=1e-5)
+
+
+def test_search_with_dot_and_l2_metrics(create_collection):
+    n_features = 10
+    vectors = [create_random_vector(n_features, str(i)) for i in range(30)]
+    query = np.random.rand(n_features)
+
+    for metric in ("dot", "l2"):
+        collection = create_collection(
+            n_features, n_planes=3, name=metric, metric=metric
+        )
+        assert not collection.config.normalized
+        collection.insert_many(vectors)
+        result = collection.search(query, k=5)
+
+        dists = [item.dist for item in result]
+        if metric == "dot":
+            assert dists == sorted(dists, reverse=True)
+            expected = [np.dot(query, vectors[int(item.id)].vector) for item in result]
+        else:
+            assert dists == sorted(dists)
+            expected = [
+                np.linalg.norm(query - vectors[int(item.id)].vector) for item in result
+            ]
+        assert dists == pytest.approx(expected, abs=1e-4)
+
+
+def test_search_with_bucket_cache(create_collection):
+    n_features = 10
+    collection = create_collection(n_features, n_planes=3)
+    collection.bucket_cache = BucketCache(max_bytes=1_000_000, ttl=None)
+    vectors = [create_random_vector(n_features, str(i)) for i in range(20)]
+    collection.insert_many(vectors)
+
+    query = vectors[0].vector
+    first = collection.search(query, k=5)
+    second = collection.search(query, k=5)
+
+    assert [item.id for item in first] == [item.id for item in second]
+    stats = collection.bucket_cache.stats()
+    # Planes can hash the query to the same key, which is read once
+    n_keys = len(set(collection.config.hash_vectors(query)[0]))
+    assert stats.misses == n_keys
+    assert stats.hits == n_keys
+
+    # Inserting into a cached bucket invalidates it
+    collection.insert(Vector("new", query))
+    assert any(item.id == "new" for item in collection.search(query, k=5))
+
+
+def test_search_include_vectors(create_collection):
+    n_features = 10
+    collection = create_collection(n_features, n_planes=3)
+    vectors = [create_random_vector(n_features, str(i)) for i in range(20)]
+    collection.insert_many(vectors)
+    query = vectors[0].vector
+
+    assert all(item.vector is None for item in collection.search(query, k=5))
+    assert all(
+        item.vector is not None
+        for item in collection.search(query, k=5, include_vectors=True)
+    )
+    result = collection.search(query, k=5, include_vectors=1)
+    assert result[0].vector is not None
+    assert all(item.vector is None for item in result[1:])
+    assert result[0].to_dict().keys() == {"id", "vector", "dist"}
+    assert result[-1].to_dict().keys() == {"id", "dist"}
+
+
+def test_search_with_probes_scans_more_candidates(create_collection):
+    n_features = 10
+    collection = create_collection(n_features, n_planes=2, bit_start=6)
+    vectors = [create_random_vector(n_features, str(i)) for i in range(200)]
+    collection.insert_many(vectors)
+
+    query = np.random.rand(n_features)
+    _, stats = collection.search_with_stats(query, k=10)
+    results, probe_stats = collection.search_with_stats(query, k=10, n_probes=3)
+
+    assert probe_stats.buckets > stats.buckets
+    assert probe_stats.candidates >= stats.candidates
+    dists = [item.dist for item in results]
+    assert dists == sorted(dists, reverse=True)
+
+
+def test_rank_candidates_orders_by_collision_weight():
+    buckets = [
+        {"id": "A", "ids": {"1", "2"}},
+        {"id": "B", "ids": {"2", "3"}},
+        {"id": "C", "ids": {"3", "4"}},
+        {"id": "D"},
+    ]
+    ranked = rank_candidates(buckets, {"A": 4, "B": 8})
+    assert ranked[:3] == ["2", "3", "1"]
+    assert ranked[3] == "4"
+
+
+def test_search_with_candidate_budget(create_collection):
+    n_features = 10
+    collection = create_collection(n_features, n_planes=2, bit_start=4)
+    # Centered vectors spread evenly over the buckets
+    vectors = [Vector(str(i), np.random.randn(n_features)) for i in range(400)]
+    collection.insert_many(vectors)
+    query = vectors[0].vector
+
+    results, stats = collection.search_with_stats(query, k=5, max_candidates=20)
+    assert stats.candidates > 20
+    assert stats.scored == 20
+    assert len(results) == 5
+    # The query itself collides in every plane, so it is ranked among the first
+    assert results[0].id == "0"
+
+    with pytest.raises(ValueError):
+        collection.search(query, max_candidates=0)
+
+
+def test_search_with_budget_stops_when_top_k_is_stable(create_collection, monkeypatch):
+    monkeypatch.setattr("whiplash.collection.CANDIDATE_ROUND_SIZE", 10)
+    n_features = 10
+    collection = create_collection(n_features, n_planes=1, bit_start=1)
+    # Exact duplicates tie, so the second round cannot change the top k
+    base = np.random.rand(n_features)
+    collection.insert_many([Vector(str(i), base) for i in range(100)])
+
+    _, full_stats = collection.search_with_stats(base, k=3)
+    results, stats = collection.search_with_stats(base, k=3, max_candidates=100)
+
+    assert full_stats.rounds == 1 and full_stats.scored == 100
+    assert not full_stats.stopped_early
+    assert stats.stopped_early
+    assert stats.rounds == 2 and stats.scored == 20
+    assert len(results) == 3
+
+
+@pytest.mark.parametrize("metric", ["cosine", "dot", "l2"])
+def test_search_many_matches_search(create_collection, metric):
+    n_features = 10
+    collection = create_collection(n_features, n_planes=3, metric=metric, bit_start=3)
+    vectors = np.random.randn(200, n_features)
+    collection.insert_many([Vector(str(i), v) for i, v in enumerate(vectors)])
+    queries = vectors[:6] + 0.05 * np.random.randn(6, n_features)
+
+    batch, stats = collection.search_many_with_stats(queries, k=4, n_probes=1)
+    assert len(batch) == 6
+    total_scored = 0
+    for query, results in zip(queries, batch):
+        expected, single = collection.search_with_stats(query, k=4, n_probes=1)
+        total_scored += single.scored
+        assert [r.id for r in results] == [r.id for r in expected]
+        assert np.allclose(
+            [r.dist for r in results], [r.dist for r in expected], atol=1e-3
+        )
+    # Candidates shared between queries are only read once
+    assert stats.scored <= total_scored
+
+
+def test_search_many_with_budget_and_vectors(create_collection):
+    n_features = 10
+    collection = create_collection(n_features, n_planes=3, int_ids=True)
+    vectors = np.random.randn(100, n_features)
+    collection.insert_many([Vector(str(i), v) for i, v in enumerate(vectors)])
+
+    batch = collection.search_many(
+        vectors[[3, 3, 8]], k=2, include_vectors=1, max_candidates=20
+    )
+    assert [results[0].id for results in batch] == ["3", "3", "8"]
+    assert batch[0][0].vector is not None and batch[0][1].vector is None
+    assert collection.search_many(np.empty((0, n_features))) == []
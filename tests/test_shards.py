@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from whiplash import Vector
+from whiplash import collection as collection_module
+
+
+@pytest.fixture
+def collection(create_collection, monkeypatch):
+    monkeypatch.setattr(collection_module, "BUCKET_SHARD_SIZE", 4)
+    monkeypatch.setattr(collection_module, "MAX_ITEMS_PER_BUCKET", 20)
+    collection = create_collection(8, n_planes=1, bit_start=1)
+    collection.background_backfill = False
+    return collection
+
+
+def insert_random(collection, n_vectors, batch_size=4):
+    vectors = np.random.randn(n_vectors, 8)
+    for i in range(0, n_vectors, batch_size):
+        collection.insert_many(
+            [
+                Vector(str(j), vectors[j])
+                for j in range(i, min(i + batch_size, n_vectors))
+            ]
+        )
+
+
+def test_buckets_spill_into_shards(collection):
+    insert_random(collection, 16)
+
+    shards = collection.bucket_shards
+    assert shards
+    for bucket_key, spill in shards.items():
+        keys = collection.shard_keys(bucket_key)
+        assert keys == [bucket_key] + [f"{bucket_key}#{i}" for i in range(1, spill + 1)]
+        items = collection.bucket_table.get_bulk(keys)
+        assert all(len(item["ids"]) <= 4 for item in items)
+        assert items[0]["shards"] == spill
+
+    # Shard counts only live on the buckets, never in the collection metadata
+    assert "bucket_shards" not in collection.config.to_dynamo()
+
+    # Every id is in exactly one shard of its bucket
+    buckets = collection.get_buckets(["0", "1"])
+    ids = [vector_id for bucket in buckets for vector_id in bucket["ids"]]
+    assert sorted(ids, key=int) == [str(i) for i in range(16)]
+
+
+def test_search_reads_shards_other_writers_added(collection):
+    insert_random(collection, 16)
+    assert collection.bucket_shards
+
+    stale = collection_module.Collection(
+        collection.config.__class__.from_dict(collection.config.to_dynamo()),
+        storage=collection.storage,
+    )
+    buckets = stale.get_buckets(["0", "1"])
+
+    assert sum(len(bucket["ids"]) for bucket in buckets) == 16
+    assert stale.bucket_shards == collection.bucket_shards
+    query = np.random.randn(8)
+    bucket = stale.get_buckets([stale.config.hash_vectors(query)[0, 0]])[0]
+    assert len(stale.search(query, k=30)) == len(bucket["ids"])
+
+
+def test_full_bucket_saturates_after_its_last_shard(collection, monkeypatch):
+    monkeypatch.setattr(collection_module, "AUTO_GROW_PLANES", False)
+    insert_random(collection, 80)
+
+    saturated = collection.config.saturated_keys()
+    assert saturated
+    for bucket_key in saturated:
+        assert collection.bucket_shards[bucket_key] == 4
+        buckets = collection.get_buckets([bucket_key])
+        assert len(buckets[0]["ids"]) == 20
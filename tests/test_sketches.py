@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from whiplash import Vector
+from whiplash import collection as collection_module
+from whiplash.collection_config import CollectionConfig
+from whiplash.postings import decode_sketch_postings, encode_postings
+from whiplash.sketches import (
+    compute_sketches,
+    hamming_distances,
+    parse_sketch_entries,
+    sketch_entries,
+    sketch_postings,
+)
+
+
+def test_sketch_entries_round_trip():
+    sketches = np.array([[1, 255], [0, 16]], dtype=np.uint8)
+    entries = sketch_entries(["a|b", "c"], sketches)
+    assert entries == ["01ff|a|b", "0010|c"]
+    ids, parsed = parse_sketch_entries(entries, 2)
+    assert ids == ["a|b", "c"]
+    assert parsed.tolist() == sketches.tolist()
+
+
+def test_sketch_postings_round_trip():
+    sketches = np.array([[1, 255], [0, 16]], dtype=np.uint8)
+    chunk = encode_postings(sketch_postings([7, 2**32 - 1], sketches), 2)
+    assert len(chunk) == 12
+    ids, parsed = decode_sketch_postings([chunk], 2)
+    assert ids.tolist() == [7, 2**32 - 1]
+    assert parsed.tolist() == sketches.tolist()
+
+
+def test_hamming_distances():
+    sketches = np.array([[0, 0], [255, 0], [1, 3]], dtype=np.uint8)
+    query = np.array([0, 1], dtype=np.uint8)
+    assert hamming_distances(query, sketches).tolist() == [1, 9, 2]
+
+
+def test_sketches_track_angle():
+    planes = np.random.randn(256, 16).T
+    vectors = np.random.randn(3, 16)
+    vectors[1] = vectors[0] + 0.05 * np.random.randn(16)
+    sketches = compute_sketches(vectors, planes)
+    assert sketches.shape == (3, 32)
+    distances = hamming_distances(sketches[0], sketches)
+    assert distances[0] == 0
+    assert distances[1] < distances[2]
+
+
+def test_sketch_config_round_trip():
+    with pytest.raises(ValueError):
+        CollectionConfig("c", "us-east-1", "dev", "p", 4, 1, 2, 1, sketch_bits=12)
+    config = CollectionConfig("c", "us-east-1", "dev", "p", 4, 1, 2, 1, sketch_bits=64)
+    config.create_uniform_planes()
+    loaded = CollectionConfig.from_dict(config.to_dynamo())
+    assert loaded.sketch_bits == 64
+    assert np.array_equal(loaded.sketch_planes, config.sketch_planes)
+
+
+@pytest.mark.parametrize("int_ids", [False, True])
+def test_sketch_search_fetches_few_vectors(create_collection, int_ids, monkeypatch):
+    monkeypatch.setattr(collection_module, "SKETCH_OVERSAMPLE", 2)
+    collection = create_collection(sketch_bits=64, int_ids=int_ids)
+    vectors = np.random.randn(200, 16).astype(np.float32)
+    collection.insert_many([Vector(f"v{i}", row) for i, row in enumerate(vectors)])
+
+    results, stats = collection.search_with_stats(vectors[9], k=3)
+    assert results[0].id == "v9"
+    assert stats.candidates > 6
+    assert stats.scored == 6
+
+
+def test_sketch_search_respects_max_candidates(create_collection):
+    collection = create_collection(sketch_bits=64)
+    vectors = np.random.randn(100, 16).astype(np.float32)
+    collection.insert_many([Vector(str(i), row) for i, row in enumerate(vectors)])
+
+    results, stats = collection.search_with_stats(vectors[4], k=2, max_candidates=20)
+    assert results[0].id == "4"
+    assert stats.scored == 20
+
+
+def test_sketch_bucket_entries(create_collection):
+    collection = create_collection(sketch_bits=64)
+    vectors = np.random.randn(30, 16).astype(np.float32)
+    collection.insert_many([Vector(f"v{i}", row) for i, row in enumerate(vectors)])
+
+    key = collection.config.hash_vectors(vectors[0])[0][0]
+    entries = collection.bucket_table.get(key)["ids"]
+    assert any(entry.endswith("|v0") for entry in entries)
+    assert collection.search(vectors[0], k=1)[0].id == "v0"
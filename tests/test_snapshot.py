@@ -0,0 +1,87 @@
+import json
+
+import numpy as np
+import pytest
+
+from whiplash import Vector, Whiplash
+from whiplash.pq import MIN_TRAINING_VECTORS
+from whiplash.snapshot import read_vectors
+
+
+def insert_vectors(collection, n=60):
+    vectors = np.random.randn(n, 16).astype(np.float32)
+    collection.insert_many([Vector(f"v{i}", row) for i, row in enumerate(vectors)])
+    return vectors
+
+
+# moto does not split scans into segments, so only memory tables export in parallel
+@pytest.mark.parametrize("storage", ["memory"], indirect=True)
+def test_export_snapshot_files(create_collection, tmp_path):
+    collection = create_collection(n_planes=3, metric="l2")
+    vectors = insert_vectors(collection)
+
+    assert collection.export(str(tmp_path)) == 60
+    config = json.loads((tmp_path / "config.json").read_text())
+    assert config["vectors"] == 60
+    assert config["metric"] == "l2"
+    ids, matrix = read_vectors(str(tmp_path))
+    assert isinstance(matrix, np.memmap)
+    order = [int(vector_id[1:]) for vector_id in ids]
+    assert np.array_equal(matrix, vectors[order])
+
+
+@pytest.mark.parametrize("options", [{}, {"int_ids": True, "sketch_bits": 32}])
+def test_restore_clones_collection(whiplash, create_collection, tmp_path, options):
+    collection = create_collection(n_planes=3, **options)
+    vectors = insert_vectors(collection)
+    collection.export(str(tmp_path), segments=1)
+
+    clone = whiplash.restore_collection(str(tmp_path), "clone", chunk_size=25)
+    assert clone.collection_id == "whiplash_dev_clone"
+    assert clone.config.int_ids == collection.config.int_ids
+    for plane_id, plane in collection.config.uniform_planes.items():
+        assert np.array_equal(clone.config.uniform_planes[plane_id], plane)
+    for query in vectors[:5]:
+        expected = collection.search(query, k=5)
+        results = clone.search(query, k=5)
+        assert [r.id for r in results] == [r.id for r in expected]
+        assert np.allclose([r.dist for r in results], [r.dist for r in expected])
+    with pytest.raises(ValueError):
+        whiplash.restore_collection(str(tmp_path), "clone")
+
+
+def test_restore_pq_keeps_codebooks(whiplash, create_collection, tmp_path):
+    collection = create_collection(
+        n_planes=3,
+        index_type="pq",
+        pq_subvectors=4,
+        training_vectors=np.random.randn(MIN_TRAINING_VECTORS, 16),
+    )
+    vectors = insert_vectors(collection, 300)
+    collection.export(str(tmp_path), segments=1)
+
+    clone = whiplash.restore_collection(str(tmp_path), "clone")
+    assert np.array_equal(clone.config.pq_codebooks, collection.config.pq_codebooks)
+    stored = whiplash.get_collection("clone").config.pq_codebooks
+    assert np.array_equal(stored, collection.config.pq_codebooks)
+    # Snapshots hold decoded vectors, renormalized ones may land on a neighbor code
+    codes = {item["id"]: item["pq"] for item in collection.vector_table.dump()}
+    clone_codes = {item["id"]: item["pq"] for item in clone.vector_table.dump()}
+    same = [
+        np.frombuffer(clone_codes[vector_id], np.uint8) == np.frombuffer(code, np.uint8)
+        for vector_id, code in codes.items()
+    ]
+    assert np.mean(same) > 0.95
+    assert clone.search(vectors[7], k=1)[0].id == "v7"
+
+
+def test_export_to_other_project(storage, create_collection, tmp_path):
+    collection = create_collection(n_planes=3, precision="float16")
+    vectors = insert_vectors(collection)
+    assert collection.export(str(tmp_path), segments=1) == 60
+
+    other = Whiplash("us-east-1", "dev", "other", storage=storage)
+    restored = other.restore_collection(str(tmp_path))
+    assert restored.collection_id == "other_dev_test_collection"
+    assert restored.config.precision == "float16"
+    assert restored.search(vectors[3], k=1)[0].id == "v3"
@@ -0,0 +1,170 @@
+from moto import mock_dynamodb
+
+from whiplash import storage
+from whiplash.storage import DynamoStorage
+
+
+def create_table(name="test_table"):
+    table = DynamoStorage("us-east-1").get_table(name)
+    table.create_table()
+    return table
+
+
+@mock_dynamodb
+def test_get_bulk_parallel_chunks():
+    table = create_table()
+    table.put_bulk([{"id": str(i), "value": i} for i in range(250)])
+
+    items, stats = table.get_bulk_with_stats([str(i) for i in range(250)] + ["0"])
+
+    assert len(items) == 250
+    assert {item["id"] for item in items} == {str(i) for i in range(250)}
+    assert all(isinstance(item["value"], int) for item in items)
+    assert stats.requested == 250
+    assert stats.retried == 0
+    assert stats.dropped == 0
+
+
+@mock_dynamodb
+def test_get_bulk_retries_unprocessed_keys(monkeypatch):
+    table = create_table()
+    table.put_bulk([{"id": str(i)} for i in range(10)])
+
+    client = table.dynamodb.meta.client
+    batch_get_item = client.batch_get_item
+    calls = []
+
+    def throttled_batch_get_item(RequestItems):
+        # Hold back half of the keys on the first call
+        calls.append(RequestItems)
+        request = RequestItems[table.table_name]
+        if len(calls) > 1:
+            return batch_get_item(RequestItems=RequestItems)
+        keys = request["Keys"]
+        response = batch_get_item(RequestItems={table.table_name: {"Keys": keys[:5]}})
+        response["UnprocessedKeys"] = {table.table_name: {"Keys": keys[5:]}}
+        return response
+
+    monkeypatch.setattr(client, "batch_get_item", throttled_batch_get_item)
+    monkeypatch.setattr(storage.time, "sleep", lambda _: None)
+
+    items, stats = table.get_bulk_with_stats([str(i) for i in range(10)])
+
+    assert len(items) == 10
+    assert len(calls) == 2
+    assert stats.retried == 5
+    assert stats.dropped == 0
+
+
+@mock_dynamodb
+def test_get_bulk_reports_dropped_keys(monkeypatch):
+    table = create_table()
+    table.put_bulk([{"id": str(i)} for i in range(4)])
+
+    client = table.dynamodb.meta.client
+
+    def always_throttled(RequestItems):
+        return {"Responses": {}, "UnprocessedKeys": RequestItems}
+
+    monkeypatch.setattr(client, "batch_get_item", always_throttled)
+    monkeypatch.setattr(storage.time, "sleep", lambda _: None)
+    monkeypatch.setattr(storage, "MAX_READ_RETRIES", 2)
+
+    items, stats = table.get_bulk_with_stats([str(i) for i in range(4)])
+
+    assert items == []
+    assert stats.retried == 8
+    assert stats.dropped == 4
+
+
+@mock_dynamodb
+def test_update_column_bulk_capped():
+    table = create_table()
+
+    assert table.update_column_bulk_capped("bucket", "ids", {"a", "b"}, 3)
+    assert table.update_column_bulk_capped("bucket", "ids", {"c", "d"}, 3)
+    assert not table.update_column_bulk_capped("bucket", "ids", {"e"}, 3)
+    assert table.get("bucket")["ids"] == {"a", "b", "c", "d"}
+
+
+@mock_dynamodb
+def test_dump_follows_scan_pages():
+    table = create_table()
+    # Large enough items to need several 1MB scan pages
+    table.put_bulk([{"id": str(i), "blob": b"x" * 100_000} for i in range(25)])
+
+    pages = list(table.scan_pages())
+
+    assert len(pages) > 1
+    assert len(table.dump()) == 25
+
+
+@mock_dynamodb
+def test_parallel_segment_scan(monkeypatch):
+    table = create_table()
+    scanned = []
+
+    # moto ignores Segment, so each segment serves its own slice of items
+    def scan_segment(segment=0, total_segments=1):
+        scanned.append((segment, total_segments))
+        for page in range(3):
+            yield [{"id": f"{segment}-{page}-{i}"} for i in range(10)]
+
+    monkeypatch.setattr(table, "_scan_segment", scan_segment)
+    items = list(table.scan(segments=4))
+    assert len({item["id"] for item in items}) == 120
+    assert sorted(scanned) == [(segment, 4) for segment in range(4)]
+
+    # Stopping early stops the segment threads
+    pages = table.scan_pages(segments=4)
+    next(pages)
+    pages.close()
+
+
+@mock_dynamodb
+def test_increment_column():
+    table = create_table()
+    table.update_column_bulk("bucket", "ids", {"a"})
+
+    assert table.increment_column("bucket", "shards") == 1
+    assert table.increment_column("bucket", "shards", 2) == 3
+    assert table.get("bucket") == {"id": "bucket", "ids": {"a"}, "shards": 3}
+
+
+@mock_dynamodb
+def test_append_binary_capped():
+    table = create_table()
+
+    assert table.append_binary_capped("bucket", "postings", b"\x01\x02", 2, 3)
+    assert table.append_binary_capped("bucket", "postings", b"\x03\x04", 2, 3)
+    assert not table.append_binary_capped("bucket", "postings", b"\x05", 1, 3)
+    item = table.get("bucket")
+    assert item["postings"] == [b"\x01\x02", b"\x03\x04"]
+    assert item["postings_count"] == 4
+
+
+@mock_dynamodb
+def test_conditional_puts():
+    table = create_table()
+
+    assert table.put_if_absent({"id": "a", "value": 1})
+    assert not table.put_if_absent({"id": "a", "value": 2})
+    assert table.put_if_version({"id": "a", "value": 3, "version": 1}, 0)
+    assert not table.put_if_version({"id": "a", "value": 4, "version": 1}, 0)
+    assert table.get("a") == {"id": "a", "value": 3, "version": 1}
+    items = [{"id": "a"}, {"id": "b"}, {"id": "c"}]
+    assert table.put_bulk_if_absent(items) == [False, True, True]
+
+
+@mock_dynamodb
+def test_scan_after():
+    table = create_table()
+    table.put_bulk([{"id": str(i)} for i in range(25)])
+
+    ids, cursor = [], None
+    while True:
+        items, cursor = table.scan_after(cursor, 10)
+        ids.extend(item["id"] for item in items)
+        if cursor is None:
+            break
+    assert sorted(ids) == sorted(str(i) for i in range(25))
@@ -1,6 +1,13 @@
 import numpy as np
 import pytest
-from whiplash.vector_math import cosine_similarity, cosine_similarity_bulk
+from whiplash.vector_math import (
+    METRICS,
+    cosine_similarity,
+    cosine_similarity_bulk,
+    score_bulk,
+    score_many,
+    top_k_scores,
+)
 
 
 def test_cosine_similarity_bulk():
@@ -61,3 +68,52 @@ def test_cosine_similarity_with_zero_norm():
 
     # Ensure the similarity is 1 (two zero vectors)
     assert similarity == pytest.approx(1.0, abs=1e-6)
+
+
+def test_score_bulk_matches_cosine_similarity():
+    query = np.random.rand(8)
+    matrix = np.random.rand(20, 8)
+    matrix[3] = 0
+    scores = score_bulk(query, matrix, metric="cosine")
+
+    for row, score in zip(matrix, scores):
+        assert score == pytest.approx(cosine_similarity(query, row), abs=1e-6)
+
+
+def test_top_k_scores_metrics():
+    query = np.random.rand(8)
+    matrix = np.random.rand(50, 8)
+
+    for metric in METRICS:
+        scores = score_bulk(query, matrix, metric=metric)
+        indices, top_scores = top_k_scores(query, matrix, k=5, metric=metric)
+        expected = np.argsort(scores)
+        if metric != "l2":
+            expected = expected[::-1]
+
+        assert indices.tolist() == expected[:5].tolist()
+        assert top_scores.tolist() == scores[expected[:5]].tolist()
+
+
+def test_top_k_scores_with_large_k():
+    query = np.random.rand(3)
+    matrix = np.random.rand(2, 3)
+    indices, scores = top_k_scores(query, matrix, k=10)
+
+    assert len(indices) == 2
+    assert scores[0] >= scores[1]
+
+
+def test_score_bulk_unknown_metric():
+    with pytest.raises(ValueError):
+        score_bulk(np.ones(3), np.ones((2, 3)), metric="manhattan")
+
+
+@pytest.mark.parametrize("metric", ["cosine", "dot", "l2"])
+def test_score_many_matches_score_bulk(metric):
+    queries = np.random.randn(4, 8)
+    matrix = np.random.randn(30, 8)
+    scores = score_many(queries, matrix, metric)
+    assert scores.shape == (4, 30)
+    for query, row in zip(queries, scores):
+        assert np.allclose(row, score_bulk(query, matrix, metric))
@@ -3,6 +3,7 @@ import unittest
 from moto import mock_dynamodb
 
 from whiplash import Whiplash
+from whiplash.collection_config import CollectionConfig
 
 
 class TestWhiplash(unittest.TestCase):
@@ -79,5 +80,40 @@ class TestWhiplash(unittest.TestCase):
         self.assertEqual(collection.config.bit_scale_factor, bit_scale_factor)
 
 
+class TestCollectionMetric(unittest.TestCase):
+    @mock_dynamodb
+    def test_metric_is_persisted(self):
+        whiplash = Whiplash("us-east-1", "dev", project_name="test_project")
+        whiplash.setup()
+        whiplash.create_collection("l2_collection", 16, metric="l2")
+
+        collection = whiplash.get_collection("l2_collection")
+
+        assert collection is not None
+        self.assertEqual(collection.config.metric, "l2")
+        self.assertFalse(collection.config.normalized)
+        self.assertEqual(collection.to_dict()["metric"], "l2")
+
+    @mock_dynamodb
+    def test_legacy_collection_defaults_to_cosine(self):
+        whiplash = Whiplash("us-east-1", "dev", project_name="test_project")
+        whiplash.setup()
+        collection = whiplash.create_collection("legacy_collection", 16)
+        item = collection.config.to_dynamo()
+        del item["metric"]
+        del item["normalized"]
+        whiplash.metadata_table.put(item)
+
+        loaded = whiplash.get_collection("legacy_collection")
+
+        assert loaded is not None
+        self.assertEqual(loaded.config.metric, "cosine")
+        self.assertFalse(loaded.config.normalized)
+
+    def test_unknown_metric(self):
+        with self.assertRaises(ValueError):
+            CollectionConfig("c", "us-east-1", "dev", "p", 3, 1, 8, 2, metric="jaccard")
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,97 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from moto import mock_dynamodb
+
+from whiplash import Vector
+from whiplash.aio import AsyncWhiplash
+from whiplash.bucket_cache import BucketCache
+from whiplash.local_storage import MemoryStorage
+
+
+async def build(whiplash, name="test_collection"):
+    await whiplash.setup()
+    collection = await whiplash.create_collection(
+        name, 8, n_planes=2, bit_start=2, bit_scale_factor=1
+    )
+    vectors = np.random.randn(40, 8)
+    await collection.insert_many([Vector(str(i), v) for i, v in enumerate(vectors)])
+    return collection, vectors
+
+
+def test_async_collection_memory():
+    async def run():
+        whiplash = AsyncWhiplash("us-east-1", "dev", storage=MemoryStorage())
+        collection, vectors = await build(whiplash)
+
+        results = await asyncio.gather(
+            *(collection.search(vectors[i], k=2) for i in range(5))
+        )
+        assert [result[0].id for result in results] == ["0", "1", "2", "3", "4"]
+        batch = await collection.search_many(vectors[:3], k=1)
+        assert [result[0].id for result in batch] == ["0", "1", "2"]
+
+        item = await collection.get_item("7")
+        assert np.allclose(item.vector, vectors[7] / np.linalg.norm(vectors[7]))
+        assert len(await collection.vector_table.dump()) == 40
+
+        loaded = await whiplash.get_collection("test_collection")
+        assert loaded.collection_id == collection.collection_id
+        assert await whiplash.get_collection("missing") is None
+        assert len(await whiplash.get_all_collections()) == 1
+
+    asyncio.run(run())
+
+
+@mock_dynamodb
+def test_async_collection_dynamo_with_executor():
+    async def run():
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            whiplash = AsyncWhiplash("us-east-1", "dev", executor=executor)
+            collection, vectors = await build(whiplash)
+            results, stats = await collection.search_with_stats(
+                vectors[3], k=3, max_candidates=10
+            )
+            assert results[0].id == "3"
+            assert stats.scored <= 10
+            await collection.insert(Vector("new", np.ones(8)))
+            assert (await collection.get_item("new")).id == "new"
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("storage", ["memory", "dynamo"], indirect=True)
+def test_concurrent_inserts_and_searches(storage):
+    async def run():
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            whiplash = AsyncWhiplash(
+                "us-east-1", "dev", storage=storage, executor=executor
+            )
+            collection, vectors = await build(whiplash)
+            collection.collection.bucket_cache = BucketCache(
+                max_bytes=1_000_000, ttl=None
+            )
+            new_vectors = np.random.randn(80, 8)
+
+            # Every batch of inserts races a search over the same buckets
+            await asyncio.gather(
+                *(
+                    collection.insert_many(
+                        [Vector(f"new_{j}", new_vectors[j]) for j in range(i, i + 4)]
+                    )
+                    for i in range(0, 80, 4)
+                ),
+                *(collection.search(new_vectors[i], k=1) for i in range(0, 80, 4)),
+            )
+
+            results = await asyncio.gather(
+                *(collection.search(vector, k=1) for vector in new_vectors)
+            )
+            assert [result[0].id for result in results] == [
+                f"new_{i}" for i in range(80)
+            ]
+            assert len(await collection.vector_table.dump()) == 120
+
+    asyncio.run(run())
@@ -0,0 +1,179 @@
+"""asyncio interface to Whiplash collections
+
+boto3 is synchronous, so every call is offloaded to a worker thread and the
+event loop stays free while DynamoDB answers. Many searches and inserts
+awaited together overlap their round trips, and the batch reads inside
+each call are already spread over DynamoTable's read pool. Pass an
+executor to bound the threads a service uses, the loop's default executor
+is used otherwise. A collection is shared by the threads, inserts and
+searches on it can be awaited together.
+
+    whiplash = AsyncWhiplash("us-east-2", "dev")
+    collection = await whiplash.get_collection("my_collection")
+    results = await asyncio.gather(*(collection.search(q) for q in queries))
+"""
+
+import asyncio
+from concurrent.futures import Executor
+from functools import partial
+from typing import Callable, Optional
+
+import numpy as np
+
+from whiplash.collection import Collection, SearchStats
+from whiplash.collection_config import CollectionConfig
+from whiplash.storage import BatchReadStats, Storage, Table
+from whiplash.vector import CompVector, Vector
+from whiplash.whiplash import Whiplash
+
+
+class Offloaded:
+    """Base of the async wrappers, running blocking calls on the executor"""
+
+    executor: Optional[Executor]
+
+    async def _run(self, func: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+
+class AsyncTable(Offloaded):
+    """Awaitable reads and writes of a storage table"""
+
+    def __init__(self, table: Table, executor: Optional[Executor] = None):
+        self.table = table
+        self.executor = executor
+
+    async def get(self, item_id) -> Optional[dict]:
+        return await self._run(self.table.get, item_id)
+
+    async def get_bulk(self, item_ids: list[str]) -> list[dict]:
+        return await self._run(self.table.get_bulk, item_ids)
+
+    async def get_bulk_with_stats(
+        self, item_ids: list[str]
+    ) -> tuple[list[dict], BatchReadStats]:
+        return await self._run(self.table.get_bulk_with_stats, item_ids)
+
+    async def put(self, item: dict) -> None:
+        await self._run(self.table.put, item)
+
+    async def put_bulk(self, items: list[dict]) -> None:
+        await self._run(self.table.put_bulk, items)
+
+    async def delete(self, item_id) -> None:
+        await self._run(self.table.delete, item_id)
+
+    async def dump(self) -> list[dict]:
+        return await self._run(self.table.dump)
+
+
+class AsyncCollection(Offloaded):
+    """Awaitable version of Collection, see Collection for the arguments"""
+
+    def __init__(self, collection: Collection, executor: Optional[Executor] = None):
+        self.collection = collection
+        self.executor = executor
+        self.vector_table = AsyncTable(collection.vector_table, executor)
+        self.bucket_table = AsyncTable(collection.bucket_table, executor)
+
+    def __repr__(self) -> str:
+        return f"AsyncCollection(collection_id={self.collection_id})"
+
+    @property
+    def collection_id(self) -> str:
+        return self.collection.collection_id
+
+    @property
+    def config(self) -> CollectionConfig:
+        return self.collection.config
+
+    def to_dict(self) -> dict:
+        return self.collection.to_dict()
+
+    async def get_item(self, id: str) -> Vector:
+        return await self._run(self.collection.get_item, id)
+
+    async def get_bulk_items(self, ids: list[str]) -> list[Vector]:
+        return await self._run(self.collection.get_bulk_items, ids)
+
+    async def insert(self, vector: Vector) -> None:
+        await self._run(self.collection.insert, vector)
+
+    async def insert_many(self, vectors: list[Vector]) -> None:
+        await self._run(self.collection.insert_many, vectors)
+
+    async def search(self, query: np.ndarray, k: int = 5, **kwargs) -> list[CompVector]:
+        return await self._run(self.collection.search, query, k, **kwargs)
+
+    async def search_with_stats(
+        self, query: np.ndarray, k: int = 5, **kwargs
+    ) -> tuple[list[CompVector], SearchStats]:
+        return await self._run(self.collection.search_with_stats, query, k, **kwargs)
+
+    async def search_many(
+        self, queries: np.ndarray, k: int = 5, **kwargs
+    ) -> list[list[CompVector]]:
+        return await self._run(self.collection.search_many, queries, k, **kwargs)
+
+    async def search_many_with_stats(
+        self, queries: np.ndarray, k: int = 5, **kwargs
+    ) -> tuple[list[list[CompVector]], SearchStats]:
+        return await self._run(
+            self.collection.search_many_with_stats, queries, k, **kwargs
+        )
+
+    async def wait_for_backfill(self, timeout: Optional[float] = None) -> None:
+        await self._run(self.collection.wait_for_backfill, timeout)
+
+    async def backfill(self, max_pages: Optional[int] = None) -> bool:
+        return await self._run(self.collection.backfill, max_pages)
+
+    async def import_file(self, path: str, **kwargs) -> int:
+        return await self._run(self.collection.import_file, path, **kwargs)
+
+    async def export(self, path: str, **kwargs) -> int:
+        return await self._run(self.collection.export, path, **kwargs)
+
+
+class AsyncWhiplash(Offloaded):
+    """Awaitable version of Whiplash, see Whiplash for the arguments"""
+
+    def __init__(
+        self,
+        region,
+        stage,
+        project_name: str = "whiplash",
+        storage: Optional[Storage] = None,
+        executor: Optional[Executor] = None,
+    ) -> None:
+        self.whiplash = Whiplash(region, stage, project_name, storage)
+        self.executor = executor
+
+    def __repr__(self) -> str:
+        return f"Async{self.whiplash!r}"
+
+    async def setup(self) -> None:
+        await self._run(self.whiplash.setup)
+
+    async def get_all_collections(self) -> list[AsyncCollection]:
+        collections = await self._run(self.whiplash.get_all_collections)
+        return [AsyncCollection(c, self.executor) for c in collections]
+
+    async def create_collection(
+        self, collection_name: str, n_features: int, **kwargs
+    ) -> AsyncCollection:
+        collection = await self._run(
+            self.whiplash.create_collection, collection_name, n_features, **kwargs
+        )
+        return AsyncCollection(collection, self.executor)
+
+    async def restore_collection(self, path: str, **kwargs) -> AsyncCollection:
+        collection = await self._run(self.whiplash.restore_collection, path, **kwargs)
+        return AsyncCollection(collection, self.executor)
+
+    async def get_collection(self, collection_name: str) -> Optional[AsyncCollection]:
+        collection = await self._run(self.whiplash.get_collection, collection_name)
+        if collection is None:
+            return None
+        return AsyncCollection(collection, self.executor)
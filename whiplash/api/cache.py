@@ -0,0 +1,58 @@
+import os
+import threading
+import time
+from typing import Optional
+
+from whiplash.bucket_cache import BUCKET_CACHE_MAX_BYTES, BucketCache
+from whiplash.collection import Collection
+from whiplash.whiplash import Whiplash
+
+REGION = os.environ.get("REGION")
+STAGE = os.environ.get("STAGE")
+
+# Seconds a warm container may serve a cached collection config
+COLLECTION_CACHE_TTL = float(os.environ.get("COLLECTION_CACHE_TTL", 300))
+
+_lock = threading.Lock()
+_whiplash: dict[str, Whiplash] = {}
+_collections: dict[str, tuple[float, Collection]] = {}
+
+
+def get_whiplash(project_id: str) -> Whiplash:
+    """Get a Whiplash client for a project, reused across warm invocations"""
+    with _lock:
+        whiplash = _whiplash.get(project_id)
+        if whiplash is None:
+            whiplash = Whiplash(REGION, STAGE, project_name=project_id)
+            _whiplash[project_id] = whiplash
+        return whiplash
+
+
+def get_collection(project_id: str, collection_name: str) -> Optional[Collection]:
+    """Get a collection with its decoded uniform planes, cached for COLLECTION_CACHE_TTL"""
+    whiplash = get_whiplash(project_id)
+    collection_id = f"{project_id}_{whiplash.stage}_{collection_name}"
+    now = time.monotonic()
+    with _lock:
+        cached = _collections.get(collection_id)
+        if cached and now - cached[0] < COLLECTION_CACHE_TTL:
+            return cached[1]
+
+    collection = whiplash.get_collection(collection_name)
+    if collection is None:
+        # Missing collections are not cached so they can be created at any time
+        return None
+    if BUCKET_CACHE_MAX_BYTES > 0:
+        collection.bucket_cache = BucketCache(BUCKET_CACHE_MAX_BYTES)
+    with _lock:
+        _collections[collection_id] = (now, collection)
+    return collection
+
+
+def invalidate(collection_id: Optional[str] = None) -> None:
+    """Drop a cached collection after its config changes, or every entry if no id"""
+    with _lock:
+        if collection_id is None:
+            _collections.clear()
+        else:
+            _collections.pop(collection_id, None)
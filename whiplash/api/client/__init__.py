@@ -1,5 +1,28 @@
 from .collection import Collection
+from .errors import (
+    AuthenticationError,
+    BadRequestError,
+    NotFoundError,
+    ServerError,
+    ThrottledError,
+    WhiplashAPIError,
+    WhiplashConnectionError,
+    WhiplashTimeoutError,
+)
 from .vector import CompVector, Vector
 from .whiplash import Whiplash
 
-__all__ = ["Collection", "Vector", "CompVector", "Whiplash"]
+__all__ = [
+    "Collection",
+    "Vector",
+    "CompVector",
+    "Whiplash",
+    "WhiplashAPIError",
+    "BadRequestError",
+    "AuthenticationError",
+    "NotFoundError",
+    "ThrottledError",
+    "ServerError",
+    "WhiplashConnectionError",
+    "WhiplashTimeoutError",
+]
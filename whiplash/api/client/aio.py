@@ -0,0 +1,98 @@
+"""asyncio interface to the Whiplash API client
+
+Requests run on worker threads over the client's pooled keep-alive session,
+so searches and inserts awaited together share warm connections instead of
+opening one each. Size pool_size to the number of requests in flight.
+
+    whiplash = AsyncWhiplash(api_url, api_key, pool_size=32)
+    collection = await whiplash.get_collection("my_collection")
+    results = await asyncio.gather(*(collection.search(q) for q in queries))
+"""
+
+from concurrent.futures import Executor
+from typing import Optional
+
+from whiplash.aio import Offloaded
+from whiplash.api.client.collection import Collection
+from whiplash.api.client.vector import CompVector, Vector
+from whiplash.api.client.whiplash import Whiplash
+
+
+class AsyncCollection(Offloaded):
+    """Awaitable version of the client Collection"""
+
+    def __init__(self, collection: Collection, executor: Optional[Executor] = None):
+        self.collection = collection
+        self.executor = executor
+
+    def __repr__(self) -> str:
+        return f"AsyncCollection(name={self.name})"
+
+    @property
+    def name(self) -> str:
+        return self.collection.name
+
+    @property
+    def metadata(self) -> dict:
+        return self.collection.metadata
+
+    async def get_item(self, id: str) -> Vector:
+        return await self._run(self.collection.get_item, id)
+
+    async def insert(self, vector: Vector) -> None:
+        await self._run(self.collection.insert, vector)
+
+    async def insert_batch(self, vectors: list[Vector]) -> None:
+        await self._run(self.collection.insert_batch, vectors)
+
+    async def search(
+        self, query: list[float], limit: int = 5, **kwargs
+    ) -> list[CompVector]:
+        return await self._run(self.collection.search, query, limit, **kwargs)
+
+    async def search_batch(
+        self, queries: list[list[float]], limit: int = 5, **kwargs
+    ) -> list[list[CompVector]]:
+        return await self._run(self.collection.search_batch, queries, limit, **kwargs)
+
+
+class AsyncWhiplash(Offloaded):
+    """Awaitable version of the client Whiplash, see Whiplash for the arguments"""
+
+    def __init__(
+        self,
+        api_url: str,
+        api_key: str,
+        project_name: str = "whiplash",
+        executor: Optional[Executor] = None,
+        **kwargs,
+    ) -> None:
+        self.whiplash = Whiplash(api_url, api_key, project_name, **kwargs)
+        self.executor = executor
+
+    async def __aenter__(self) -> "AsyncWhiplash":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.whiplash.close()
+
+    async def get_collections(self) -> list[AsyncCollection]:
+        collections = await self._run(self.whiplash.get_collections)
+        return [AsyncCollection(c, self.executor) for c in collections]
+
+    async def create_collection(
+        self, collection_name: str, n_features: int, **kwargs
+    ) -> AsyncCollection:
+        collection = await self._run(
+            self.whiplash.create_collection, collection_name, n_features, **kwargs
+        )
+        return AsyncCollection(collection, self.executor)
+
+    async def get_collection(self, collection_name: str) -> Optional[AsyncCollection]:
+        collection = await self._run(self.whiplash.get_collection, collection_name)
+        if collection is None:
+            return None
+        return AsyncCollection(collection, self.executor)
@@ -1,30 +1,154 @@
 import logging
-import traceback
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from whiplash.api.client.errors import (
+    WhiplashAPIError,
+    WhiplashConnectionError,
+    WhiplashTimeoutError,
+    error_for_status,
+)
+from whiplash.api.encoding import (
+    BASE64_CONTENT_TYPE,
+    BINARY_CONTENT_TYPE,
+    CONTENT_TYPES,
+    JSON_CONTENT_TYPE,
+)
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# Throttling and gateway errors are retried, client errors are not
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+THROTTLED_STATUS = 429
+
+
+class _Retry(Retry):
+    """Retry policy that only resends requests the API cannot have processed
+
+    Connection errors are always retried, the request was never sent. A 5xx
+    or a read timeout may come after a POST took effect, and sending it
+    again could turn a created collection into a spurious "already exists",
+    so those are only retried for the idempotent methods of allowed_methods.
+    Throttled requests were rejected before processing and are always retried.
+    """
+
+    def is_retry(
+        self, method: str, status_code: int, has_retry_after: bool = False
+    ) -> bool:
+        if status_code == THROTTLED_STATUS and status_code in (
+            self.status_forcelist or ()
+        ):
+            return True
+        return super().is_retry(method, status_code, has_retry_after)
+
 
 @dataclass
 class APIConfig:
     url: str
     key: str
+    # Vector payload encoding, one of whiplash.api.encoding.CONTENT_TYPES
+    content_type: str = JSON_CONTENT_TYPE
+    # Seconds to wait for a connection and for each response
+    timeout: float = 30
+    # Retries of throttled, failed and unreachable requests, with backoff
+    max_retries: int = 3
+    backoff_factor: float = 0.5
+    # Keep-alive connections kept open to the API
+    pool_size: int = 10
+    _session: Optional[requests.Session] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self):
+        if self.content_type not in CONTENT_TYPES:
+            raise ValueError(f"content_type must be one of {', '.join(CONTENT_TYPES)}")
+
+    @property
+    def binary_vectors(self) -> bool:
+        """Whether vectors are sent as base64 float32 instead of float lists"""
+        return self.content_type != JSON_CONTENT_TYPE
 
-    def request(self, method: str, path: str, data: Optional[dict] = None) -> dict:
+    @property
+    def json_content_type(self) -> str:
+        """Content type of JSON bodies, which cannot use the raw binary format"""
+        return BASE64_CONTENT_TYPE if self.binary_vectors else JSON_CONTENT_TYPE
+
+    @property
+    def session(self) -> requests.Session:
+        """Pooled session reusing TLS connections across requests"""
+        if self._session is None:
+            retry = _Retry(
+                total=self.max_retries,
+                backoff_factor=self.backoff_factor,
+                status_forcelist=RETRY_STATUSES,
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=self.pool_size,
+                pool_maxsize=self.pool_size,
+                max_retries=retry,
+            )
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._session = session
+        return self._session
+
+    def close(self) -> None:
+        """Close the pooled connections"""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        data: Optional[dict | bytes] = None,
+        content_type: str = JSON_CONTENT_TYPE,
+    ):
+        """Send a request and return its JSON body
+
+        Raises a whiplash.api.client.errors.WhiplashAPIError subclass when
+        the request fails after retries.
+        """
+        headers = {"x-api-key": self.key, "Content-Type": content_type}
+        if self.binary_vectors:
+            headers["Accept"] = BASE64_CONTENT_TYPE
+        payload = (
+            {"data": data} if content_type == BINARY_CONTENT_TYPE else {"json": data}
+        )
         try:
-            response = requests.request(
+            response = self.session.request(
                 method,
                 f"{self.url}/{path}",
-                headers={"x-api-key": self.key, "Content-Type": "application/json"},
-                json=data,
+                headers=headers,
+                timeout=self.timeout,
+                **payload,
             )
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error making request: {e}")
-            traceback.print_exc()
-            return {}
+        except requests.exceptions.RetryError as e:
+            raise WhiplashConnectionError(f"Retries exhausted: {e}") from e
+        except requests.exceptions.ReadTimeout as e:
+            raise WhiplashTimeoutError(f"No response in time: {e}") from e
+        except (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+        ) as e:
+            raise WhiplashConnectionError(f"Error making request: {e}") from e
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        if response.status_code >= 400:
+            error = error_for_status(response.status_code, body)
+            logger.error(f"{method} {path} failed: {error}")
+            raise error
+        if body is None:
+            raise WhiplashAPIError("Response is not JSON", response.status_code)
+        return body
@@ -1,9 +1,15 @@
 import logging
-
-import numpy as np
+from typing import Optional
 
 from whiplash.api.client.api_config import APIConfig
 from whiplash.api.client.vector import CompVector, Vector
+from whiplash.api.client.writer import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_CONCURRENCY,
+    BatchWriter,
+)
+from whiplash.api.encoding import BINARY_CONTENT_TYPE
+from whiplash.encoding import encode_batch, encode_vector
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -38,28 +44,126 @@ class Collection:
 
         return Vector.from_dict(resp)
 
+    @property
+    def _encoding(self) -> str:
+        return "base64" if self.api.binary_vectors else "json"
+
     def insert(self, vector: Vector) -> None:
         """Insert a vector into the collection"""
         self.api.request(
             "POST",
             f"projects/{self.project_name}/collections/{self.name}/items",
-            vector.to_dict(),
+            vector.to_dict(self._encoding),
+            self.api.json_content_type,
         )
 
     def insert_batch(self, vectors: list[Vector]) -> None:
-        """Insert a list of vectors into the collection"""
+        """Insert a list of vectors into the collection in one request
+
+        Use writer for lists that may exceed the API's payload size or time
+        limits.
+        """
+        path = f"projects/{self.project_name}/collections/{self.name}/items/batch"
+        if self.api.content_type == BINARY_CONTENT_TYPE:
+            data = encode_batch(
+                [vector.id for vector in vectors],
+                [vector.vector for vector in vectors],
+            )
+            self.api.request("POST", path, data, BINARY_CONTENT_TYPE)
+            return
         self.api.request(
             "POST",
-            f"projects/{self.project_name}/collections/{self.name}/items/batch",
-            {"vectors": [vector.to_dict() for vector in vectors]},
+            path,
+            {"vectors": [vector.to_dict(self._encoding) for vector in vectors]},
+            self.api.json_content_type,
         )
 
-    def search(self, query: list[float], limit: int = 5) -> list[CompVector]:
-        """Search for the k closest vectors to the query vector"""
+    def writer(
+        self,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        **kwargs,
+    ) -> BatchWriter:
+        """Buffered writer uploading vectors in concurrent batches
+
+        See whiplash.api.client.writer.BatchWriter for the other options.
+        Keep concurrency at or below the client's pool_size.
+        """
+        return BatchWriter(self, batch_size, concurrency, **kwargs)
+
+    def search(
+        self,
+        query: list[float],
+        limit: int = 5,
+        include_vectors: bool | int = False,
+        n_probes: Optional[int] = None,
+        max_candidates: Optional[int] = None,
+        rerank: int = 0,
+    ) -> list[CompVector]:
+        """Search for the k closest vectors to the query vector
+
+        include_vectors is True to return every result's vector, or an int N
+        to only return vectors for the top N results. n_probes is the number
+        of neighboring buckets to probe per plane and max_candidates caps how
+        many vectors are scored (API defaults if None). rerank rescores the
+        top N of a quantized collection on its full precision vectors.
+        """
+        body = self._search_body(
+            limit, include_vectors, n_probes, max_candidates, rerank
+        )
+        body["query"] = self._encode_query(query)
         resp = self.api.request(
             "POST",
             f"projects/{self.project_name}/collections/{self.name}/search",
-            {"query": query, "limit": limit},
+            body,
+            self.api.json_content_type,
         )
 
         return [CompVector.from_dict(item) for item in resp]
+
+    def search_batch(
+        self,
+        queries: list[list[float]],
+        limit: int = 5,
+        include_vectors: bool | int = False,
+        n_probes: Optional[int] = None,
+        max_candidates: Optional[int] = None,
+        rerank: int = 0,
+    ) -> list[list[CompVector]]:
+        """Search for the k closest vectors to each query in a single request
+
+        Takes the same options as search and returns one result list per
+        query, in order.
+        """
+        body = self._search_body(
+            limit, include_vectors, n_probes, max_candidates, rerank
+        )
+        body["queries"] = [self._encode_query(query) for query in queries]
+        resp = self.api.request(
+            "POST",
+            f"projects/{self.project_name}/collections/{self.name}/search/batch",
+            body,
+            self.api.json_content_type,
+        )
+
+        return [[CompVector.from_dict(item) for item in results] for results in resp]
+
+    def _encode_query(self, query: list[float]):
+        return encode_vector(query) if self.api.binary_vectors else query
+
+    @staticmethod
+    def _search_body(
+        limit: int,
+        include_vectors: bool | int,
+        n_probes: Optional[int],
+        max_candidates: Optional[int],
+        rerank: int,
+    ) -> dict:
+        body = {"limit": limit, "include_vectors": include_vectors}
+        if n_probes is not None:
+            body["n_probes"] = n_probes
+        if max_candidates is not None:
+            body["max_candidates"] = max_candidates
+        if rerank:
+            body["rerank"] = rerank
+        return body
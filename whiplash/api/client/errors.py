@@ -0,0 +1,82 @@
+"""Errors raised by the API client
+
+Every failed request raises a WhiplashAPIError subclass. retryable tells
+whether the same request may succeed when sent again later. The client has
+already retried throttled and unreachable requests with backoff by the time
+they are raised, and 5xx responses and timeouts of GET requests. POSTs that
+failed with a 5xx or timed out may have been processed, so they are not
+retried and only safe to send again if they are idempotent, like inserts.
+"""
+
+from typing import Optional
+
+
+class WhiplashAPIError(Exception):
+    """A request to the Whiplash API failed"""
+
+    retryable = False
+
+    def __init__(
+        self,
+        message: str,
+        status_code: Optional[int] = None,
+        body: Optional[dict] = None,
+    ):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.body = body
+
+
+class BadRequestError(WhiplashAPIError):
+    """The API rejected the request (400)"""
+
+
+class AuthenticationError(WhiplashAPIError):
+    """The API key is missing or not allowed to make the request (401, 403)"""
+
+
+class NotFoundError(WhiplashAPIError):
+    """The project, collection or item does not exist (404)"""
+
+
+class ThrottledError(WhiplashAPIError):
+    """Too many requests (429)"""
+
+    retryable = True
+
+
+class ServerError(WhiplashAPIError):
+    """The API failed or timed out (5xx)"""
+
+    retryable = True
+
+
+class WhiplashConnectionError(WhiplashAPIError):
+    """The API could not be reached or did not answer in time"""
+
+    retryable = True
+
+
+class WhiplashTimeoutError(WhiplashConnectionError):
+    """The API did not answer in time, the request may have been processed"""
+
+
+def error_for_status(status_code: int, body: Optional[dict]) -> WhiplashAPIError:
+    """The error to raise for an unsuccessful HTTP status"""
+    message = f"HTTP {status_code}"
+    if isinstance(body, dict) and body.get("message"):
+        message = f"{message}: {body['message']}"
+    if status_code == 400:
+        error = BadRequestError
+    elif status_code in (401, 403):
+        error = AuthenticationError
+    elif status_code == 404:
+        error = NotFoundError
+    elif status_code == 429:
+        error = ThrottledError
+    elif status_code >= 500:
+        error = ServerError
+    else:
+        error = WhiplashAPIError
+    return error(message, status_code, body)
@@ -1,4 +1,12 @@
 from dataclasses import dataclass
+from typing import Optional
+
+from whiplash.encoding import decode_vector, encode_vector
+
+
+def _decode(vector):
+    # Vectors come back as base64 strings when binary encoding was requested
+    return decode_vector(vector) if isinstance(vector, str) else vector
 
 
 @dataclass
@@ -6,18 +14,21 @@ class Vector:
     id: str
     vector: list[float]
 
-    def to_dict(self):
+    def to_dict(self, encoding: str = "json"):
+        if encoding == "base64":
+            return {"id": self.id, "vector": encode_vector(self.vector)}
         return {"id": self.id, "vector": self.vector}
 
     @staticmethod
     def from_dict(item):
-        return Vector(item["id"], item["vector"])
+        return Vector(item["id"], _decode(item["vector"]))
 
 
 @dataclass
 class CompVector:
     id: str
-    vector: list[float]
+    # None unless the search asked for vectors
+    vector: Optional[list[float]]
     dist: float
 
     def __repr__(self) -> str:
@@ -25,4 +36,7 @@ class CompVector:
 
     @staticmethod
     def from_dict(item):
-        return CompVector(item["id"], item["vector"], item["dist"])
+        vector = item.get("vector")
+        return CompVector(
+            item["id"], _decode(vector) if vector is not None else None, item["dist"]
+        )
@@ -3,6 +3,8 @@ from typing import Optional
 
 from whiplash.api.client.api_config import APIConfig
 from whiplash.api.client.collection import Collection
+from whiplash.api.client.errors import NotFoundError
+from whiplash.api.encoding import JSON_CONTENT_TYPE
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -19,6 +21,11 @@ class Whiplash:
         api_url: str,
         api_key: str,
         project_name: str = "whiplash",
+        content_type: str = JSON_CONTENT_TYPE,
+        timeout: float = 30,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        pool_size: int = 10,
     ) -> None:
         if not isinstance(api_url, str) or len(api_url) == 0:
             raise ValueError("api_url must be specified as a string")
@@ -27,9 +34,27 @@ class Whiplash:
         if not isinstance(project_name, str) or len(project_name) == 0:
             project_name = "whiplash"
 
-        self.api = APIConfig(api_url, api_key)
+        self.api = APIConfig(
+            api_url,
+            api_key,
+            content_type,
+            timeout=timeout,
+            max_retries=max_retries,
+            backoff_factor=backoff_factor,
+            pool_size=pool_size,
+        )
         self.project_name = project_name
 
+    def __enter__(self) -> "Whiplash":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the pooled connections to the API"""
+        self.api.close()
+
     def get_collections(self) -> list[Collection]:
         return [
             Collection(self.api, collection["name"], self.project_name, collection)
@@ -44,26 +69,46 @@ class Whiplash:
         n_features: int,
         n_planes: int = 6,
         bit_start: int = 8,
-        bit_scale_factor: (float | int) = 2,
+        bit_scale_factor: float | int = 2,
+        metric: str = "cosine",
+        int_ids: bool = False,
+        precision: str = "float32",
+        keep_full_precision: bool = False,
+        sketch_bits: int = 0,
+        index_type: str = "lsh",
+        pq_subvectors: int = 0,
+        training_vectors: Optional[list[list[float]]] = None,
     ) -> Collection:
+        body = {
+            "name": collection_name,
+            "n_features": n_features,
+            "n_planes": n_planes,
+            "bit_start": bit_start,
+            "bit_scale_factor": bit_scale_factor,
+            "metric": metric,
+            "int_ids": int_ids,
+            "precision": precision,
+            "keep_full_precision": keep_full_precision,
+            "sketch_bits": sketch_bits,
+            "index_type": index_type,
+            "pq_subvectors": pq_subvectors,
+        }
+        if training_vectors is not None:
+            # pq collections train their codebooks on these at creation
+            body["training_vectors"] = [
+                [float(value) for value in vector] for vector in training_vectors
+            ]
         metadata = self.api.request(
-            "POST",
-            f"projects/{self.project_name}/collections",
-            {
-                "name": collection_name,
-                "n_features": n_features,
-                "n_planes": n_planes,
-                "bit_start": bit_start,
-                "bit_scale_factor": bit_scale_factor,
-            },
+            "POST", f"projects/{self.project_name}/collections", body
         )
         return Collection(self.api, collection_name, self.project_name, metadata)
 
     def get_collection(self, collection_name: str) -> Optional[Collection]:
-        metadata = self.api.request(
-            "GET",
-            f"projects/{self.project_name}/collections/{collection_name}",
-        )
-        if metadata:
-            return Collection(self.api, collection_name, self.project_name, metadata)
-        return None
+        try:
+            metadata = self.api.request(
+                "GET",
+                f"projects/{self.project_name}/collections/{collection_name}",
+            )
+        except NotFoundError:
+            return None
+        return Collection(self.api, collection_name, self.project_name, metadata)
@@ -0,0 +1,175 @@
+"""Buffered, concurrent inserts through the API
+
+    with collection.writer(batch_size=500, concurrency=8) as writer:
+        for vector in vectors:
+            writer.add(vector)
+
+Vectors are buffered into batches that stay under both batch_size and the
+request payload limit, and full batches are uploaded on a thread pool while
+the caller keeps adding. Batches that fail with a server error or time out
+are sent again with backoff, which is safe because inserts are idempotent.
+Throttled and unreachable requests were already retried by the session and
+are not retried again. Batches the gateway rejects as too large (413) are
+split in half. Leaving the block flushes what is left and raises the first
+error, with the vectors that were not written in writer.failed.
+"""
+
+import json
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Iterable, Optional
+
+from whiplash.api.client.errors import (
+    ServerError,
+    WhiplashAPIError,
+    WhiplashTimeoutError,
+)
+from whiplash.api.client.vector import Vector
+from whiplash.api.encoding import BINARY_CONTENT_TYPE
+from whiplash.encoding import BATCH_HEADER, ID_LENGTH
+
+if TYPE_CHECKING:
+    from whiplash.api.client.collection import Collection
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_CONCURRENCY = 4
+# Lambda takes 6MB request bodies and binary bodies arrive base64 encoded,
+# which leaves about 4.5MB of raw payload
+MAX_PAYLOAD_BYTES = 4_000_000
+PAYLOAD_TOO_LARGE = 413
+# Failures the session does not retry for POSTs, which may have been processed
+RESENT_ERRORS = (ServerError, WhiplashTimeoutError)
+
+
+class BatchWriter:
+    """Buffer vectors and upload them in concurrent, size-bounded batches"""
+
+    def __init__(
+        self,
+        collection: "Collection",
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        max_payload_bytes: int = MAX_PAYLOAD_BYTES,
+        max_retries: int = 3,
+        backoff_factor: float = 1.0,
+    ):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.collection = collection
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_payload_bytes = max_payload_bytes
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        # Vectors of batches that could not be written
+        self.failed: list[Vector] = []
+        self.inserted = 0
+        self._buffer: list[Vector] = []
+        self._buffer_bytes = 0
+        self._pending: dict[Future, list[Vector]] = {}
+        self._errors: list[WhiplashAPIError] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def __enter__(self) -> "BatchWriter":
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        if exc_type is None:
+            self.close()
+            return
+        # Keep the original exception, but still write what was added
+        try:
+            self.close()
+        except WhiplashAPIError as e:
+            logger.error(f"Flushing writer failed: {e}")
+
+    def _payload_size(self, vector: Vector) -> int:
+        if self.collection.api.content_type == BINARY_CONTENT_TYPE:
+            return (
+                ID_LENGTH.size + len(vector.id.encode("utf-8")) + 4 * len(vector.vector)
+            )
+        # Separator between vectors included
+        return len(json.dumps(vector.to_dict(self.collection._encoding))) + 2
+
+    def add(self, vector: Vector) -> None:
+        """Buffer a vector, uploading the buffer once it is a full batch"""
+        size = self._payload_size(vector)
+        if self._buffer and (
+            len(self._buffer) >= self.batch_size
+            or BATCH_HEADER.size + self._buffer_bytes + size > self.max_payload_bytes
+        ):
+            self._submit()
+        self._buffer.append(vector)
+        self._buffer_bytes += size
+
+    def add_many(self, vectors: Iterable[Vector]) -> None:
+        for vector in vectors:
+            self.add(vector)
+
+    def _submit(self) -> None:
+        batch = self._buffer
+        self._buffer = []
+        self._buffer_bytes = 0
+        if not batch:
+            return
+        # Bound the batches held in memory while the uploads catch up
+        while len(self._pending) >= 2 * self.concurrency:
+            done, _ = wait(self._pending, return_when=FIRST_COMPLETED)
+            self._collect(done)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        self._pending[self._executor.submit(self._upload, batch)] = batch
+
+    def _collect(self, done: Iterable[Future]) -> None:
+        for future in done:
+            batch = self._pending.pop(future)
+            try:
+                self.inserted += future.result()
+            except WhiplashAPIError as e:
+                logger.error(f"Writing {len(batch)} vectors failed: {e}")
+                self._errors.append(e)
+                self.failed.extend(batch)
+
+    def _upload(self, batch: list[Vector]) -> int:
+        attempt = 0
+        while True:
+            try:
+                self.collection.insert_batch(batch)
+                return len(batch)
+            except WhiplashAPIError as e:
+                if e.status_code == PAYLOAD_TOO_LARGE and len(batch) > 1:
+                    half = len(batch) // 2
+                    return self._upload(batch[:half]) + self._upload(batch[half:])
+                if not isinstance(e, RESENT_ERRORS) or attempt >= self.max_retries:
+                    raise
+            time.sleep(self.backoff_factor * 2**attempt)
+            attempt += 1
+
+    def flush(self) -> None:
+        """Upload the buffer and wait for every batch
+
+        Raises the first error of any batch written since the last flush.
+        """
+        self._submit()
+        if self._pending:
+            done, _ = wait(self._pending)
+            self._collect(done)
+        if self._errors:
+            error = self._errors[0]
+            self._errors = []
+            raise error
+
+    def close(self) -> None:
+        """Flush and stop the upload threads"""
+        try:
+            self.flush()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
@@ -1,22 +1,25 @@
 import os
 
-from whiplash.responses import parse_body, response
-from whiplash.whiplash import Whiplash
+import numpy as np
 
-REGION = os.environ.get("REGION")
-STAGE = os.environ.get("STAGE")
+from whiplash.api import cache
+from whiplash.collection_config import INDEX_TYPES
+from whiplash.pq import MIN_TRAINING_VECTORS
+from whiplash.quantization import PRECISIONS
+from whiplash.responses import parse_body, response
+from whiplash.vector_math import METRICS
 
 DEFAULT_N_PLANES = int(os.environ.get("DEFAULT_N_PLANES", 6))
 DEFAULT_BIT_START = int(os.environ.get("DEFAULT_BIT_START", 8))
 DEFAULT_BIT_SCALE_FACTOR = float(os.environ.get("DEFAULT_BIT_SCALE_FACTOR", 2))
+DEFAULT_METRIC = os.environ.get("DEFAULT_METRIC", "cosine")
 
 
 def get(event, context):
     # Get collection
     project_id = event["pathParameters"]["projectId"]
     collection_id = event["pathParameters"]["collectionId"]
-    whiplash = Whiplash(REGION, STAGE, project_name=project_id)
-    collection = whiplash.get_collection(collection_id)
+    collection = cache.get_collection(project_id, collection_id)
     if not collection:
         return response({"message": "Collection not found"}, 404)
     return response(collection.to_dict())
@@ -25,11 +28,33 @@ def get(event, context):
 def all(event, context):
     # List collections
     project_id = event["pathParameters"]["projectId"]
-    whiplash = Whiplash(REGION, STAGE, project_name=project_id)
+    whiplash = cache.get_whiplash(project_id)
     collections = whiplash.get_all_collections()
     return response([collection.to_dict() for collection in collections])
 
 
+def _training_vectors(body: dict, n_features: int):
+    """The training_vectors of a pq create body as a matrix, or an error response"""
+    training_vectors = body.get("training_vectors")
+    message = (
+        f"pq collections need training_vectors, a list of at least "
+        f"{MIN_TRAINING_VECTORS} vectors of n_features values"
+    )
+    if not isinstance(training_vectors, list):
+        return None, response({"message": message}, 400)
+    try:
+        matrix = np.array(training_vectors, dtype=np.float32)
+    except (TypeError, ValueError):
+        return None, response({"message": message}, 400)
+    if (
+        matrix.ndim != 2
+        or matrix.shape[0] < MIN_TRAINING_VECTORS
+        or matrix.shape[1] != n_features
+    ):
+        return None, response({"message": message}, 400)
+    return matrix, None
+
+
 def create(event, context):
     # Create project from POST body
     project_id = event["pathParameters"]["projectId"]
@@ -47,13 +72,58 @@ def create(event, context):
     n_planes = body.get("n_planes", DEFAULT_N_PLANES)
     bit_start = body.get("bit_start", DEFAULT_BIT_START)
     bit_scale_factor = body.get("bit_scale_factor", DEFAULT_BIT_SCALE_FACTOR)
+    metric = body.get("metric", DEFAULT_METRIC)
+    if metric not in METRICS:
+        return response({"message": f"metric must be one of {', '.join(METRICS)}"}, 400)
+    int_ids = body.get("int_ids", False)
+    if not isinstance(int_ids, bool):
+        return response({"message": "int_ids must be a boolean"}, 400)
+    precision = body.get("precision", "float32")
+    if precision not in PRECISIONS:
+        return response(
+            {"message": f"precision must be one of {', '.join(PRECISIONS)}"}, 400
+        )
+    keep_full_precision = body.get("keep_full_precision", False)
+    if not isinstance(keep_full_precision, bool):
+        return response({"message": "keep_full_precision must be a boolean"}, 400)
+    sketch_bits = body.get("sketch_bits", 0)
+    if not isinstance(sketch_bits, int) or sketch_bits < 0 or sketch_bits % 8:
+        return response(
+            {"message": "sketch_bits must be a non-negative multiple of 8"}, 400
+        )
+    index_type = body.get("index_type", "lsh")
+    if index_type not in INDEX_TYPES:
+        return response(
+            {"message": f"index_type must be one of {', '.join(INDEX_TYPES)}"}, 400
+        )
+    pq_subvectors = body.get("pq_subvectors", 0)
+    if index_type == "pq" and (
+        not isinstance(pq_subvectors, int)
+        or pq_subvectors < 1
+        or int(n_features) % pq_subvectors
+    ):
+        return response({"message": "pq_subvectors must divide n_features"}, 400)
+    training_vectors = None
+    if index_type == "pq":
+        training_vectors, error = _training_vectors(body, int(n_features))
+        if error:
+            return error
 
-    whiplash = Whiplash(REGION, STAGE, project_name=project_id)
+    whiplash = cache.get_whiplash(project_id)
     collection = whiplash.create_collection(
         collection_name,
         n_features=n_features,
         n_planes=int(n_planes),
         bit_start=int(bit_start),
         bit_scale_factor=float(bit_scale_factor),
+        metric=metric,
+        int_ids=int_ids,
+        precision=precision,
+        keep_full_precision=keep_full_precision,
+        sketch_bits=sketch_bits,
+        index_type=index_type,
+        pq_subvectors=pq_subvectors,
+        training_vectors=training_vectors,
     )
+    cache.invalidate(collection.collection_id)
     return response(collection.to_dict())
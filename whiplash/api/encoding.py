@@ -0,0 +1,20 @@
+"""Vector payload content types of the API handlers and the API client
+
+- JSON_CONTENT_TYPE: vectors are JSON lists of floats (the default)
+- BASE64_CONTENT_TYPE: JSON bodies where every vector is a base64 string of
+  little-endian float32 values, see whiplash.encoding.encode_vector
+- BINARY_CONTENT_TYPE: a raw batch of ids and vectors, see
+  whiplash.encoding.encode_batch
+"""
+
+JSON_CONTENT_TYPE = "application/json"
+BASE64_CONTENT_TYPE = "application/vnd.whiplash.base64+json"
+BINARY_CONTENT_TYPE = "application/octet-stream"
+CONTENT_TYPES = (JSON_CONTENT_TYPE, BASE64_CONTENT_TYPE, BINARY_CONTENT_TYPE)
+
+
+def media_type(content_type: str | None) -> str:
+    """Strip parameters such as charset from a Content-Type/Accept value"""
+    if not content_type:
+        return JSON_CONTENT_TYPE
+    return content_type.split(";")[0].strip().lower()
@@ -4,20 +4,57 @@ from venv import logger
 
 import numpy as np
 
+from whiplash.api import cache
+from whiplash.api.encoding import BASE64_CONTENT_TYPE, BINARY_CONTENT_TYPE, media_type
 from whiplash.collection import Collection
-from whiplash.responses import error_response, parse_body, response
+from whiplash.encoding import decode_batch_bytes, decode_vector_bytes
+from whiplash.responses import (
+    error_response,
+    get_header,
+    parse_binary_body,
+    parse_body,
+    response,
+)
 from whiplash.vector import Vector
-from whiplash.whiplash import Whiplash
 
-REGION = os.environ.get("REGION")
-STAGE = os.environ.get("STAGE")
+# Neighboring buckets probed per plane when a search does not say
+DEFAULT_N_PROBES = int(os.environ.get("DEFAULT_N_PROBES", 0))
+# Most candidates a search scores when it does not say (0 scores them all)
+DEFAULT_MAX_CANDIDATES = int(os.environ.get("DEFAULT_MAX_CANDIDATES", 0))
+# Most queries a single batch search takes
+MAX_SEARCH_BATCH = int(os.environ.get("MAX_SEARCH_BATCH", 200))
 
 
 def _get_collection(event) -> Optional[Collection]:
     project_id = event["pathParameters"]["projectId"]
     collection_id = event["pathParameters"]["collectionId"]
-    whiplash = Whiplash(REGION, STAGE, project_name=project_id)
-    return whiplash.get_collection(collection_id)
+    return cache.get_collection(project_id, collection_id)
+
+
+def _request_encoding(event) -> str:
+    return media_type(get_header(event, "Content-Type"))
+
+
+def _response_encoding(event) -> str:
+    # Vectors are only sent back as base64 when the caller asks for it
+    accept = media_type(get_header(event, "Accept"))
+    return "base64" if accept == BASE64_CONTENT_TYPE else "json"
+
+
+def _parse_vector(value, encoding: str, n_features: int) -> Optional[np.ndarray]:
+    """Parse a JSON float list, or a base64 float32 string for base64 bodies"""
+    try:
+        if encoding == BASE64_CONTENT_TYPE and isinstance(value, str):
+            vector = np.frombuffer(decode_vector_bytes(value), dtype="<f4")
+        elif isinstance(value, list):
+            vector = np.array(value, dtype=np.float32)
+        else:
+            return None
+    except ValueError:
+        return None
+    if vector.ndim != 1 or len(vector) != n_features:
+        return None
+    return vector.astype(np.float32)
 
 
 def get(event, context):
@@ -35,7 +72,59 @@ def get(event, context):
     if not item:
         return error_response("Item not found", 404)
 
-    return response(item.to_dict())
+    return response(item.to_dict(_response_encoding(event)))
+
+
+def _non_negative_int(value) -> bool:
+    # bool is a subclass of int, but true is not a count
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+
+def _search_options(body: dict, collection: Collection):
+    """Parse the search options shared by single and batch searches"""
+    try:
+        limit = int(body.get("limit", 5))
+    except (TypeError, ValueError):
+        limit = 0
+    if limit < 1 or isinstance(body.get("limit"), bool):
+        return None, error_response("'limit' must be a positive integer")
+    # true/false for every result, or a number to only include the top N
+    include_vectors = body.get("include_vectors", False)
+    if not isinstance(include_vectors, (bool, int)):
+        return None, error_response("'include_vectors' must be a boolean or an integer")
+
+    n_probes = body.get("n_probes", DEFAULT_N_PROBES)
+    if not _non_negative_int(n_probes):
+        return None, error_response("'n_probes' must be a non-negative integer")
+
+    max_candidates = body.get("max_candidates", DEFAULT_MAX_CANDIDATES)
+    if not _non_negative_int(max_candidates):
+        return None, error_response("'max_candidates' must be a non-negative integer")
+
+    # Quantized collections can rescore their top N on float32 copies
+    rerank = body.get("rerank", 0)
+    if not _non_negative_int(rerank):
+        return None, error_response("'rerank' must be a non-negative integer")
+    if rerank and collection.quantized and not collection.keeps_full_precision:
+        return None, error_response(
+            "'rerank' needs a collection created with keep_full_precision"
+        )
+
+    return {
+        "k": limit,
+        "include_vectors": include_vectors,
+        "n_probes": n_probes,
+        "max_candidates": max_candidates or None,
+        "rerank": rerank,
+    }, None
+
+
+def _stats_headers(stats) -> dict:
+    return {
+        "X-Whiplash-Candidates": str(stats.candidates),
+        "X-Whiplash-Scored": str(stats.scored),
+        "Access-Control-Expose-Headers": "X-Whiplash-Candidates, X-Whiplash-Scored",
+    }
 
 
 def search(event, context):
@@ -49,23 +138,57 @@ def search(event, context):
     if not body or error:
         return error
 
-    query = body.get("query", None)
-    limit = body.get("limit", 5)
-
-    if (
-        not query
-        or not isinstance(query, list)
-        or len(query) != collection.config.n_features
-    ):
+    query = _parse_vector(
+        body.get("query", None), _request_encoding(event), collection.config.n_features
+    )
+    if query is None:
         return error_response(
             "'query' is required and must be a n_features length list of floats"
         )
+    options, error = _search_options(body, collection)
+    if error:
+        return error
+
+    results, stats = collection.search_with_stats(query, **options)
+    encoding = _response_encoding(event)
+    return response(
+        [result.to_dict(encoding) for result in results],
+        headers=_stats_headers(stats),
+    )
 
-    query = np.array(query, dtype=np.float32)
-    limit = int(limit)
 
-    results = collection.search(query, k=limit)
-    return response([result.to_dict() for result in results])
+def search_batch(event, context):
+    # Search collection for many queries at once
+    collection = _get_collection(event)
+
+    if not collection:
+        return error_response("Collection not found", 404)
+
+    body, error = parse_body(event)
+    if not body or error:
+        return error
+
+    values = body.get("queries", None)
+    if not isinstance(values, list) or not values:
+        return error_response("'queries' is required and must be a list of vectors")
+    if len(values) > MAX_SEARCH_BATCH:
+        return error_response(f"At most {MAX_SEARCH_BATCH} queries per batch")
+    encoding = _request_encoding(event)
+    queries = [
+        _parse_vector(value, encoding, collection.config.n_features) for value in values
+    ]
+    if any(query is None for query in queries):
+        return error_response("Every query must be a n_features length list of floats")
+    options, error = _search_options(body, collection)
+    if error:
+        return error
+
+    results, stats = collection.search_many_with_stats(np.stack(queries), **options)
+    encoding = _response_encoding(event)
+    return response(
+        [[result.to_dict(encoding) for result in query] for query in results],
+        headers=_stats_headers(stats),
+    )
 
 
 def create(event, context):
@@ -81,14 +204,33 @@ def create(event, context):
     vector_id = body.get("id", None)
     if not vector_id:
         return error_response("'id' required")
-    vector = body.get("vector", None)
-    if not vector or len(vector) != collection.config.n_features:
+    vector = _parse_vector(
+        body.get("vector", None), _request_encoding(event), collection.config.n_features
+    )
+    if vector is None:
         return error_response("'vector' required and must match 'n_features' in size")
-    vector = Vector(vector_id, vector)
-    collection.insert(vector)
+    collection.insert(Vector(vector_id, vector))
     return response({"message": "success"})
 
 
+def _parse_binary_batch(event, n_features: int):
+    body, error = parse_binary_body(event)
+    if body is None or error:
+        return None, error
+    try:
+        ids, batch_features, raw = decode_batch_bytes(body)
+    except (ValueError, UnicodeDecodeError) as e:
+        return None, error_response(f"Invalid binary batch: {e}")
+    if not ids:
+        return None, error_response("'vectors' required")
+    if batch_features != n_features:
+        return None, error_response("'vector' must match 'n_features' in size")
+    if not all(ids):
+        return None, error_response("'id' required")
+    matrix = np.frombuffer(raw, dtype="<f4").reshape(len(ids), n_features)
+    return [Vector(i, row.astype(np.float32)) for i, row in zip(ids, matrix)], None
+
+
 def create_batch(event, context):
     # Create items from POST body
     collection = _get_collection(event)
@@ -96,6 +238,14 @@ def create_batch(event, context):
     if not collection:
         return error_response("Collection not found", 404)
 
+    encoding = _request_encoding(event)
+    if encoding == BINARY_CONTENT_TYPE:
+        items, error = _parse_binary_batch(event, collection.config.n_features)
+        if error:
+            return error
+        collection.insert_many(items)
+        return response({"message": "success"})
+
     body, error = parse_body(event)
     if not body or error:
         return error
@@ -104,16 +254,20 @@ def create_batch(event, context):
     if not vectors:
         return error_response("'vectors' required")
 
+    items = []
     for vector in vectors:
         vector_id = vector.get("id", None)
         if not vector_id:
             return error_response("'id' required")
-        vec = vector.get("vector", None)
-        if not vec or len(vec) != collection.config.n_features:
+        vec = _parse_vector(
+            vector.get("vector", None), encoding, collection.config.n_features
+        )
+        if vec is None:
             return error_response(
                 "'vector' required and must match 'n_features' in size"
             )
 
-        collection.insert(Vector(vector_id, np.array(vec, dtype=np.float32)))
+        items.append(Vector(vector_id, vec))
 
+    collection.insert_many(items)
     return response({"message": "success"})
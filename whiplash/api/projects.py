@@ -1,17 +1,10 @@
-import os
-
+from whiplash.api import cache
 from whiplash.responses import error_response, response
-from whiplash.whiplash import Whiplash
-
-REGION = os.environ.get("REGION")
-STAGE = os.environ.get("STAGE")
 
 
 def get(event, context):
     # Get project metadata
-    whiplash = Whiplash(
-        REGION, STAGE, project_name=event["pathParameters"]["projectId"]
-    )
+    whiplash = cache.get_whiplash(event["pathParameters"]["projectId"])
     collections = [
         collection.to_dict()
         for collection in whiplash.get_all_collections()
@@ -31,7 +24,7 @@ def get(event, context):
 
 def all(event, context):
     # List projects
-    whiplash = Whiplash(REGION, STAGE)
+    whiplash = cache.get_whiplash("whiplash")
     collections = whiplash.get_all_collections()
     projects = {}
     for collection in collections:
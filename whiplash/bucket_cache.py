@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+BUCKET_CACHE_MAX_BYTES = int(os.environ.get("BUCKET_CACHE_MAX_BYTES", 0))
+BUCKET_CACHE_TTL = float(os.environ.get("BUCKET_CACHE_TTL", 60))
+
+# Rough per-entry overhead of a Python str inside a set
+ID_OVERHEAD_BYTES = 64
+# Invalidated keys remembered to refuse puts of items read before them
+MAX_INVALIDATIONS = 10_000
+
+
+@dataclass
+class BucketCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    size_bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def bucket_size(item: dict) -> int:
+    """Approximate the in-memory size of a bucket item in bytes"""
+    return (
+        len(item.get("id", ""))
+        + sum(len(cid) + ID_OVERHEAD_BYTES for cid in item.get("ids", ()))
+        + sum(len(chunk) for chunk in item.get("postings", ()))
+    )
+
+
+class BucketCache:
+    """In-process LRU cache of bucket items bounded by size in bytes
+
+    Entries are served for at most ttl seconds, so buckets written by other
+    processes are picked up within that staleness window. Inserts through the
+    owning Collection invalidate the buckets they touch immediately.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = BUCKET_CACHE_MAX_BYTES,
+        ttl: Optional[float] = BUCKET_CACHE_TTL,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, int, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = BucketCacheStats()
+        # Bumped by every invalidate, keys map to their last invalidation
+        self._generation = 0
+        self._invalidations: OrderedDict[str, int] = OrderedDict()
+        self._forgotten = 0
+
+    def __repr__(self) -> str:
+        return f"BucketCache(max_bytes={self.max_bytes}, ttl={self.ttl})"
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_many(self, keys: list[str]) -> tuple[dict[str, dict], list[str]]:
+        """Look up bucket keys, returning the cached items and the missing keys"""
+        found = {}
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and self.ttl is not None and entry[0] < now:
+                    self._remove(key)
+                    entry = None
+                if entry is None:
+                    self._stats.misses += 1
+                    missing.append(key)
+                    continue
+                self._entries.move_to_end(key)
+                self._stats.hits += 1
+                found[key] = entry[2]
+        return found, missing
+
+    @property
+    def generation(self) -> int:
+        """Count of invalidations, to pass to put_many before reading items"""
+        return self._generation
+
+    def put_many(self, items: dict[str, dict], since: Optional[int] = None) -> None:
+        """Cache bucket items by key, evicting the least recently used
+
+        Items read at generation since are skipped if invalidated meanwhile, so
+        a read racing a write cannot cache the bucket as it was before.
+        """
+        expires = time.monotonic() + (self.ttl or 0)
+        with self._lock:
+            for key, item in items.items():
+                size = bucket_size(item)
+                if size > self.max_bytes or self._invalidated_since(key, since):
+                    continue
+                self._remove(key)
+                self._entries[key] = (expires, size, item)
+                self._stats.size_bytes += size
+            while self._stats.size_bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self._stats.evictions += 1
+
+    def invalidate(self, keys: Optional[list[str]] = None) -> None:
+        """Drop the given bucket keys, or every entry if no keys are given"""
+        with self._lock:
+            self._generation += 1
+            if keys is None:
+                self._invalidations.clear()
+                self._forgotten = self._generation
+            for key in list(self._entries) if keys is None else keys:
+                self._remove(key)
+            for key in keys or ():
+                self._invalidations[key] = self._generation
+                self._invalidations.move_to_end(key)
+            while len(self._invalidations) > MAX_INVALIDATIONS:
+                _, self._forgotten = self._invalidations.popitem(last=False)
+
+    def stats(self) -> BucketCacheStats:
+        """Snapshot of the hit/miss counters and current size"""
+        with self._lock:
+            return BucketCacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                evictions=self._stats.evictions,
+                entries=len(self._entries),
+                size_bytes=self._stats.size_bytes,
+            )
+
+    def _invalidated_since(self, key: str, since: Optional[int]) -> bool:
+        if since is None:
+            return False
+        return max(self._forgotten, self._invalidations.get(key, 0)) > since
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._stats.size_bytes -= entry[1]
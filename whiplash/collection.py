@@ -1,33 +1,163 @@
+import copy
 import logging
 import os
+import threading
+import uuid
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Callable, Optional
 
 import numpy as np
 from xxhash import xxh64
 
-from whiplash.collection_config import CollectionConfig
+from whiplash.bucket_cache import BucketCache
+from whiplash.collection_config import CollectionConfig, shard_key
 from whiplash.hashing import vector_plane_hash
-from whiplash.storage import DynamoStorage
+from whiplash.importer import (
+    IMPORT_CHUNK_SIZE,
+    checkpoint_path,
+    read_checkpoint,
+    read_chunks,
+    write_checkpoint,
+)
+from whiplash.pq import (
+    MIN_TRAINING_VECTORS,
+    adc_scores,
+    adc_tables,
+    decode,
+    encode,
+    train_codebooks,
+)
+from whiplash.postings import (
+    ID_COUNTER_KEY,
+    decode_postings,
+    decode_sketch_postings,
+    encode_postings,
+    internal_key,
+    parse_internal_key,
+    rank_postings,
+    union_postings,
+)
+from whiplash.quantization import dequantize, quantize, score_int8
+from whiplash.sketches import (
+    compute_sketches,
+    parse_sketch_entries,
+    sketch_entries,
+    sketch_order,
+    sketch_postings,
+)
+from whiplash.snapshot import write_snapshot
+from whiplash.storage import BatchReadStats, DynamoStorage, Storage, Table
 from whiplash.vector import CompVector, Vector
-from whiplash.vector_math import cosine_similarity, cosine_similarity_bulk
+from whiplash.vector_math import (
+    normalize_bulk,
+    score_bulk,
+    score_many,
+    top_k_of_scores,
+    top_k_scores,
+)
 
 MAX_ITEMS_PER_BUCKET = int(os.environ.get("MAX_ITEMS_PER_BUCKET", 10000))
+# Ids per bucket item before the bucket spills into another shard item
+BUCKET_SHARD_SIZE = int(os.environ.get("BUCKET_SHARD_SIZE", 2000))
+# Append a finer plane when a plane's buckets start to saturate
+AUTO_GROW_PLANES = os.environ.get("AUTO_GROW_PLANES", "true").lower() == "true"
+MAX_PLANES = int(os.environ.get("MAX_PLANES", 12))
+# Candidates fetched and scored per round when a search has a budget
+CANDIDATE_ROUND_SIZE = int(os.environ.get("CANDIDATE_ROUND_SIZE", 500))
+# Vectors fetched per result when sketches rank the candidates
+SKETCH_OVERSAMPLE = int(os.environ.get("SKETCH_OVERSAMPLE", 10))
+# Parallel scan segments of the vector table when exporting
+EXPORT_SEGMENTS = int(os.environ.get("EXPORT_SEGMENTS", 4))
+# Vectors indexed into new planes per backfill page, the cursor is saved after each
+BACKFILL_PAGE_SIZE = int(os.environ.get("BACKFILL_PAGE_SIZE", 1000))
+# Backfill pages every insert resumes while a backfill is unfinished
+BACKFILL_PAGES_PER_INSERT = int(os.environ.get("BACKFILL_PAGES_PER_INSERT", 1))
+# Bytes of PQ codebooks per metadata item, under DynamoDB's 400KB item limit
+PQ_CHUNK_BYTES = 300_000
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
+@dataclass
+class SearchStats:
+    """What a single search touched, for tuning and benchmarking"""
+
+    buckets: int = 0
+    candidates: int = 0
+    scored: int = 0
+    rounds: int = 0
+    stopped_early: bool = False
+    keys_retried: int = 0
+    keys_dropped: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "buckets": self.buckets,
+            "candidates": self.candidates,
+            "scored": self.scored,
+            "rounds": self.rounds,
+            "stopped_early": self.stopped_early,
+            "keys_retried": self.keys_retried,
+            "keys_dropped": self.keys_dropped,
+        }
+
+
+def vectors_to_include(include_vectors: bool | int, n_results: int) -> int:
+    """Number of top results that should carry their stored vector"""
+    if isinstance(include_vectors, bool):
+        return n_results if include_vectors else 0
+    return max(0, min(int(include_vectors), n_results))
+
+
+def rank_candidates(buckets: list[dict], key_weights: dict[str, int]) -> list[str]:
+    """Order candidate ids by their summed bucket weights, then by hit count"""
+    weights: Counter = Counter()
+    hits: Counter = Counter()
+    for bucket in buckets:
+        weight = key_weights.get(bucket["id"], 0)
+        for cid in bucket.get("ids", set()):
+            weights[cid] += weight
+            hits[cid] += 1
+    return sorted(hits, key=lambda cid: (weights[cid], hits[cid]), reverse=True)
+
+
 class Collection:
     """A collection of vectors with LSH indexing and retrieval"""
 
     def __init__(
         self,
         config: CollectionConfig,
+        bucket_cache: Optional[BucketCache] = None,
+        storage: Optional[Storage] = None,
+        metadata_table: Optional[Table] = None,
     ):
         self.collection_id = config.id
-        storage = DynamoStorage()
+        if storage is None:
+            storage = DynamoStorage()
+        self.storage = storage
         self.vector_table = storage.get_table(f"{self.collection_id}_vectors")
         self.bucket_table = storage.get_table(f"{self.collection_id}_buckets")
+        # Maps vector ids to internal ids, for int_ids collections
+        self.id_table = storage.get_table(f"{self.collection_id}_ids")
+        # float32 copies of quantized vectors, for keep_full_precision collections
+        self.full_table = storage.get_table(f"{self.collection_id}_full_vectors")
         self.config = config
+        self.bucket_cache = bucket_cache
+        # Spill-over shard counts seen so far, the count on a bucket's first
+        # item is the one that counts and is not kept in the config
+        self.bucket_shards: dict[str, int] = {}
+        # Where the config is saved when planes grow, None keeps changes local
+        self.metadata_table = metadata_table
+        # Lambda freezes the process between invocations, stalling threads there
+        self.background_backfill = "AWS_LAMBDA_FUNCTION_NAME" not in os.environ
+        self.backfill_thread: Optional[threading.Thread] = None
+        self._config_lock = threading.RLock()
+        self._backfill_lock = threading.Lock()
+        self._shards_lock = threading.Lock()
+        if config.index_type == "pq" and config.pq_codebooks is None:
+            self.load_pq_codebooks()
 
     def __repr__(self) -> str:
         return f"Collection(collection_id={self.collection_id}, config={self.config})"
@@ -36,8 +166,16 @@ class Collection:
         return self.config.to_dict()
 
     @staticmethod
-    def from_dict(data: dict):
-        return Collection(CollectionConfig.from_dict(data))
+    def from_dict(
+        data: dict,
+        storage: Optional[Storage] = None,
+        metadata_table: Optional[Table] = None,
+    ):
+        return Collection(
+            CollectionConfig.from_dict(data),
+            storage=storage,
+            metadata_table=metadata_table,
+        )
 
     def hash_key(self, vector: np.ndarray, plane_id: int) -> str:
         """Compute the hash code for a vector and plane"""
@@ -52,59 +190,1055 @@ class Collection:
         """Create the collection"""
         self.vector_table.create_table()
         self.bucket_table.create_table()
+        if self.config.int_ids:
+            self.id_table.create_table()
+        if self.keeps_full_precision:
+            self.full_table.create_table()
+
+    @property
+    def quantized(self) -> bool:
+        """Whether stored vectors are lossy, quantized or PQ codes"""
+        return self.config.precision != "float32" or self.config.index_type == "pq"
+
+    @property
+    def keeps_full_precision(self) -> bool:
+        """Whether float32 copies are stored next to quantized vectors"""
+        return self.config.keep_full_precision and self.quantized
+
+    @property
+    def can_grow_planes(self) -> bool:
+        """Whether stored vectors hash like the inserted ones, so planes can grow"""
+        return not self.quantized or self.keeps_full_precision
 
     def get_item(self, id: str) -> Vector:
         """Get a single vector by id"""
-        item = self.vector_table.get(id)
+        if self.config.int_ids:
+            alias = self.id_table.get(id)
+            item = self.vector_table.get(internal_key(alias["iid"])) if alias else None
+        else:
+            item = self.vector_table.get(id)
         if not item:
             raise ValueError(f"Vector with id not found: {id}")
-        return Vector.from_dynamo(item)
+        return self._to_vectors([item])[0]
 
     def get_bulk_items(self, ids: list[str]) -> list[Vector]:
         """Get a list of vectors by id"""
-        data = self.vector_table.get_bulk(ids)
-        return [Vector.from_dynamo(item) for item in data]
+        if self.config.int_ids:
+            aliases = self.id_table.get_bulk(ids)
+            ids = [internal_key(alias["iid"]) for alias in aliases]
+        return self._to_vectors(self.vector_table.get_bulk(ids))
+
+    def _to_vectors(self, items: list[dict]) -> list[Vector]:
+        """Decode stored vector items, from their float32 copies when kept"""
+        if not items:
+            return []
+        if self.keeps_full_precision:
+            full = self.full_table.get_bulk([item["id"] for item in items])
+            by_key = {item["id"]: item for item in full}
+            matrix = self._decode_full([by_key[item["id"]] for item in items])
+        else:
+            matrix = self._decode_matrix(items)
+        return [
+            Vector(self._external_item(item)["id"], row)
+            for item, row in zip(items, matrix)
+        ]
+
+    def _decode_matrix(self, items: list[dict]) -> np.ndarray:
+        """Stack the stored vectors of items into one float32 matrix
+
+        pq collections reconstruct approximate vectors from their codes.
+        """
+        if not items:
+            return np.empty((0, self.config.n_features), dtype=np.float32)
+        if self.config.index_type == "pq":
+            return decode(self._pq_codes(items), self.config.pq_codebooks)
+        return dequantize(
+            [item["vector"] for item in items],
+            self.config.n_features,
+            self.config.precision,
+        )
+
+    def _decode_full(self, items: list[dict]) -> np.ndarray:
+        """Stack the float32 copies of items into one matrix"""
+        return dequantize(
+            [item["vector"] for item in items], self.config.n_features, "float32"
+        )
+
+    def _pq_codes(self, items: list[dict]) -> np.ndarray:
+        """The (N, pq_subvectors) uint8 codes of pq vector items"""
+        codes = np.frombuffer(b"".join(item["pq"] for item in items), dtype=np.uint8)
+        return codes.reshape(len(items), self.config.pq_subvectors)
+
+    def _score_items(
+        self,
+        query: np.ndarray,
+        items: list[dict],
+        metric: str,
+        pq_tables: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Score vector items against the query, by lookup for pq codes"""
+        if pq_tables is not None:
+            return adc_scores(pq_tables, self._pq_codes(items), metric)
+        if self.config.precision == "int8":
+            return self._score_items_many(query[np.newaxis], items, metric)[0]
+        return score_bulk(query, self._decode_matrix(items), metric)
+
+    def train_pq(self, sample: np.ndarray) -> bool:
+        """Train the PQ codebooks on a sample, False if the collection has some"""
+        if self.config.index_type != "pq":
+            raise ValueError("Only pq collections have codebooks")
+        sample = np.atleast_2d(np.asarray(sample, dtype=np.float32))
+        if len(sample) < MIN_TRAINING_VECTORS:
+            raise ValueError(
+                f"PQ codebooks need at least {MIN_TRAINING_VECTORS} training vectors"
+            )
+        if self.config.normalized:
+            sample = normalize_bulk(sample)
+        return self.save_pq_codebooks(
+            train_codebooks(sample, self.config.pq_subvectors)
+        )
+
+    def _pq_chunk_key(self, token: str, chunk: int) -> str:
+        return f"{self.collection_id}#pq#{token}#{chunk}"
+
+    def save_pq_codebooks(self, codebooks: np.ndarray) -> bool:
+        """Store PQ codebooks unless the collection has some, returning whether it did"""
+        codebooks = np.asarray(codebooks, dtype=np.float32)
+        if self.metadata_table is None:
+            self._set_pq_codebooks(codebooks)
+            return True
+        data = codebooks.astype("<f4").tobytes()
+        token = uuid.uuid4().hex
+        chunks = [
+            {
+                "id": self._pq_chunk_key(token, i),
+                "data": data[start : start + PQ_CHUNK_BYTES],
+            }
+            for i, start in enumerate(range(0, len(data), PQ_CHUNK_BYTES))
+        ]
+        self.metadata_table.put_bulk(chunks)
+        head = {
+            "id": f"{self.collection_id}#pq_codebooks",
+            "token": token,
+            "chunks": len(chunks),
+            "shape": list(codebooks.shape),
+        }
+        if self.metadata_table.put_if_absent(head):
+            self._set_pq_codebooks(codebooks)
+            return True
+        for chunk in chunks:
+            self.metadata_table.delete(chunk["id"])
+        self.load_pq_codebooks()
+        return False
+
+    def load_pq_codebooks(self) -> None:
+        """Read the stored PQ codebooks into the config, if there are any"""
+        if self.metadata_table is None:
+            return
+        head = self.metadata_table.get(f"{self.collection_id}#pq_codebooks")
+        if head is None:
+            return
+        keys = [
+            self._pq_chunk_key(head["token"], i) for i in range(int(head["chunks"]))
+        ]
+        chunks = {
+            item["id"]: item["data"] for item in self.metadata_table.get_bulk(keys)
+        }
+        data = b"".join(bytes(chunks[key]) for key in keys)
+        self._set_pq_codebooks(
+            np.frombuffer(data, dtype="<f4").reshape(
+                [int(size) for size in head["shape"]]
+            )
+        )
+
+    def _set_pq_codebooks(self, codebooks: np.ndarray) -> None:
+        # Under the config lock, so a config being replaced cannot drop them
+        with self._config_lock:
+            self.config.pq_codebooks = codebooks
+
+    @staticmethod
+    def _external_item(item: dict) -> dict:
+        """A vector item keyed by its vector id, whichever way it is stored"""
+        if "vid" in item:
+            return {**item, "id": item["vid"]}
+        return item
+
+    def _internal_ids(self, ids: list[str]) -> tuple[list[int], set[str]]:
+        """Internal ids of vector ids, and the vector ids newly assigned one here"""
+        known = {item["id"]: int(item["iid"]) for item in self.id_table.get_bulk(ids)}
+        assigned: set[str] = set()
+        new_ids = [
+            vector_id for vector_id in dict.fromkeys(ids) if vector_id not in known
+        ]
+        if new_ids:
+            # A single counter bump reserves a contiguous block of internal ids
+            end = self.bucket_table.increment_column(
+                ID_COUNTER_KEY, "next_id", len(new_ids)
+            )
+            if end >= 2**32:
+                raise ValueError("Collection ran out of 32-bit internal ids")
+            start = end - len(new_ids)
+            aliases = {vector_id: start + i for i, vector_id in enumerate(new_ids)}
+            written = self.id_table.put_bulk_if_absent(
+                [{"id": vector_id, "iid": iid} for vector_id, iid in aliases.items()]
+            )
+            assigned = {
+                vector_id for vector_id, stored in zip(aliases, written) if stored
+            }
+            known.update({vector_id: aliases[vector_id] for vector_id in assigned})
+            lost = [vector_id for vector_id in aliases if vector_id not in assigned]
+            if lost:
+                # Another insert aliased these first, its internal ids win
+                for item in self.id_table.get_bulk(lost):
+                    known[item["id"]] = int(item["iid"])
+        return [known[vector_id] for vector_id in ids], assigned
 
     def insert(self, vector: Vector) -> None:
         """Insert a vector into the collection"""
+        self.insert_many([vector])
+
+    def insert_many(self, vectors: list[Vector]) -> None:
+        """Insert a batch of vectors, coalescing bucket writes across the batch"""
         if not self.config.uniform_planes:
             raise ValueError("Uniform planes must be created before inserting")
+        if not vectors:
+            return
+
+        matrix = np.stack([np.asarray(vector.vector) for vector in vectors])
+        if self.config.normalized:
+            # Store unit vectors so cosine search is a plain dot product
+            matrix = normalize_bulk(matrix.astype(np.float32))
+            vectors = [Vector(vector.id, row) for vector, row in zip(vectors, matrix)]
+        ids = [vector.id for vector in vectors]
+        if self.config.index_type == "pq":
+            if self.config.pq_codebooks is None:
+                # Another container may have trained them since this one loaded
+                self.load_pq_codebooks()
+            if self.config.pq_codebooks is None:
+                raise ValueError("pq collections must be trained before inserting")
+            items = [
+                {"id": vector_id, "pq": codes.tobytes()}
+                for vector_id, codes in zip(
+                    ids, encode(matrix, self.config.pq_codebooks)
+                )
+            ]
+        else:
+            items = [
+                {"id": vector_id, "vector": data}
+                for vector_id, data in zip(ids, quantize(matrix, self.config.precision))
+            ]
+        full_items = (
+            [vector.to_dynamo() for vector in vectors]
+            if self.keeps_full_precision
+            else []
+        )
+        rows = list(range(len(ids)))
+        if self.config.int_ids:
+            vector_ids = ids
+            ids, assigned = self._internal_ids(vector_ids)
+            for item, internal_id in zip(items, ids):
+                item["vid"] = item["id"]
+                item["id"] = internal_key(internal_id)
+            for item, internal_id in zip(full_items, ids):
+                item["id"] = internal_key(internal_id)
+            # Postings are appended, so only ids new to the collection get them,
+            # hashed from the last row of the id, which is the vector stored
+            last_rows = {vector_id: row for row, vector_id in enumerate(vector_ids)}
+            rows = [
+                row for vector_id, row in last_rows.items() if vector_id in assigned
+            ]
+        self.vector_table.put_bulk(items)
+        if full_items:
+            self.full_table.put_bulk(full_items)
+        if rows:
+            bucket_ids, bucket_planes = self._group_by_bucket(
+                [ids[row] for row in rows], matrix[rows]
+            )
+            self._add_to_buckets(bucket_ids, bucket_planes)
+        if self.config.backfill_cursors:
+            # Inserts carry on backfills that were interrupted or left to them
+            self.backfill(BACKFILL_PAGES_PER_INSERT)
+
+    def import_file(
+        self,
+        path: str,
+        id_column: Optional[str] = None,
+        vector_column: Optional[str] = None,
+        chunk_size: int = IMPORT_CHUNK_SIZE,
+        checkpoint: Optional[str] = None,
+    ) -> int:
+        """Insert every vector of a file, resuming from its checkpoint if any
+
+        See whiplash.importer for the formats. Returns the rows inserted.
+        """
+        checkpoint = checkpoint or checkpoint_path(path)
+        start = read_checkpoint(checkpoint, self.collection_id)
+        if start:
+            logger.info(f"Resuming import of {path} at row {start}")
+        rows = start
+        for ids, matrix in read_chunks(
+            path, chunk_size, start, id_column, vector_column
+        ):
+            self.insert_many([Vector(i, row) for i, row in zip(ids, matrix)])
+            rows += len(ids)
+            write_checkpoint(checkpoint, self.collection_id, rows)
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        return rows - start
+
+    def export(self, path: str, segments: int = EXPORT_SEGMENTS) -> int:
+        """Write a snapshot of the collection to a directory, returning its size"""
+
+        def chunks():
+            for items in self.vector_table.scan_pages(segments):
+                vectors = self._to_vectors(items)
+                if vectors:
+                    yield [vector.id for vector in vectors], np.stack(
+                        [vector.vector for vector in vectors]
+                    )
+
+        return write_snapshot(path, self.config, chunks())
+
+    def _group_by_bucket(
+        self, ids: list, matrix: np.ndarray, plane_ids: Optional[list[int]] = None
+    ) -> tuple[dict[str, set], dict[str, set[int]]]:
+        """Group vector ids by bucket so each bucket gets a single ADD
+
+        Also returns the planes each bucket key was hashed from. Only the
+        given planes are used when plane_ids is set. Collections with
+        sketches group bucket entries that carry the sketch of each vector.
+        """
+        if self.config.sketch_bits:
+            sketches = compute_sketches(matrix, self.config.sketch_planes)
+            if self.config.int_ids:
+                ids = sketch_postings(ids, sketches)
+            else:
+                ids = sketch_entries(ids, sketches)
+        all_plane_ids = list(self.config.uniform_planes)
+        if plane_ids is None:
+            plane_ids = all_plane_ids
+        columns = [all_plane_ids.index(plane_id) for plane_id in plane_ids]
+        bucket_ids: dict[str, set] = defaultdict(set)
+        bucket_planes: dict[str, set[int]] = defaultdict(set)
+        for vector_id, bucket_keys in zip(ids, self.config.hash_vectors(matrix)):
+            for column, plane_id in zip(columns, plane_ids):
+                bucket_ids[bucket_keys[column]].add(vector_id)
+                bucket_planes[bucket_keys[column]].add(plane_id)
+        return bucket_ids, bucket_planes
+
+    def _add_to_buckets(
+        self, bucket_ids: dict[str, set], bucket_planes: dict[str, set[int]]
+    ) -> None:
+        """Add ids to their buckets, saturating full ones and growing planes"""
+        saturated = self.config.saturated_keys()
+        full = []
+        for bucket_key, ids in bucket_ids.items():
+            if bucket_key not in saturated and not self._add_to_bucket(bucket_key, ids):
+                full.append(bucket_key)
+        if self.bucket_cache is not None:
+            self.bucket_cache.invalidate(
+                [
+                    key
+                    for bucket_key in bucket_ids
+                    for key in self.shard_keys(bucket_key)
+                ]
+            )
+        if not full:
+            return
+
+        new_planes: set[int] = set()
+
+        def saturate(config: CollectionConfig) -> bool:
+            new_planes.clear()
+            changed = False
+            for bucket_key in full:
+                for plane_id in bucket_planes[bucket_key]:
+                    keys = config.saturated_buckets.setdefault(plane_id, set())
+                    if not keys:
+                        new_planes.add(plane_id)
+                    if bucket_key not in keys:
+                        keys.add(bucket_key)
+                        changed = True
+            return changed
+
+        self._update_config(saturate)
+        logger.info(f"Saturated buckets {full} in {self.collection_id}")
+
+        n_planes = min(len(new_planes), MAX_PLANES - len(self.config.uniform_planes))
+        if AUTO_GROW_PLANES and n_planes > 0:
+            if self.can_grow_planes:
+                self.grow_planes(n_planes)
+            else:
+                logger.warning(
+                    f"Not growing planes of {self.collection_id}, "
+                    "quantized collections need keep_full_precision to grow"
+                )
+
+    def _add_to_bucket(self, bucket_key: str, ids: set) -> bool:
+        """Add ids to a bucket's shards, returning False once the bucket is full"""
+        shard_size = min(BUCKET_SHARD_SIZE, MAX_ITEMS_PER_BUCKET)
+        max_spill = -(-MAX_ITEMS_PER_BUCKET // shard_size) - 1
+        # Bounded ADDs keep a shard from overshooting its size by more than 5%
+        chunk_size = max(1, shard_size // 20)
+
+        def add(shard: int, shard_ids: list) -> list:
+            for i in range(0, len(shard_ids), chunk_size):
+                chunk = shard_ids[i : i + chunk_size]
+                if self.config.int_ids:
+                    added = self.bucket_table.append_binary_capped(
+                        shard_key(bucket_key, shard),
+                        "postings",
+                        encode_postings(sorted(chunk), self.config.sketch_bytes),
+                        len(chunk),
+                        shard_size,
+                    )
+                else:
+                    added = self.bucket_table.update_column_bulk_capped(
+                        shard_key(bucket_key, shard), "ids", set(chunk), shard_size
+                    )
+                if not added:
+                    return shard_ids[i:]
+            return []
+
+        spill = self.bucket_shards.get(bucket_key, 0)
+        by_shard: dict[int, list[str]] = defaultdict(list)
+        for vector_id in ids:
+            if isinstance(vector_id, str):
+                shard = xxh64(vector_id.encode()).intdigest() % (spill + 1)
+            else:
+                shard = vector_id % (spill + 1)
+            by_shard[shard].append(vector_id)
+        leftover = []
+        full = set()
+        for shard, shard_ids in by_shard.items():
+            rest = add(shard, shard_ids)
+            if rest:
+                full.add(shard)
+                leftover.extend(rest)
+        # Fill the shards with room left before opening a new one
+        for shard in range(spill, -1, -1):
+            if leftover and shard not in full:
+                leftover = add(shard, leftover)
+
+        while leftover:
+            if spill >= max_spill:
+                return False
+            # The shard count lives on the bucket's first item
+            spill = self.bucket_table.increment_column(bucket_key, "shards")
+            if spill > max_spill:
+                return False
+            self._see_shards(bucket_key, spill)
+            leftover = add(spill, leftover)
+        return True
+
+    def reload_config(self) -> None:
+        """Replace the config with the one saved in the metadata table"""
+        item = self.metadata_table.get(self.collection_id)
+        if item is None:
+            raise ValueError(f"Collection not found: {self.config.name}")
+        config = CollectionConfig.from_dict(item)
+        with self._config_lock:
+            # Codebooks never change and are stored apart from the config
+            config.pq_codebooks = self.config.pq_codebooks
+            self.config = config
+
+    def _update_config(self, change: Callable[[CollectionConfig], bool]) -> None:
+        """Apply a change to the config and save it, reapplied on a newer config
+
+        change edits a copy of the config in place and returns whether it
+        changed it. The copy replaces the config once it is saved.
+        """
+        with self._config_lock:
+            while True:
+                config = copy.deepcopy(self.config)
+                if not change(config):
+                    return
+                if self.metadata_table is None:
+                    self.config = config
+                    return
+                config.version += 1
+                try:
+                    saved = self.metadata_table.put_if_version(
+                        config.to_dynamo(), self.config.version
+                    )
+                except Exception:
+                    # The write may have landed or not, the table has the answer
+                    self.reload_config()
+                    raise
+                if saved:
+                    self.config = config
+                    return
+                logger.info(f"Config of {self.collection_id} changed, reloading")
+                self.reload_config()
 
-        self.vector_table.put(vector.to_dynamo())
-        for plane_id in self.config.uniform_planes.keys():
-            bucket_key = self.hash_key(vector.vector, plane_id)
-            self.bucket_table.update_column(bucket_key, "ids", vector.id)
+    def grow_planes(self, n_planes: int = 1) -> list[int]:
+        """Append finer uniform planes and backfill them, returning the added ids"""
+        if not self.can_grow_planes:
+            raise ValueError("Quantized collections need keep_full_precision to grow")
+        target = len(self.config.uniform_planes) + n_planes
+        plane_ids: list[int] = []
 
-    def search(self, query: np.ndarray, k: int = 5) -> list[CompVector]:
-        """Search for the k closest vectors to the query vector"""
+        def add_planes(config: CollectionConfig) -> bool:
+            plane_ids.clear()
+            # Fewer planes are added once the config item is full
+            while len(config.uniform_planes) < target and config.can_add_plane():
+                plane_id = config.add_plane()
+                config.backfill_cursors[plane_id] = ""
+                plane_ids.append(plane_id)
+            return bool(plane_ids)
+
+        self._update_config(add_planes)
+        if len(self.config.uniform_planes) < target:
+            logger.warning(
+                f"Planes of {self.collection_id} fill its config item, not growing"
+            )
+        if not plane_ids:
+            return plane_ids
+        logger.info(f"Added planes {plane_ids} to {self.collection_id}")
+        if not self.background_backfill:
+            self.backfill()
+        elif self.backfill_thread is None or not self.backfill_thread.is_alive():
+            thread = threading.Thread(target=self.backfill, daemon=True)
+            thread.start()
+            self.backfill_thread = thread
+        return plane_ids
+
+    def wait_for_backfill(self, timeout: Optional[float] = None) -> None:
+        """Block until background backfills, and any growth they caused, finish"""
+        thread = self.backfill_thread
+        while thread is not None:
+            thread.join(timeout)
+            if thread.is_alive() or thread is self.backfill_thread:
+                return
+            thread = self.backfill_thread
+
+    def backfill(self, max_pages: Optional[int] = None) -> bool:
+        """Index stored vectors into new planes, returning whether all are done
+
+        Stops after max_pages pages of BACKFILL_PAGE_SIZE vectors, if given.
+        """
+        if not self._backfill_lock.acquire(blocking=False):
+            return False
+        try:
+            pages = 0
+            while self.config.backfill_cursors and (
+                max_pages is None or pages < max_pages
+            ):
+                # Planes added together share a cursor and are indexed in one scan
+                cursor = self.config.backfill_cursors[min(self.config.backfill_cursors)]
+                plane_ids = [
+                    plane_id
+                    for plane_id, plane_cursor in self.config.backfill_cursors.items()
+                    if plane_cursor == cursor
+                ]
+                next_cursor = self._backfill_page(plane_ids, cursor)
+                pages += 1
+
+                def advance(config: CollectionConfig) -> bool:
+                    changed = False
+                    for plane_id in plane_ids:
+                        # Another container may have moved the cursor meanwhile
+                        if config.backfill_cursors.get(plane_id) != cursor:
+                            continue
+                        if next_cursor is None:
+                            del config.backfill_cursors[plane_id]
+                        else:
+                            config.backfill_cursors[plane_id] = next_cursor
+                        changed = True
+                    return changed
+
+                self._update_config(advance)
+                if next_cursor is None:
+                    logger.info(
+                        f"Backfilled planes {plane_ids} of {self.collection_id}"
+                    )
+            return not self.config.backfill_cursors
+        finally:
+            self._backfill_lock.release()
+
+    def _backfill_page(self, plane_ids: list[int], cursor: str) -> Optional[str]:
+        """Index the page of stored vectors after cursor, returning the next cursor"""
+        # Float32 copies, when kept, hash exactly like the original vectors
+        source = self.full_table if self.keeps_full_precision else self.vector_table
+        items, next_cursor = source.scan_after(cursor or None, BACKFILL_PAGE_SIZE)
+        if items:
+            if self.keeps_full_precision:
+                matrix = self._decode_full(items)
+            else:
+                matrix = self._decode_matrix(items)
+            ids = [item["id"] for item in items]
+            if self.config.int_ids:
+                ids = [parse_internal_key(vector_key) for vector_key in ids]
+            bucket_ids, bucket_planes = self._group_by_bucket(ids, matrix, plane_ids)
+            if self.config.int_ids:
+                bucket_ids = self._drop_posted(bucket_ids)
+            self._add_to_buckets(bucket_ids, bucket_planes)
+        return next_cursor
+
+    def _drop_posted(self, bucket_ids: dict[str, set]) -> dict[str, set]:
+        """Drop the internal ids their buckets already hold
+
+        Postings are lists, so the ids that inserts wrote to a new plane since
+        its backfill started would otherwise be appended to it twice.
+        """
+        if self.bucket_cache is not None:
+            self.bucket_cache.invalidate(
+                [
+                    key
+                    for bucket_key in bucket_ids
+                    for key in self.shard_keys(bucket_key)
+                ]
+            )
+        posted = {}
+        for bucket in self.get_buckets(list(bucket_ids)):
+            chunks = bucket.get("postings", [])
+            if self.config.sketch_bits:
+                internal_ids, _ = decode_sketch_postings(
+                    chunks, self.config.sketch_bytes
+                )
+            else:
+                internal_ids = decode_postings(chunks)
+            posted[bucket["id"]] = set(internal_ids.tolist())
+        # Sketch postings carry the internal id in their low 32 bits
+        bucket_ids = {
+            bucket_key: {
+                posting
+                for posting in postings
+                if posting & 0xFFFFFFFF not in posted.get(bucket_key, ())
+            }
+            for bucket_key, postings in bucket_ids.items()
+        }
+        return {bucket_key: ids for bucket_key, ids in bucket_ids.items() if ids}
+
+    def _see_shards(self, bucket_key: str, spill: int) -> None:
+        """Record a bucket's spill-over shard count, which only ever grows"""
+        with self._shards_lock:
+            if spill > self.bucket_shards.get(bucket_key, 0):
+                self.bucket_shards[bucket_key] = spill
+
+    def shard_keys(self, bucket_key: str) -> list[str]:
+        """Item keys of every shard of a bucket this collection has seen"""
+        return [
+            shard_key(bucket_key, shard)
+            for shard in range(self.bucket_shards.get(bucket_key, 0) + 1)
+        ]
+
+    def get_buckets(self, bucket_keys: list[str]) -> list[dict]:
+        """Get buckets by key, with the ids of all their shards merged"""
+        bucket_keys = list(dict.fromkeys(bucket_keys))
+        items = self._get_bucket_items(
+            [key for bucket_key in bucket_keys for key in self.shard_keys(bucket_key)]
+        )
+        unknown = []
+        for bucket_key in bucket_keys:
+            item = items.get(bucket_key)
+            spill = int(item.get("shards", 0)) if item else 0
+            known = self.bucket_shards.get(bucket_key, 0)
+            if spill > known:
+                self._see_shards(bucket_key, spill)
+                unknown.extend(
+                    shard_key(bucket_key, shard)
+                    for shard in range(known + 1, spill + 1)
+                )
+        if unknown:
+            items.update(self._get_bucket_items(unknown))
+
+        buckets = []
+        for bucket_key in bucket_keys:
+            shards = [items.get(key) for key in self.shard_keys(bucket_key)]
+            shards = [shard for shard in shards if shard is not None]
+            if len(shards) == 1:
+                buckets.append(shards[0])
+            elif shards:
+                bucket = {"id": bucket_key}
+                ids = set().union(*(shard.get("ids", set()) for shard in shards))
+                if ids:
+                    bucket["ids"] = ids
+                postings = [
+                    chunk for shard in shards for chunk in shard.get("postings", [])
+                ]
+                if postings:
+                    bucket["postings"] = postings
+                buckets.append(bucket)
+        return buckets
+
+    def _get_bucket_items(self, keys: list[str]) -> dict[str, dict]:
+        """Get bucket items by item key, served from the bucket cache when enabled"""
+        if self.bucket_cache is None:
+            return {item["id"]: item for item in self.bucket_table.get_bulk(keys)}
+
+        generation = self.bucket_cache.generation
+        found, missing = self.bucket_cache.get_many(keys)
+        if missing:
+            items = self.bucket_table.get_bulk(missing)
+            fetched = {item["id"]: item for item in items}
+            # Cache empty buckets too, so misses on them stay cheap
+            for key in missing:
+                fetched.setdefault(key, {"id": key})
+            self.bucket_cache.put_many(fetched, since=generation)
+            found.update(fetched)
+        return found
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 5,
+        include_vectors: bool | int = False,
+        n_probes: int = 0,
+        max_candidates: Optional[int] = None,
+        rerank: int = 0,
+    ) -> list[CompVector]:
+        """Search for the k closest vectors to the query vector
+
+        include_vectors is True for every result or N for the top N,
+        n_probes adds neighboring buckets per plane, max_candidates caps the
+        vectors scored and rerank rescores the top N on float32 copies.
+        """
+        results, _ = self.search_with_stats(
+            query, k, include_vectors, n_probes, max_candidates, rerank
+        )
+        return results
+
+    def search_with_stats(
+        self,
+        query: np.ndarray,
+        k: int = 5,
+        include_vectors: bool | int = False,
+        n_probes: int = 0,
+        max_candidates: Optional[int] = None,
+        rerank: int = 0,
+    ) -> tuple[list[CompVector], SearchStats]:
+        """Search like search, also returning what the search touched"""
+        rerank = self._check_search(max_candidates, rerank)
+        # Rounds keep enough of the best candidates for the rerank
+        keep = max(k, rerank)
+
+        stats = SearchStats()
+        if n_probes > 0:
+            plane_keys = self.config.probe_keys(query, n_probes)
+        else:
+            plane_keys = [[key] for key in self.config.hash_vectors(query)[0]]
+        # All probes of all planes are fetched in the same batch read
+        buckets = self.get_buckets(self._unsaturated_keys(plane_keys))
+        stats.buckets = len(buckets)
+        candidate_ids, max_candidates = self._candidates(
+            query, buckets, plane_keys, keep, max_candidates, stats
+        )
+        if max_candidates is None:
+            round_size = max(len(candidate_ids), 1)
+        else:
+            round_size = max(min(CANDIDATE_ROUND_SIZE, max_candidates), keep)
+
+        queries, metric = self._search_space(query)
+        query = queries[0]
+        pq_tables = None
+        if self.config.index_type == "pq" and self.config.pq_codebooks is not None:
+            # One lookup table per query, every candidate is a gather and sum
+            pq_tables = adc_tables(query, self.config.pq_codebooks, metric)
+
+        # Only the running top candidates are kept between rounds
+        top_items: list[dict] = []
+        top_scores = np.empty(0, dtype=np.float32)
+        for start in range(0, len(candidate_ids), round_size):
+            round_ids = candidate_ids[start : start + round_size]
+            items, read_stats = self.vector_table.get_bulk_with_stats(round_ids)
+            self._record_read(stats, read_stats)
+            stats.scored += len(items)
+            stats.rounds += 1
+            if not items:
+                continue
+
+            # Score the new candidates in a single pass, the top keep theirs
+            scores = self._score_items(query, items, metric, pq_tables)
+            candidates = top_items + items
+            indices, new_scores = top_k_of_scores(
+                np.concatenate([top_scores, scores]), keep, metric=metric
+            )
+            new_top_items = [candidates[i] for i in indices]
+            stable = len(top_items) == keep and [
+                item["id"] for item in new_top_items
+            ] == [item["id"] for item in top_items]
+            top_items, top_scores = new_top_items, new_scores
+            if stable and start + round_size < len(candidate_ids):
+                stats.stopped_early = True
+                break
+        logger.debug(f"Compared against {stats.scored} vectors")
+
+        full_items = None
+        if rerank:
+            full_items = self._get_full_items(top_items, stats)
+        results = self._results(
+            query, top_items, top_scores, metric, k, include_vectors, full_items
+        )
+        return results, stats
+
+    def search_many(
+        self,
+        queries: np.ndarray,
+        k: int = 5,
+        include_vectors: bool | int = False,
+        n_probes: int = 0,
+        max_candidates: Optional[int] = None,
+        rerank: int = 0,
+    ) -> list[list[CompVector]]:
+        """Search for the k closest vectors to each of many queries"""
+        results, _ = self.search_many_with_stats(
+            queries, k, include_vectors, n_probes, max_candidates, rerank
+        )
+        return results
+
+    def search_many_with_stats(
+        self,
+        queries: np.ndarray,
+        k: int = 5,
+        include_vectors: bool | int = False,
+        n_probes: int = 0,
+        max_candidates: Optional[int] = None,
+        rerank: int = 0,
+    ) -> tuple[list[list[CompVector]], SearchStats]:
+        """Search like search_many, also returning what the whole batch touched"""
+        rerank = self._check_search(max_candidates, rerank)
+        keep = max(k, rerank)
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+
+        stats = SearchStats()
+        if n_probes > 0:
+            query_plane_keys = [
+                self.config.probe_keys(query, n_probes) for query in queries
+            ]
+        else:
+            query_plane_keys = [
+                [[key] for key in keys] for keys in self.config.hash_vectors(queries)
+            ]
+        query_keys = [
+            self._unsaturated_keys(plane_keys) for plane_keys in query_plane_keys
+        ]
+        buckets = {
+            bucket["id"]: bucket
+            for bucket in self.get_buckets(
+                list(dict.fromkeys(key for keys in query_keys for key in keys))
+            )
+        }
+        stats.buckets = len(buckets)
+        query_candidates = []
+        for query, plane_keys, keys in zip(queries, query_plane_keys, query_keys):
+            query_buckets = [
+                buckets[key] for key in dict.fromkeys(keys) if key in buckets
+            ]
+            candidate_ids, _ = self._candidates(
+                query, query_buckets, plane_keys, keep, max_candidates, stats
+            )
+            query_candidates.append(candidate_ids)
+
+        # Candidates shared by several queries are read and decoded once
+        items, read_stats = self.vector_table.get_bulk_with_stats(
+            list(dict.fromkeys(cid for ids in query_candidates for cid in ids))
+        )
+        self._record_read(stats, read_stats)
+        stats.scored = len(items)
+        stats.rounds = 1
+        columns = {item["id"]: column for column, item in enumerate(items)}
+        queries, metric = self._search_space(queries)
+        scores = self._score_items_many(queries, items, metric)
+
+        query_top = []
+        for query_scores, candidate_ids in zip(scores, query_candidates):
+            query_columns = np.array(
+                [columns[cid] for cid in candidate_ids if cid in columns],
+                dtype=np.intp,
+            )
+            indices, top_scores = top_k_of_scores(
+                query_scores[query_columns], keep, metric=metric
+            )
+            query_top.append(([items[i] for i in query_columns[indices]], top_scores))
+
+        full_items = None
+        if rerank:
+            full_items = self._get_full_items(
+                [item for top_items, _ in query_top for item in top_items], stats
+            )
+        results = [
+            self._results(
+                query, top_items, top_scores, metric, k, include_vectors, full_items
+            )
+            for query, (top_items, top_scores) in zip(queries, query_top)
+        ]
+        return results, stats
+
+    def _check_search(self, max_candidates: Optional[int], rerank: int) -> int:
+        """Validate search options, returning the rerank depth that applies"""
         if not self.config.uniform_planes:
             raise ValueError("Uniform planes must be created before searching")
+        if max_candidates is not None and max_candidates < 1:
+            raise ValueError("max_candidates must be at least 1")
+        if rerank < 0:
+            raise ValueError("rerank must not be negative")
+        if not self.quantized:
+            return 0
+        if rerank and not self.keeps_full_precision:
+            raise ValueError("rerank needs a collection with keep_full_precision")
+        return rerank
 
-        candidate_ids = set()
-        bucket_keys = [
-            self.hash_key(query, plane_id)
-            for plane_id in self.config.uniform_planes.keys()
-        ]
+    def _unsaturated_keys(self, plane_keys: list[list[str]]) -> list[str]:
+        """Bucket keys to read for a query's keys per plane"""
+        bucket_keys = [key for keys in plane_keys for key in keys]
+        if self.config.backfill_cursors:
+            # Saturated buckets still hold ids the new planes do not have yet
+            return bucket_keys
+        # Saturated buckets are skipped, the planes added for them cover their ids
+        saturated = self.config.saturated_keys()
+        if any(key not in saturated for key in bucket_keys):
+            bucket_keys = [key for key in bucket_keys if key not in saturated]
+        return bucket_keys
 
-        buckets = self.bucket_table.get_batch(bucket_keys)
-        # Merge all the buckets "ids" lists
-        candidate_ids = {cid for bucket in buckets for cid in bucket.get("ids", set())}
-        lookup_items = self.get_bulk_items(list(candidate_ids))
-        logger.debug("Compared against N vectors:", len(lookup_items))
-        if len(lookup_items) == 0:
-            return []
+    def _candidates(
+        self,
+        query: np.ndarray,
+        buckets: list[dict],
+        plane_keys: list[list[str]],
+        keep: int,
+        max_candidates: Optional[int],
+        stats: SearchStats,
+    ) -> tuple[list[str], Optional[int]]:
+        """Vector keys to score for a query, best first when there is a budget
+
+        Also returns the candidate budget, which sketches always set.
+        """
+        key_weights: dict[str, int] = {}
+        if max_candidates is not None:
+            for keys, plane in zip(plane_keys, self.config.uniform_planes.values()):
+                key_weights[keys[0]] = max(key_weights.get(keys[0], 0), plane.shape[1])
+        if self.config.sketch_bits:
+            # Sketches rank every candidate from the bucket items alone
+            if max_candidates is None:
+                max_candidates = keep * SKETCH_OVERSAMPLE
+            candidate_ids = self._sketch_candidates(query, buckets)
+            stats.candidates += len(candidate_ids)
+            return candidate_ids[:max_candidates], max_candidates
+        if self.config.int_ids:
+            # Postings are merged and ranked as arrays, not sets of strings
+            if max_candidates is None:
+                internal_ids = union_postings(buckets)
+            else:
+                internal_ids = rank_postings(buckets, key_weights)
+            stats.candidates += len(internal_ids)
+            candidate_ids = [
+                internal_key(internal_id)
+                for internal_id in internal_ids[:max_candidates].tolist()
+            ]
+            return candidate_ids, max_candidates
+        if max_candidates is None:
+            # Merge all the buckets "ids" lists, everything gets scored
+            candidate_ids = list(
+                {cid for bucket in buckets for cid in bucket.get("ids", set())}
+            )
+        else:
+            candidate_ids = rank_candidates(buckets, key_weights)
+        stats.candidates += len(candidate_ids)
+        return candidate_ids[:max_candidates], max_candidates
+
+    def _search_space(self, queries: np.ndarray) -> tuple[np.ndarray, str]:
+        """Queries as a float32 matrix and the metric to score them with"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        metric = self.config.metric
+        if metric == "cosine" and self.config.normalized:
+            queries = normalize_bulk(queries)
+            metric = "dot"
+        return queries, metric
+
+    def _score_items_many(
+        self, queries: np.ndarray, items: list[dict], metric: str
+    ) -> np.ndarray:
+        """Score vector items against every query, one row per query"""
+        if not items:
+            return np.empty((len(queries), 0), dtype=np.float32)
+        if self.config.index_type == "pq":
+            codes = self._pq_codes(items)
+            return np.stack(
+                [
+                    adc_scores(
+                        adc_tables(query, self.config.pq_codebooks, metric),
+                        codes,
+                        metric,
+                    )
+                    for query in queries
+                ]
+            )
+        if self.config.precision == "int8":
+            return score_int8(
+                queries,
+                [item["vector"] for item in items],
+                self.config.n_features,
+                metric,
+            )
+        return score_many(queries, self._decode_matrix(items), metric)
 
-        closest_indices = cosine_similarity_bulk(
-            query, [item.vector for item in lookup_items], k
+    def _sketch_candidates(self, query: np.ndarray, buckets: list[dict]) -> list[str]:
+        """Vector keys of every bucket entry, nearest sketch to the query first"""
+        query_sketch = compute_sketches(query, self.config.sketch_planes)[0]
+        if self.config.int_ids:
+            internal_ids, sketches = decode_sketch_postings(
+                [chunk for bucket in buckets for chunk in bucket.get("postings", [])],
+                self.config.sketch_bytes,
+            )
+            internal_ids = internal_ids[sketch_order(query_sketch, sketches)]
+            # An id re-inserted with another vector keeps its nearest sketch
+            _, first = np.unique(internal_ids, return_index=True)
+            return [
+                internal_key(internal_id)
+                for internal_id in internal_ids[np.sort(first)].tolist()
+            ]
+        entries = sorted(
+            {entry for bucket in buckets for entry in bucket.get("ids", ())}
         )
+        ids, sketches = parse_sketch_entries(entries, self.config.sketch_bytes)
+        return list(dict.fromkeys(ids[i] for i in sketch_order(query_sketch, sketches)))
+
+    def _get_full_items(self, items: list[dict], stats: SearchStats) -> dict:
+        """The float32 copies of vector items, by vector key"""
+        keys = list(dict.fromkeys(item["id"] for item in items))
+        if not keys:
+            return {}
+        full_items, read_stats = self.full_table.get_bulk_with_stats(keys)
+        self._record_read(stats, read_stats)
+        return {item["id"]: item for item in full_items}
 
-        candidates = [
+    def _results(
+        self,
+        query: np.ndarray,
+        top_items: list[dict],
+        top_scores: np.ndarray,
+        metric: str,
+        k: int,
+        include_vectors: bool | int,
+        full_items: Optional[dict] = None,
+    ) -> list[CompVector]:
+        """Turn the top vector items of a query into results
+
+        With full_items, the items are scored again on their float32 copies
+        and cut to k.
+        """
+        if full_items is not None:
+            # Candidates whose copy was not read are dropped
+            top_items = [item for item in top_items if item["id"] in full_items]
+            matrix = self._decode_full([full_items[item["id"]] for item in top_items])
+            indices, top_scores = top_k_scores(query, matrix, k, metric=metric)
+            top_items = [top_items[i] for i in indices]
+            top_matrix = matrix[indices]
+        n_vectors = vectors_to_include(include_vectors, len(top_items))
+        if full_items is None:
+            # Only the vectors that are returned get decoded
+            top_matrix = self._decode_matrix(top_items[:n_vectors])
+        return [
             CompVector(
-                id=lookup_items[i].id,
-                vector=lookup_items[i].vector,
-                dist=cosine_similarity(query, lookup_items[i].vector),
+                id=item.get("vid", item["id"]),
+                vector=top_matrix[rank].copy() if rank < n_vectors else None,
+                dist=float(score),
             )
-            for i in closest_indices
+            for rank, (item, score) in enumerate(zip(top_items, top_scores))
         ]
-        candidates.sort(key=lambda x: x.dist, reverse=True)
-        return candidates
+
+    @staticmethod
+    def _record_read(stats: SearchStats, read_stats: BatchReadStats) -> None:
+        stats.keys_retried += read_stats.retried
+        stats.keys_dropped += read_stats.dropped
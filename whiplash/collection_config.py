@@ -1,14 +1,30 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from decimal import Decimal
+from typing import Optional
 
 import numpy as np
 
+from whiplash.hashing import bits_to_keys, probe_flips
+from whiplash.quantization import PRECISIONS
+from whiplash.vector_math import METRICS
+
+# lsh scores candidates on stored vectors, pq on product quantization codes
+INDEX_TYPES = ("lsh", "pq")
+# Bytes of uniform and sketch planes a config item may hold, leaving room for
+# the rest of the config under DynamoDB's 400KB item limit
+MAX_PLANE_BYTES = 360_000
+
 
 def plane_to_bit_count(bit_start: int, bit_scale_factor: float, plane_id: int) -> int:
     """Compute the number of bits for a given plane"""
     return int(bit_start + plane_id * bit_scale_factor)
 
 
+def shard_key(bucket_key: str, shard: int) -> str:
+    """Item key of a bucket shard, shard 0 being the bucket key itself"""
+    return bucket_key if shard == 0 else f"{bucket_key}#{shard}"
+
+
 @dataclass
 class CollectionConfig:
     """Configuration for a collection"""
@@ -22,13 +38,67 @@ class CollectionConfig:
     bit_start: int
     bit_scale_factor: float
     uniform_planes: (dict[int, np.ndarray] | None) = None
+    metric: str = "cosine"
+    # Whether stored vectors are L2-normalized (cosine collections only)
+    normalized: bool = False
+    # Whether buckets hold packed internal integer ids instead of vector ids
+    int_ids: bool = False
+    # Storage precision of vectors, see whiplash.quantization
+    precision: str = "float32"
+    # Whether float32 copies are kept in a separate table for reranking
+    keep_full_precision: bool = False
+    # Bucket keys per plane that hit MAX_ITEMS_PER_BUCKET and take no more ids
+    saturated_buckets: dict[int, set[str]] = field(default_factory=dict)
+    # Bits of the sign sketch stored with every bucket entry, 0 for none
+    sketch_bits: int = 0
+    sketch_planes: Optional[np.ndarray] = None
+    index_type: str = "lsh"
+    # Subvectors per vector of pq collections, each stored as one byte code
+    pq_subvectors: int = 0
+    # (pq_subvectors, n_centroids, n_features / pq_subvectors) centroids, stored
+    # in metadata items of their own, see Collection.save_pq_codebooks
+    pq_codebooks: Optional[np.ndarray] = None
+    # Planes whose stored vectors are still being indexed, mapped to the id of
+    # the last vector indexed into them ("" before the first)
+    backfill_cursors: dict[int, str] = field(default_factory=dict)
+    # Bumped on every save, so a write based on a stale config is refused
+    version: int = 0
+    _projection: Optional[tuple] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self):
+        if self.metric not in METRICS:
+            raise ValueError(f"metric must be one of {', '.join(METRICS)}")
+        if self.precision not in PRECISIONS:
+            raise ValueError(f"precision must be one of {', '.join(PRECISIONS)}")
+        if self.sketch_bits < 0 or self.sketch_bits % 8:
+            raise ValueError("sketch_bits must be a non-negative multiple of 8")
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"index_type must be one of {', '.join(INDEX_TYPES)}")
+        if self.index_type == "pq":
+            if self.pq_subvectors < 1 or self.n_features % self.pq_subvectors:
+                raise ValueError("pq_subvectors must divide n_features")
+            if self.precision != "float32":
+                raise ValueError("pq collections store codes, not quantized vectors")
+            # PQ lookup tables score dot and l2, cosine only as a dot of unit vectors
+            if self.metric == "cosine" and not self.normalized:
+                raise ValueError("pq collections need normalized cosine vectors")
 
     @property
     def id(self) -> str:
         return f"{self.project_name}_{self.stage}_{self.name}"
 
     def __repr__(self) -> str:
-        return f"CollectionConfig(n_features={self.n_features}, n_planes={self.n_planes}, bit_start={self.bit_start}, bit_scale_factor={self.bit_scale_factor})"
+        return (
+            f"CollectionConfig(n_features={self.n_features}, "
+            f"n_planes={self.n_planes}, bit_start={self.bit_start}, "
+            f"bit_scale_factor={self.bit_scale_factor}, metric={self.metric})"
+        )
+
+    @property
+    def sketch_bytes(self) -> int:
+        return self.sketch_bits // 8
 
     def create_uniform_planes(self):
         """Create a set of random hyperplanes"""
@@ -40,6 +110,91 @@ class CollectionConfig:
                 plane_to_bit_count(self.bit_start, self.bit_scale_factor, plane_id),
                 self.n_features,
             ).T
+        if self.sketch_bits and self.sketch_planes is None:
+            self.sketch_planes = np.random.randn(self.sketch_bits, self.n_features).T
+
+    def plane_bytes(self) -> int:
+        """Bytes of the uniform and sketch planes, as stored in the config item"""
+        planes = list((self.uniform_planes or {}).values())
+        if self.sketch_planes is not None:
+            planes.append(self.sketch_planes)
+        return sum(plane.nbytes for plane in planes)
+
+    def can_add_plane(self) -> bool:
+        """Whether another uniform plane fits in the config item"""
+        if not self.uniform_planes:
+            return False
+        bits = plane_to_bit_count(
+            self.bit_start, self.bit_scale_factor, max(self.uniform_planes) + 1
+        )
+        return self.plane_bytes() + 8 * bits * self.n_features <= MAX_PLANE_BYTES
+
+    def add_plane(self) -> int:
+        """Append a uniform plane with more bits than any existing one"""
+        if not self.uniform_planes:
+            raise ValueError("Uniform planes must be created before adding one")
+        if not self.can_add_plane():
+            raise ValueError("Another uniform plane would not fit in the config item")
+        plane_id = max(self.uniform_planes) + 1
+        # Swap in a new dict so concurrent searches see all or none of it
+        uniform_planes = dict(self.uniform_planes)
+        uniform_planes[plane_id] = np.random.randn(
+            plane_to_bit_count(self.bit_start, self.bit_scale_factor, plane_id),
+            self.n_features,
+        ).T
+        self.uniform_planes = uniform_planes
+        self.n_planes = len(uniform_planes)
+        return plane_id
+
+    def saturated_keys(self) -> set[str]:
+        """Every saturated bucket key, across all planes"""
+        return set().union(*self.saturated_buckets.values())
+
+    def projection_matrix(self) -> tuple[np.ndarray, list[int]]:
+        """Stack every uniform plane into one (n_features, total_bits) matrix
+
+        Returns the matrix and the column offsets where each plane starts,
+        with a final offset equal to the total number of bits.
+        """
+        uniform_planes = self.uniform_planes
+        if not uniform_planes:
+            raise ValueError("Uniform planes must be created before hashing")
+        plane_ids = tuple(uniform_planes.keys())
+        if self._projection is None or self._projection[0] != plane_ids:
+            planes = list(uniform_planes.values())
+            offsets = np.cumsum([0] + [plane.shape[1] for plane in planes]).tolist()
+            self._projection = (plane_ids, np.hstack(planes), offsets)
+        return self._projection[1], self._projection[2]
+
+    def hash_vectors(self, vectors: np.ndarray) -> np.ndarray:
+        """Compute the bucket keys of a (N, n_features) block for every plane
+
+        Returns an (N, n_planes) array of keys, columns in uniform_planes order.
+        """
+        matrix, offsets = self.projection_matrix()
+        bits = np.dot(np.atleast_2d(vectors), matrix) >= 0
+        keys = np.empty((bits.shape[0], len(offsets) - 1), dtype=object)
+        for i in range(len(offsets) - 1):
+            keys[:, i] = bits_to_keys(bits[:, offsets[i] : offsets[i + 1]])
+        return keys
+
+    def probe_keys(self, vector: np.ndarray, n_probes: int = 0) -> list[list[str]]:
+        """Bucket keys of a vector per plane, followed by n_probes neighboring keys
+
+        Neighboring keys flip the bits whose projections are nearest to zero.
+        """
+        matrix, offsets = self.projection_matrix()
+        projections = np.dot(vector, matrix)
+        keys = []
+        for i in range(len(offsets) - 1):
+            plane_projections = projections[offsets[i] : offsets[i + 1]]
+            bits = plane_projections >= 0
+            flips = probe_flips(np.abs(plane_projections), n_probes)
+            rows = np.repeat(bits[np.newaxis, :], len(flips) + 1, axis=0)
+            for row, flip in enumerate(flips, start=1):
+                rows[row, list(flip)] = ~rows[row, list(flip)]
+            keys.append(bits_to_keys(rows).tolist())
+        return keys
 
     def to_dict(self) -> dict:
         return {
@@ -52,6 +207,13 @@ class CollectionConfig:
             "n_planes": self.n_planes,
             "bit_start": self.bit_start,
             "bit_scale_factor": self.bit_scale_factor,
+            "metric": self.metric,
+            "int_ids": self.int_ids,
+            "precision": self.precision,
+            "keep_full_precision": self.keep_full_precision,
+            "sketch_bits": self.sketch_bits,
+            "index_type": self.index_type,
+            "pq_subvectors": self.pq_subvectors,
         }
 
     def to_dynamo(self):
@@ -69,10 +231,34 @@ class CollectionConfig:
             "n_planes": self.n_planes,
             "bit_start": self.bit_start,
             "bit_scale_factor": Decimal(self.bit_scale_factor),
+            "metric": self.metric,
+            "normalized": self.normalized,
+            "int_ids": self.int_ids,
+            "precision": self.precision,
+            "keep_full_precision": self.keep_full_precision,
+            "sketch_bits": self.sketch_bits,
+            "index_type": self.index_type,
+            "pq_subvectors": self.pq_subvectors,
             "uniform_planes": {
                 str(plane_id): plane.tobytes()
                 for plane_id, plane in self.uniform_planes.items()
             },
+            # DynamoDB sets cannot be empty
+            "saturated_buckets": {
+                str(plane_id): set(keys)
+                for plane_id, keys in self.saturated_buckets.items()
+                if keys
+            },
+            "backfill_cursors": {
+                str(plane_id): cursor
+                for plane_id, cursor in self.backfill_cursors.items()
+            },
+            "version": self.version,
+            **(
+                {"sketch_planes": self.sketch_planes.tobytes()}
+                if self.sketch_planes is not None
+                else {}
+            ),
         }
 
     @staticmethod
@@ -101,4 +287,36 @@ class CollectionConfig:
             }
             if "uniform_planes" in config
             else None,
+            # Collections created before metrics were added are unnormalized cosine
+            config.get("metric", "cosine"),
+            bool(config.get("normalized", False)),
+            bool(config.get("int_ids", False)),
+            config.get("precision", "float32"),
+            bool(config.get("keep_full_precision", False)),
+            {
+                int(plane_id): set(keys)
+                for plane_id, keys in config.get("saturated_buckets", {}).items()
+            },
+            int(config.get("sketch_bits", 0)),
+            np.frombuffer(config["sketch_planes"], dtype=float).reshape(
+                (config["n_features"], int(config["sketch_bits"]))
+            )
+            if "sketch_planes" in config
+            else None,
+            config.get("index_type", "lsh"),
+            int(config.get("pq_subvectors", 0)),
+            np.frombuffer(config["pq_codebooks"], dtype=np.float32).reshape(
+                (
+                    int(config["pq_subvectors"]),
+                    -1,
+                    int(config["n_features"]) // int(config["pq_subvectors"]),
+                )
+            )
+            if "pq_codebooks" in config
+            else None,
+            {
+                int(plane_id): cursor
+                for plane_id, cursor in config.get("backfill_cursors", {}).items()
+            },
+            int(config.get("version", 0)),
         )
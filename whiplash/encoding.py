@@ -0,0 +1,106 @@
+"""Binary vector encodings
+
+Only the standard library is used here so the API client keeps working
+without numpy.
+
+- encode_vector: a vector as a base64 string of little-endian float32 values
+- encode_batch: a raw batch of ids and vectors
+"""
+
+import base64
+import struct
+import sys
+from array import array
+from typing import Sequence
+
+BATCH_MAGIC = b"WPV1"
+# magic, number of vectors, number of features
+BATCH_HEADER = struct.Struct("<4sII")
+ID_LENGTH = struct.Struct("<H")
+
+
+def _float32_bytes(values: Sequence[float]) -> bytes:
+    if hasattr(values, "astype"):
+        # numpy arrays skip the per-element conversion
+        return values.astype("<f4").tobytes()
+    floats = array("f", values)
+    if sys.byteorder != "little":
+        floats.byteswap()
+    return floats.tobytes()
+
+
+def _float32_list(data: bytes) -> list[float]:
+    floats = array("f")
+    floats.frombytes(data)
+    if sys.byteorder != "little":
+        floats.byteswap()
+    return floats.tolist()
+
+
+def encode_vector(values: Sequence[float]) -> str:
+    """Encode a vector as base64 little-endian float32"""
+    return base64.b64encode(_float32_bytes(values)).decode("ascii")
+
+
+def decode_vector_bytes(data: str) -> bytes:
+    """Decode a base64 vector to its raw little-endian float32 bytes"""
+    raw = base64.b64decode(data, validate=True)
+    if len(raw) % 4:
+        raise ValueError("base64 vector is not a whole number of float32 values")
+    return raw
+
+
+def decode_vector(data: str) -> list[float]:
+    """Decode a base64 vector to a list of floats"""
+    return _float32_list(decode_vector_bytes(data))
+
+
+def encode_batch(ids: Sequence[str], vectors: Sequence[Sequence[float]]) -> bytes:
+    """Encode ids and equal length vectors as one binary batch
+
+    Layout (little-endian): b"WPV1", uint32 count, uint32 n_features, then
+    count ids as uint16 length + utf-8 bytes, then count * n_features
+    float32 values row by row.
+    """
+    if len(ids) != len(vectors):
+        raise ValueError("ids and vectors must be the same length")
+    n_features = len(vectors[0]) if len(vectors) else 0
+    parts = [BATCH_HEADER.pack(BATCH_MAGIC, len(ids), n_features)]
+    for vector_id in ids:
+        encoded = vector_id.encode("utf-8")
+        parts.append(ID_LENGTH.pack(len(encoded)))
+        parts.append(encoded)
+    for vector in vectors:
+        if len(vector) != n_features:
+            raise ValueError("All vectors in a batch must have the same length")
+        parts.append(_float32_bytes(vector))
+    return b"".join(parts)
+
+
+def decode_batch_bytes(data: bytes) -> tuple[list[str], int, bytes]:
+    """Decode a binary batch to (ids, n_features, raw float32 bytes)"""
+    if len(data) < BATCH_HEADER.size:
+        raise ValueError("Binary batch is too short")
+    magic, count, n_features = BATCH_HEADER.unpack_from(data)
+    if magic != BATCH_MAGIC:
+        raise ValueError("Binary batch has an unknown format")
+    offset = BATCH_HEADER.size
+    ids = []
+    for _ in range(count):
+        if offset + ID_LENGTH.size > len(data):
+            raise ValueError("Binary batch ids are truncated")
+        (length,) = ID_LENGTH.unpack_from(data, offset)
+        offset += ID_LENGTH.size
+        ids.append(data[offset : offset + length].decode("utf-8"))
+        offset += length
+    raw = data[offset:]
+    if len(raw) != count * n_features * 4:
+        raise ValueError("Binary batch vectors do not match its header")
+    return ids, n_features, raw
+
+
+def decode_batch(data: bytes) -> tuple[list[str], list[list[float]]]:
+    """Decode a binary batch to ids and lists of floats"""
+    ids, n_features, raw = decode_batch_bytes(data)
+    values = _float32_list(raw)
+    return ids, [values[i * n_features : (i + 1) * n_features] for i in range(len(ids))]
@@ -1,5 +1,47 @@
+import heapq
+
 import numpy as np
 
+BASE36_DIGITS = np.frombuffer(b"0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ", dtype=np.uint8)
+
+
+def bits_to_keys(bits: np.ndarray) -> np.ndarray:
+    """Convert an (N, n_bits) block of sign bits to base 36 hash keys
+
+    The first bit is the most significant, matching the original
+    "".join(bits) -> int(..., 2) -> np.base_repr(..., 36) key format.
+    """
+    n_rows, n_bits = bits.shape
+    if n_bits == 0:
+        raise ValueError("Hash key generated is empty")
+
+    packed = np.packbits(bits, axis=1, bitorder="big")
+    pad = packed.shape[1] * 8 - n_bits
+    if n_bits > 64:
+        # Too wide for a machine word, fall back to Python ints
+        codes = [int.from_bytes(row.tobytes(), "big") >> pad for row in packed]
+        return np.array([np.base_repr(code, 36) for code in codes], dtype=str)
+
+    # Left pad each row to 8 bytes and read it as a big endian uint64
+    words = np.zeros((n_rows, 8), dtype=np.uint8)
+    words[:, 8 - packed.shape[1] :] = packed
+    codes = words.view(">u8").ravel().astype(np.uint64) >> np.uint64(pad)
+
+    n_digits = len(np.base_repr(2**n_bits - 1, 36))
+    digits = np.empty((n_rows, n_digits), dtype=np.uint8)
+    for i in range(n_digits - 1, -1, -1):
+        digits[:, i] = codes % np.uint64(36)
+        codes //= np.uint64(36)
+
+    # Drop leading zero digits but always keep at least one digit
+    nonzero = digits != 0
+    leading = np.where(nonzero.any(axis=1), np.argmax(nonzero, axis=1), n_digits - 1)
+    raw = BASE36_DIGITS[digits].view(f"S{n_digits}").ravel()
+    return np.array(
+        [key[start:] for key, start in zip(raw.tolist(), leading.tolist())],
+        dtype=str,
+    )
+
 
 def vector_plane_hash(vector: np.ndarray, uniform_plane: np.ndarray) -> str:
     if vector is None or uniform_plane is None:
@@ -7,9 +49,40 @@ def vector_plane_hash(vector: np.ndarray, uniform_plane: np.ndarray) -> str:
 
     projections: np.ndarray = np.dot(vector, uniform_plane)
     # Compute the hash code as 0 or 1 based on the sign of the projection
-    hash_code: str = "".join((projections >= 0).astype(int).astype(str))
+    bits = np.atleast_1d(projections >= 0)
 
-    if len(hash_code) == 0:
+    if bits.size == 0:
         raise ValueError("Hash key generated is empty")
-    # Change the base of the hash code from 2 to 58
-    return np.base_repr(int(hash_code, 2), 36)
+    return str(bits_to_keys(bits.reshape(1, -1))[0])
+
+
+def probe_flips(magnitudes: np.ndarray, n_probes: int) -> list[tuple[int, ...]]:
+    """Pick the n_probes most likely bit flip sets for query-directed multi-probe
+
+    Bits whose projection is closest to zero are the most likely to differ
+    for a near neighbor, so flip sets are generated in increasing order of
+    the summed |projection| of the flipped bits (Lv et al., 2007).
+    """
+    if n_probes <= 0 or len(magnitudes) == 0:
+        return []
+    order = np.argsort(magnitudes)
+    # Never more than n_probes single bits are needed to build n_probes sets
+    order = order[:n_probes]
+    scores = np.asarray(magnitudes)[order]
+    heap = [(float(scores[0]), (0,))]
+    flips = []
+    while heap and len(flips) < n_probes:
+        score, positions = heapq.heappop(heap)
+        flips.append(tuple(int(order[p]) for p in positions))
+        last = positions[-1]
+        if last + 1 < len(order):
+            # Shift: replace the last flipped bit with the next candidate
+            shifted = positions[:-1] + (last + 1,)
+            heapq.heappush(
+                heap, (score - float(scores[last]) + float(scores[last + 1]), shifted)
+            )
+            # Expand: also flip the next candidate
+            heapq.heappush(
+                heap, (score + float(scores[last + 1]), positions + (last + 1,))
+            )
+    return flips
@@ -0,0 +1,207 @@
+"""Chunked readers for Collection.import_file
+
+Every reader yields (ids, matrix) chunks of at most chunk_size rows starting
+at a row offset, so an import holds one chunk in memory however large the
+file is and a resumed import can skip the rows already written.
+
+- .npy: a (N, n_features) matrix, memory-mapped. Ids are the row numbers.
+- .npz: the vector_column array (default "vectors") is read from the
+  archive chunk by chunk, ids come from the id_column array (default "ids")
+  or are the row numbers when the archive has none.
+- .jsonl: one object per line with id_column and vector_column keys
+  (default "id" and "vector").
+- .parquet: id_column and vector_column columns (default "id" and
+  "vector"), read in record batches. Needs pyarrow.
+"""
+
+import json
+import os
+import zipfile
+from typing import IO, Iterator, Optional
+
+import numpy as np
+
+IMPORT_CHUNK_SIZE = 1000
+CHECKPOINT_SUFFIX = ".whiplash-checkpoint"
+
+Chunk = tuple[list[str], np.ndarray]
+
+
+def _row_ids(start: int, stop: int) -> list[str]:
+    return [str(i) for i in range(start, stop)]
+
+
+def read_npy(path: str, chunk_size: int, start: int = 0) -> Iterator[Chunk]:
+    matrix = np.load(path, mmap_mode="r")
+    if matrix.ndim != 2:
+        raise ValueError(".npy imports must hold a 2D matrix")
+    for offset in range(start, len(matrix), chunk_size):
+        stop = min(offset + chunk_size, len(matrix))
+        yield _row_ids(offset, stop), np.array(matrix[offset:stop], dtype=np.float32)
+
+
+def _npz_member(
+    archive: zipfile.ZipFile, name: str
+) -> tuple[IO[bytes], tuple, np.dtype]:
+    """Open an array of an .npz archive, positioned after its header"""
+    member = archive.open(f"{name}.npy")
+    version = np.lib.format.read_magic(member)
+    if version == (1, 0):
+        header = np.lib.format.read_array_header_1_0(member)
+    else:
+        header = np.lib.format.read_array_header_2_0(member)
+    shape, fortran_order, dtype = header
+    if fortran_order or dtype.hasobject:
+        raise ValueError(f"{name} must be a C-ordered array without objects")
+    return member, shape, dtype
+
+
+def _read_rows(member: IO[bytes], shape: tuple, dtype: np.dtype, count: int):
+    row_size = int(np.prod(shape[1:], dtype=np.int64)) * dtype.itemsize
+    data = member.read(count * row_size)
+    return np.frombuffer(data, dtype=dtype).reshape((count,) + tuple(shape[1:]))
+
+
+def _id_string(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else str(value)
+
+
+def read_npz(
+    path: str,
+    chunk_size: int,
+    start: int = 0,
+    id_column: Optional[str] = None,
+    vector_column: Optional[str] = None,
+) -> Iterator[Chunk]:
+    vector_column = vector_column or "vectors"
+    with zipfile.ZipFile(path) as archive:
+        names = {name[: -len(".npy")] for name in archive.namelist()}
+        if vector_column not in names:
+            raise ValueError(f"{path} has no {vector_column} array")
+        if id_column is None and "ids" in names:
+            id_column = "ids"
+        if id_column is not None and id_column not in names:
+            raise ValueError(f"{path} has no {id_column} array")
+
+        vectors, shape, dtype = _npz_member(archive, vector_column)
+        if len(shape) != 2:
+            raise ValueError(f"{vector_column} must be a 2D matrix")
+        # Compressed members are skipped by decompressing, still in bounded reads
+        vectors.seek(vectors.tell() + start * shape[1] * dtype.itemsize)
+        ids = None
+        if id_column is not None:
+            ids, id_shape, id_dtype = _npz_member(archive, id_column)
+            if id_shape[0] != shape[0]:
+                raise ValueError(f"{id_column} and {vector_column} differ in length")
+            ids.seek(ids.tell() + start * id_dtype.itemsize)
+
+        for offset in range(start, shape[0], chunk_size):
+            count = min(chunk_size, shape[0] - offset)
+            matrix = _read_rows(vectors, shape, dtype, count)
+            if ids is None:
+                chunk_ids = _row_ids(offset, offset + count)
+            else:
+                chunk_ids = [
+                    _id_string(value)
+                    for value in _read_rows(ids, id_shape, id_dtype, count)
+                ]
+            yield chunk_ids, matrix.astype(np.float32)
+
+
+def read_jsonl(
+    path: str,
+    chunk_size: int,
+    start: int = 0,
+    id_column: Optional[str] = None,
+    vector_column: Optional[str] = None,
+) -> Iterator[Chunk]:
+    id_column = id_column or "id"
+    vector_column = vector_column or "vector"
+    ids, rows = [], []
+    with open(path) as file:
+        lines = (line for line in file if line.strip())
+        for row, line in enumerate(lines):
+            if row < start:
+                continue
+            record = json.loads(line)
+            ids.append(str(record[id_column]))
+            rows.append(record[vector_column])
+            if len(ids) == chunk_size:
+                yield ids, np.array(rows, dtype=np.float32)
+                ids, rows = [], []
+    if ids:
+        yield ids, np.array(rows, dtype=np.float32)
+
+
+def read_parquet(
+    path: str,
+    chunk_size: int,
+    start: int = 0,
+    id_column: Optional[str] = None,
+    vector_column: Optional[str] = None,
+) -> Iterator[Chunk]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Importing Parquet files requires pyarrow") from e
+    id_column = id_column or "id"
+    vector_column = vector_column or "vector"
+    offset = 0
+    parquet = pq.ParquetFile(path)
+    for batch in parquet.iter_batches(chunk_size, columns=[id_column, vector_column]):
+        skip = min(max(start - offset, 0), batch.num_rows)
+        offset += batch.num_rows
+        if skip == batch.num_rows:
+            continue
+        batch = batch.slice(skip)
+        ids = [str(value) for value in batch.column(id_column).to_pylist()]
+        vectors = batch.column(vector_column)
+        # Fixed size and plain lists flatten without a Python list per row
+        matrix = np.asarray(vectors.flatten(), dtype=np.float32).reshape(len(ids), -1)
+        yield ids, matrix
+
+
+def read_chunks(
+    path: str,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    start: int = 0,
+    id_column: Optional[str] = None,
+    vector_column: Optional[str] = None,
+) -> Iterator[Chunk]:
+    """Chunks of (ids, float32 matrix) of a file, starting at row start"""
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".npy":
+        if id_column is not None or vector_column is not None:
+            raise ValueError(".npy files have no columns, ids are the row numbers")
+        return read_npy(path, chunk_size, start)
+    readers = {".npz": read_npz, ".jsonl": read_jsonl, ".parquet": read_parquet}
+    if extension not in readers:
+        raise ValueError(f"Cannot import {extension or path} files")
+    return readers[extension](path, chunk_size, start, id_column, vector_column)
+
+
+def checkpoint_path(path: str) -> str:
+    """Default checkpoint file of an import"""
+    return f"{path}{CHECKPOINT_SUFFIX}"
+
+
+def read_checkpoint(path: str, collection_id: str) -> int:
+    """Rows of a file already imported into a collection, 0 if none"""
+    try:
+        with open(path) as file:
+            checkpoint = json.load(file)
+    except FileNotFoundError:
+        return 0
+    if checkpoint.get("collection_id") != collection_id:
+        return 0
+    return int(checkpoint["rows"])
+
+
+def write_checkpoint(path: str, collection_id: str, rows: int) -> None:
+    """Record imported rows, replacing the file atomically"""
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as file:
+        json.dump({"collection_id": collection_id, "rows": rows}, file)
+    os.replace(temporary, path)
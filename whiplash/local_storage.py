@@ -0,0 +1,259 @@
+import copy
+import pickle
+import sqlite3
+import threading
+from typing import Optional
+
+from whiplash.dynamo_util import clean_item
+from whiplash.storage import BatchReadStats, Storage, Table
+
+
+class MemoryStorage(Storage):
+    """In-process storage backend, useful for tests, benchmarks and small collections"""
+
+    def __init__(self):
+        self.tables: dict[str, dict[str, dict]] = {}
+        self.lock = threading.Lock()
+
+    def get_table(self, table_name):
+        return MemoryTable(table_name, self)
+
+
+class MemoryTable(Table):
+    def __init__(self, table_name, storage: MemoryStorage):
+        self.table_name = table_name
+        self.storage = storage
+
+    @property
+    def items(self) -> dict[str, dict]:
+        if self.table_name not in self.storage.tables:
+            raise ValueError(f"Table not found: {self.table_name}")
+        return self.storage.tables[self.table_name]
+
+    def exists(self):
+        return self.table_name in self.storage.tables
+
+    def create_table(self):
+        with self.storage.lock:
+            self.storage.tables.setdefault(self.table_name, {})
+
+    def put(self, item):
+        with self.storage.lock:
+            self.items[item[self.pk]] = copy.deepcopy(item)
+
+    def put_bulk(self, items):
+        with self.storage.lock:
+            table = self.items
+            for item in items:
+                table[item[self.pk]] = copy.deepcopy(item)
+
+    def put_if_absent(self, item):
+        with self.storage.lock:
+            if item[self.pk] in self.items:
+                return False
+            self.items[item[self.pk]] = copy.deepcopy(item)
+            return True
+
+    def put_if_version(self, item, version):
+        with self.storage.lock:
+            stored = self.items.get(item[self.pk]) or {}
+            if int(stored.get("version", 0)) != version:
+                return False
+            self.items[item[self.pk]] = copy.deepcopy(item)
+            return True
+
+    def update_column_bulk(self, item_id, column_name, new_vals):
+        if not new_vals:
+            return
+        with self.storage.lock:
+            item = self.items.setdefault(item_id, {self.pk: item_id})
+            item.setdefault(column_name, set()).update(new_vals)
+
+    def update_column_bulk_capped(self, item_id, column_name, new_vals, max_size):
+        if not new_vals:
+            return True
+        with self.storage.lock:
+            item = self.items.setdefault(item_id, {self.pk: item_id})
+            column = item.setdefault(column_name, set())
+            if len(column) >= max_size:
+                return False
+            column.update(new_vals)
+            return True
+
+    def append_binary_capped(self, item_id, column_name, data, count, max_size):
+        count_column = f"{column_name}_count"
+        with self.storage.lock:
+            item = self.items.setdefault(item_id, {self.pk: item_id})
+            if item.get(count_column, 0) >= max_size:
+                return False
+            item.setdefault(column_name, []).append(data)
+            item[count_column] = item.get(count_column, 0) + count
+            return True
+
+    def increment_column(self, item_id, column_name, amount=1):
+        with self.storage.lock:
+            item = self.items.setdefault(item_id, {self.pk: item_id})
+            item[column_name] = item.get(column_name, 0) + amount
+            return item[column_name]
+
+    def get(self, item_id) -> Optional[dict]:
+        with self.storage.lock:
+            item = self.items.get(item_id)
+            return clean_item(copy.deepcopy(item)) if item is not None else None
+
+    def delete(self, item_id):
+        with self.storage.lock:
+            self.items.pop(item_id, None)
+
+    def dump(self):
+        with self.storage.lock:
+            return [clean_item(copy.deepcopy(item)) for item in self.items.values()]
+
+
+class SQLiteStorage(Storage):
+    """Local file-backed storage backend, one SQLite table per table name
+
+    Items are pickled, so only open database files you created yourself.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+
+    def get_table(self, table_name):
+        return SQLiteTable(table_name, self)
+
+    def close(self):
+        self.connection.close()
+
+
+class SQLiteTable(Table):
+    def __init__(self, table_name, storage: SQLiteStorage):
+        self.table_name = table_name
+        self.storage = storage
+        self.quoted_name = '"' + table_name.replace('"', '""') + '"'
+
+    def _execute(self, sql: str, params=()) -> list:
+        with self.storage.lock, self.storage.connection as connection:
+            return connection.execute(sql, params).fetchall()
+
+    def exists(self):
+        return bool(
+            self._execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name=?",
+                (self.table_name,),
+            )
+        )
+
+    def create_table(self):
+        self._execute(
+            f"CREATE TABLE IF NOT EXISTS {self.quoted_name} "
+            "(id TEXT PRIMARY KEY, item BLOB NOT NULL)"
+        )
+
+    def put(self, item):
+        self.put_bulk([item])
+
+    def put_bulk(self, items):
+        with self.storage.lock, self.storage.connection as connection:
+            connection.executemany(
+                f"INSERT OR REPLACE INTO {self.quoted_name} (id, item) VALUES (?, ?)",
+                [(item[self.pk], pickle.dumps(item)) for item in items],
+            )
+
+    def _modify(self, item_id, modify):
+        """Run modify(item) and save the item, returning (result, changed)"""
+        # The connection context is one transaction, so the read-modify-write is atomic
+        with self.storage.lock, self.storage.connection as connection:
+            row = connection.execute(
+                f"SELECT item FROM {self.quoted_name} WHERE id = ?", (item_id,)
+            ).fetchone()
+            item = pickle.loads(row[0]) if row else {self.pk: item_id}
+            result, changed = modify(item)
+            if changed:
+                connection.execute(
+                    f"INSERT OR REPLACE INTO {self.quoted_name} (id, item) VALUES (?, ?)",
+                    (item_id, pickle.dumps(item)),
+                )
+            return result
+
+    def put_if_absent(self, item):
+        with self.storage.lock, self.storage.connection as connection:
+            cursor = connection.execute(
+                f"INSERT OR IGNORE INTO {self.quoted_name} (id, item) VALUES (?, ?)",
+                (item[self.pk], pickle.dumps(item)),
+            )
+            return cursor.rowcount == 1
+
+    def put_if_version(self, item, version):
+        def put(stored):
+            if int(stored.get("version", 0)) != version:
+                return False, False
+            stored.clear()
+            stored.update(item)
+            return True, True
+
+        return self._modify(item[self.pk], put)
+
+    def update_column_bulk(self, item_id, column_name, new_vals):
+        self.update_column_bulk_capped(item_id, column_name, new_vals, None)
+
+    def update_column_bulk_capped(self, item_id, column_name, new_vals, max_size):
+        if not new_vals:
+            return True
+
+        def add(item):
+            column = item.setdefault(column_name, set())
+            if max_size is not None and len(column) >= max_size:
+                return False, False
+            column.update(new_vals)
+            return True, True
+
+        return self._modify(item_id, add)
+
+    def append_binary_capped(self, item_id, column_name, data, count, max_size):
+        count_column = f"{column_name}_count"
+
+        def append(item):
+            if item.get(count_column, 0) >= max_size:
+                return False, False
+            item.setdefault(column_name, []).append(data)
+            item[count_column] = item.get(count_column, 0) + count
+            return True, True
+
+        return self._modify(item_id, append)
+
+    def increment_column(self, item_id, column_name, amount=1):
+        def increment(item):
+            item[column_name] = item.get(column_name, 0) + amount
+            return item[column_name], True
+
+        return self._modify(item_id, increment)
+
+    def get(self, item_id) -> Optional[dict]:
+        rows = self._execute(
+            f"SELECT item FROM {self.quoted_name} WHERE id = ?", (item_id,)
+        )
+        return clean_item(pickle.loads(rows[0][0])) if rows else None
+
+    def get_bulk_with_stats(self, item_ids):
+        unique_ids = list(dict.fromkeys(item_ids))
+        items = []
+        # Stay well below SQLite's bound parameter limit
+        for i in range(0, len(unique_ids), 500):
+            chunk = unique_ids[i : i + 500]
+            rows = self._execute(
+                f"SELECT item FROM {self.quoted_name} "
+                f"WHERE id IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            )
+            items.extend(clean_item(pickle.loads(row[0])) for row in rows)
+        return items, BatchReadStats(requested=len(unique_ids))
+
+    def delete(self, item_id):
+        self._execute(f"DELETE FROM {self.quoted_name} WHERE id = ?", (item_id,))
+
+    def dump(self):
+        rows = self._execute(f"SELECT item FROM {self.quoted_name}")
+        return [clean_item(pickle.loads(row[0])) for row in rows]
@@ -0,0 +1,86 @@
+"""Compact bucket postings for collections with internal integer ids
+
+Instead of a string set of vector ids, buckets of int_ids collections hold
+a list of binary chunks in their "postings" attribute, each chunk a run of
+little-endian uint32 internal ids. Appending a chunk is a single list_append
+and decoding every bucket of a search is one np.frombuffer per chunk.
+Collections with sketches store (internal id, sketch) records instead, see
+whiplash.sketches.
+"""
+
+from typing import Iterable
+
+import numpy as np
+
+POSTINGS_DTYPE = np.dtype("<u4")
+# Bucket table item holding the next internal id, never a base-36 bucket key
+ID_COUNTER_KEY = "#next_id"
+
+
+def internal_key(internal_id: int) -> str:
+    """Vector table key of an internal id"""
+    return f"#{internal_id}"
+
+
+def parse_internal_key(key: str) -> int:
+    """Internal id of a vector table key"""
+    return int(key[1:])
+
+
+def sketch_postings_dtype(sketch_bytes: int) -> np.dtype:
+    return np.dtype([("id", POSTINGS_DTYPE), ("sketch", np.uint8, (sketch_bytes,))])
+
+
+def encode_postings(internal_ids: Iterable[int], sketch_bytes: int = 0) -> bytes:
+    """Pack internal ids into one postings chunk
+
+    With sketch_bytes, every id carries its sketch above the low 32 bits
+    (see whiplash.sketches.sketch_postings) and is packed as a record.
+    """
+    if not sketch_bytes:
+        return np.fromiter(internal_ids, dtype=POSTINGS_DTYPE).tobytes()
+    return b"".join(
+        (posting & 0xFFFFFFFF).to_bytes(4, "little")
+        + (posting >> 32).to_bytes(sketch_bytes, "little")
+        for posting in internal_ids
+    )
+
+
+def decode_postings(chunks: list[bytes]) -> np.ndarray:
+    """Unpack postings chunks into one array of internal ids"""
+    if not chunks:
+        return np.empty(0, dtype=POSTINGS_DTYPE)
+    return np.frombuffer(b"".join(chunks), dtype=POSTINGS_DTYPE)
+
+
+def decode_sketch_postings(
+    chunks: list[bytes], sketch_bytes: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Unpack sketch postings chunks into (internal ids, sketches)"""
+    records = np.frombuffer(b"".join(chunks), dtype=sketch_postings_dtype(sketch_bytes))
+    return records["id"], records["sketch"]
+
+
+def rank_postings(buckets: list[dict], key_weights: dict[str, int]) -> np.ndarray:
+    """Order the internal ids of buckets by collision weight, like rank_candidates"""
+    postings = [decode_postings(bucket.get("postings", [])) for bucket in buckets]
+    if not postings:
+        return np.empty(0, dtype=POSTINGS_DTYPE)
+    ids = np.concatenate(postings)
+    weights = np.repeat(
+        [key_weights.get(bucket["id"], 0) for bucket in buckets],
+        [len(bucket_ids) for bucket_ids in postings],
+    )
+    unique, inverse = np.unique(ids, return_inverse=True)
+    weight = np.bincount(inverse, weights=weights, minlength=len(unique))
+    hits = np.bincount(inverse, minlength=len(unique))
+    # lexsort sorts by its last key first
+    return unique[np.lexsort((-hits, -weight))]
+
+
+def union_postings(buckets: list[dict]) -> np.ndarray:
+    """Every distinct internal id across buckets"""
+    postings = [decode_postings(bucket.get("postings", [])) for bucket in buckets]
+    if not postings:
+        return np.empty(0, dtype=POSTINGS_DTYPE)
+    return np.unique(np.concatenate(postings))
@@ -0,0 +1,100 @@
+"""Product quantization of vectors for the "pq" index type
+
+Vectors are split into m equal subvectors and each subvector is replaced by
+the index of its nearest centroid in that subspace's codebook, so a vector
+is stored as m uint8 codes. Candidates are scored with asymmetric distance
+computation: one (m, n_centroids) lookup table per query, then a gather and
+sum per candidate instead of a dim length dot product.
+"""
+
+import numpy as np
+
+MAX_CENTROIDS = 256
+# Smallest sample collections train on, so each centroid sees a few vectors
+MIN_TRAINING_VECTORS = 2 * MAX_CENTROIDS
+TRAINING_ITERATIONS = 20
+
+
+def _subvectors(matrix: np.ndarray, m: int) -> np.ndarray:
+    """View a (N, n_features) matrix as (m, N, n_features / m)"""
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+    return matrix.reshape(len(matrix), m, -1).transpose(1, 0, 2)
+
+
+def _nearest(subvectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid of every subvector of one subspace"""
+    distances = (
+        (subvectors**2).sum(axis=1)[:, np.newaxis]
+        - 2 * subvectors @ centroids.T
+        + (centroids**2).sum(axis=1)
+    )
+    return distances.argmin(axis=1)
+
+
+def train_codebooks(
+    sample: np.ndarray, m: int, iterations: int = TRAINING_ITERATIONS
+) -> np.ndarray:
+    """Run k-means in every subspace of a sample, returning (m, K, dsub) float32
+
+    K is 256, or the sample size when the sample is smaller.
+    """
+    sample = np.atleast_2d(np.asarray(sample, dtype=np.float32))
+    if sample.shape[1] % m:
+        raise ValueError("n_features must be a multiple of pq_subvectors")
+    n_centroids = min(MAX_CENTROIDS, len(sample))
+    if n_centroids < 1:
+        raise ValueError("PQ codebooks need at least one training vector")
+    codebooks = []
+    for subvectors in _subvectors(sample, m):
+        start = np.random.choice(len(subvectors), n_centroids, replace=False)
+        centroids = subvectors[start].copy()
+        for _ in range(iterations):
+            assignment = _nearest(subvectors, centroids)
+            counts = np.bincount(assignment, minlength=n_centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, subvectors)
+            # Empty clusters keep their previous centroid
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, np.newaxis]
+        codebooks.append(centroids)
+    return np.stack(codebooks)
+
+
+def encode(matrix: np.ndarray, codebooks: np.ndarray) -> np.ndarray:
+    """PQ codes of every row of a matrix, as an (N, m) uint8 array"""
+    subvectors = _subvectors(matrix, len(codebooks))
+    return np.stack(
+        [
+            _nearest(subspace, centroids)
+            for subspace, centroids in zip(subvectors, codebooks)
+        ],
+        axis=1,
+    ).astype(np.uint8)
+
+
+def decode(codes: np.ndarray, codebooks: np.ndarray) -> np.ndarray:
+    """Reconstruct approximate float32 vectors from PQ codes"""
+    codes = np.atleast_2d(codes)
+    parts = [codebooks[i][codes[:, i]] for i in range(len(codebooks))]
+    return np.concatenate(parts, axis=1)
+
+
+def adc_tables(query: np.ndarray, codebooks: np.ndarray, metric: str) -> np.ndarray:
+    """Per subspace score of the query against every centroid, (m, K)
+
+    dot tables hold partial dot products, l2 tables squared distances.
+    """
+    subqueries = _subvectors(query, len(codebooks))[:, 0, :]
+    if metric == "dot":
+        return np.einsum("mkd,md->mk", codebooks, subqueries)
+    if metric == "l2":
+        return ((codebooks - subqueries[:, np.newaxis, :]) ** 2).sum(axis=2)
+    raise ValueError(f"PQ scoring supports dot and l2, not {metric}")
+
+
+def adc_scores(tables: np.ndarray, codes: np.ndarray, metric: str) -> np.ndarray:
+    """Score (N, m) codes with lookup tables, matching score_bulk's scale"""
+    scores = tables[np.arange(len(tables)), np.atleast_2d(codes)].sum(axis=1)
+    if metric == "l2":
+        return np.sqrt(np.maximum(scores, 0))
+    return scores
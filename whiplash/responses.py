@@ -1,6 +1,8 @@
+import base64
+import binascii
 import json
 import logging
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from http import HTTPStatus
 from typing import Any, List, Optional, Tuple, Type, Union
 
@@ -37,9 +39,13 @@ def empty_response(status_code=HTTPStatus.OK.value):
     return resp
 
 
-def response(body: Union[object, List[object]], status_code=HTTPStatus.OK.value):
+def response(
+    body: Union[object, List[object]],
+    status_code=HTTPStatus.OK.value,
+    headers: Optional[dict] = None,
+):
     resp = {
-        "headers": cors_headers,
+        "headers": {**cors_headers, **headers} if headers else cors_headers,
         "statusCode": status_code,
         "body": json.dumps(body),
     }
@@ -49,7 +55,7 @@ def response(body: Union[object, List[object]], status_code=HTTPStatus.OK.value)
 def error_response(msg, status_code=HTTPStatus.BAD_REQUEST.value):
     err = ErrorContent(message=msg, status=status_code)
     resp = ErrorResponse(error=err)
-    return response(resp, status_code)
+    return response(asdict(resp), status_code)
 
 
 def unauthorized_response():
@@ -76,6 +82,36 @@ def parse_body(event: dict) -> Tuple[Optional[dict], Any]:
     return body, None
 
 
+def get_header(event: dict, name: str) -> Optional[str]:
+    headers = event.get("headers") or {}
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def parse_binary_body(event: dict) -> Tuple[Optional[bytes], Any]:
+    if "body" not in event or event["body"] is None:
+        logger.error("Invalid body in event: %s", event)
+        return None, error_response("No data provided", HTTPStatus.BAD_REQUEST.value)
+
+    body = event["body"]
+    try:
+        if event.get("isBase64Encoded"):
+            body = base64.b64decode(body)
+        elif isinstance(body, str):
+            body = body.encode("latin-1")
+    except (binascii.Error, UnicodeEncodeError) as e:
+        logger.exception(e)
+        return None, error_response(
+            f"Request failed to decode binary body: {str(e)}",
+            HTTPStatus.BAD_REQUEST.value,
+        )
+
+    return body, None
+
+
 def parse_request(event: dict, model: Type[object], field: str = "body"):
     if field not in event or event[field] is None:
         logger.error("Invalid body in event: %s", event)
@@ -0,0 +1,62 @@
+"""Sign sketches stored inline with bucket entries
+
+A sketch is the sign bits of a vector projected onto sketch_bits extra
+random planes, packed into sketch_bits / 8 bytes. The Hamming distance
+between two sketches estimates the angle between their vectors, so search
+can rank every candidate from the bucket items alone and only fetch the
+vectors of the best few.
+
+- string id buckets store "<hex sketch>|<vector id>" set members
+- int_ids buckets store (internal id, sketch) postings records, see
+  whiplash.postings
+"""
+
+import numpy as np
+
+SKETCH_SEPARATOR = "|"
+
+# Set bits of every byte value
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint16)
+
+
+def compute_sketches(matrix: np.ndarray, sketch_planes: np.ndarray) -> np.ndarray:
+    """Sketch every row of a (N, n_features) matrix, one uint8 row each"""
+    return np.packbits(np.dot(np.atleast_2d(matrix), sketch_planes) >= 0, axis=1)
+
+
+def sketch_entries(ids: list[str], sketches: np.ndarray) -> list[str]:
+    """Bucket set members carrying each id's sketch"""
+    return [
+        f"{sketch.tobytes().hex()}{SKETCH_SEPARATOR}{vector_id}"
+        for vector_id, sketch in zip(ids, sketches)
+    ]
+
+
+def parse_sketch_entries(entries: list[str], sketch_bytes: int) -> tuple:
+    """Split bucket set members into (ids, (N, sketch_bytes) uint8 sketches)"""
+    ids = []
+    hex_sketches = []
+    for entry in entries:
+        hex_sketch, _, vector_id = entry.partition(SKETCH_SEPARATOR)
+        hex_sketches.append(hex_sketch)
+        ids.append(vector_id)
+    sketches = np.frombuffer(bytes.fromhex("".join(hex_sketches)), dtype=np.uint8)
+    return ids, sketches.reshape(len(ids), sketch_bytes)
+
+
+def sketch_postings(internal_ids: list[int], sketches: np.ndarray) -> list[int]:
+    """Pack each internal id with its sketch into one int, id in the low 32 bits"""
+    return [
+        internal_id | int.from_bytes(sketch.tobytes(), "little") << 32
+        for internal_id, sketch in zip(internal_ids, sketches)
+    ]
+
+
+def hamming_distances(query_sketch: np.ndarray, sketches: np.ndarray) -> np.ndarray:
+    """Differing bits between the query sketch and every row of sketches"""
+    return POPCOUNT[np.bitwise_xor(sketches, query_sketch)].sum(axis=1)
+
+
+def sketch_order(query_sketch: np.ndarray, sketches: np.ndarray) -> np.ndarray:
+    """Indices of sketches from nearest to farthest from the query sketch"""
+    return np.argsort(hamming_distances(query_sketch, sketches), kind="stable")
@@ -0,0 +1,124 @@
+"""Collection snapshots for export, restore and cloning
+
+A snapshot is a directory of:
+
+- config.json: the collection settings and the number of vectors
+- planes.npz: the hashing planes, sketch planes and PQ codebooks
+- ids.jsonl: one JSON string vector id per line
+- vectors.f32: the vectors as a raw little-endian float32 (N, n_features)
+  matrix, row i belonging to line i of ids.jsonl, which np.memmap opens
+  without reading it
+
+Buckets are not stored. They only depend on the vectors and the planes, so
+a restore rebuilds them by inserting the vectors again, which keeps them
+consistent with the vectors however the collection was written to during
+the export.
+"""
+
+import json
+import os
+from itertools import islice
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from whiplash.collection_config import CollectionConfig
+
+SNAPSHOT_VERSION = 1
+CONFIG_FILE = "config.json"
+PLANES_FILE = "planes.npz"
+IDS_FILE = "ids.jsonl"
+VECTORS_FILE = "vectors.f32"
+VECTOR_DTYPE = np.dtype("<f4")
+
+Chunk = tuple[list[str], np.ndarray]
+
+
+def write_snapshot(path: str, config: CollectionConfig, chunks: Iterable[Chunk]) -> int:
+    """Stream chunks of (ids, matrix) into a snapshot directory
+
+    Returns the number of vectors written.
+    """
+    os.makedirs(path, exist_ok=True)
+    count = 0
+    with open(os.path.join(path, IDS_FILE), "w") as ids_file, open(
+        os.path.join(path, VECTORS_FILE), "wb"
+    ) as vectors_file:
+        for ids, matrix in chunks:
+            for vector_id in ids:
+                ids_file.write(json.dumps(vector_id) + "\n")
+            vectors_file.write(np.ascontiguousarray(matrix, dtype=VECTOR_DTYPE).data)
+            count += len(ids)
+
+    arrays = {
+        f"plane_{plane_id}": plane
+        for plane_id, plane in (config.uniform_planes or {}).items()
+    }
+    if config.sketch_planes is not None:
+        arrays["sketch_planes"] = config.sketch_planes
+    if config.pq_codebooks is not None:
+        arrays["pq_codebooks"] = config.pq_codebooks
+    np.savez(os.path.join(path, PLANES_FILE), **arrays)
+    # Written last, so a snapshot with a config is complete
+    with open(os.path.join(path, CONFIG_FILE), "w") as file:
+        json.dump(
+            {
+                "version": SNAPSHOT_VERSION,
+                "vectors": count,
+                **config.to_dict(),
+                "normalized": config.normalized,
+            },
+            file,
+            indent=2,
+        )
+    return count
+
+
+def read_config(path: str) -> tuple[CollectionConfig, int]:
+    """The collection config and vector count of a snapshot"""
+    with open(os.path.join(path, CONFIG_FILE)) as file:
+        data = json.load(file)
+    # The snapshot format version, not the version of the exported config
+    version = data.pop("version", None)
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version: {version}")
+    with np.load(os.path.join(path, PLANES_FILE)) as arrays:
+        data["uniform_planes"] = {
+            name[len("plane_") :]: arrays[name].tobytes()
+            for name in arrays.files
+            if name.startswith("plane_")
+        }
+        for name in ("sketch_planes", "pq_codebooks"):
+            if name in arrays.files:
+                data[name] = arrays[name].tobytes()
+    return CollectionConfig.from_dict(data), int(data["vectors"])
+
+
+def read_vectors(path: str) -> tuple[list[str], np.ndarray]:
+    """All ids of a snapshot and its memory-mapped vector matrix"""
+    config, count = read_config(path)
+    with open(os.path.join(path, IDS_FILE)) as file:
+        ids = [json.loads(line) for line in file]
+    return ids, _matrix(path, config, count)
+
+
+def _matrix(path: str, config: CollectionConfig, count: int) -> np.ndarray:
+    if count == 0:
+        return np.empty((0, config.n_features), dtype=VECTOR_DTYPE)
+    return np.memmap(
+        os.path.join(path, VECTORS_FILE),
+        dtype=VECTOR_DTYPE,
+        mode="r",
+        shape=(count, config.n_features),
+    )
+
+
+def read_chunks(path: str, chunk_size: int) -> Iterator[Chunk]:
+    """Chunks of (ids, float32 matrix) of a snapshot, read as they are needed"""
+    config, count = read_config(path)
+    matrix = _matrix(path, config, count)
+    with open(os.path.join(path, IDS_FILE)) as file:
+        lines = (json.loads(line) for line in file)
+        for offset in range(0, count, chunk_size):
+            ids = list(islice(lines, chunk_size))
+            yield ids, np.array(matrix[offset : offset + len(ids)])
@@ -1,13 +1,213 @@
 # -*- coding: utf-8 -*-
 
-from typing import Optional
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterator, Optional
 
 import boto3
+from boto3.dynamodb.table import BatchWriter
 
 from whiplash.dynamo_util import clean_item
 
+BATCH_WRITE_SIZE = 25
+BATCH_READ_SIZE = 100
+MAX_WRITE_RETRIES = int(os.environ.get("MAX_WRITE_RETRIES", 8))
+MAX_READ_RETRIES = int(os.environ.get("MAX_READ_RETRIES", 5))
+MAX_READ_WORKERS = int(os.environ.get("MAX_READ_WORKERS", 8))
+MAX_WRITE_WORKERS = int(os.environ.get("MAX_WRITE_WORKERS", 8))
 
-class DynamoStorage:
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchReadStats:
+    """Bookkeeping for a batch read, so throttled reads do not go unnoticed"""
+
+    requested: int = 0
+    retried: int = 0
+    dropped: int = 0
+
+    def merge(self, other: "BatchReadStats") -> None:
+        self.requested += other.requested
+        self.retried += other.retried
+        self.dropped += other.dropped
+
+
+class Table(ABC):
+    """Key-value table interface the collections are built on
+
+    Items are dicts keyed by their "id" attribute. Set columns hold Python
+    sets, binary columns hold bytes. The default conditional writes and
+    counters read then write, so they are not atomic; backends override
+    them where they can.
+    """
+
+    table_name: str
+    pk: str = "id"
+
+    @abstractmethod
+    def exists(self) -> bool:
+        """Check if the table exists"""
+
+    @abstractmethod
+    def create_table(self):
+        """Create the table"""
+
+    @abstractmethod
+    def put(self, item: dict):
+        """Store an item, replacing any item with the same id"""
+
+    def put_bulk(self, items: list[dict]):
+        """Store multiple items"""
+        for item in items:
+            self.put(item)
+
+    def put_if_absent(self, item: dict) -> bool:
+        """Store an item unless one with the same id exists, returning if it was stored"""
+        if self.get(item[self.pk]) is not None:
+            return False
+        self.put(item)
+        return True
+
+    def put_bulk_if_absent(self, items: list[dict]) -> list[bool]:
+        """Store each item unless one with its id exists, returning which were stored"""
+        return [self.put_if_absent(item) for item in items]
+
+    def put_if_version(self, item: dict, version: int) -> bool:
+        """Replace an item only if its stored "version" is still version
+
+        A missing item or version attribute counts as version 0. Returns
+        False, without writing, when another writer got there first.
+        """
+        stored = self.get(item[self.pk]) or {}
+        if int(stored.get("version", 0)) != version:
+            return False
+        self.put(item)
+        return True
+
+    def update_column(self, item_id, column_name, new_val):
+        """Add a value to a set column, creating the item if needed"""
+        self.update_column_bulk(item_id, column_name, {new_val})
+
+    @abstractmethod
+    def update_column_bulk(self, item_id, column_name, new_vals: set):
+        """Add multiple values to a set column, creating the item if needed"""
+
+    def update_column_bulk_capped(
+        self, item_id, column_name, new_vals: set, max_size: int
+    ) -> bool:
+        """Add values to a set column unless it already holds max_size values
+
+        Returns False, without writing, when the set is full.
+        """
+        item = self.get(item_id)
+        if item and len(item.get(column_name, ())) >= max_size:
+            return False
+        self.update_column_bulk(item_id, column_name, new_vals)
+        return True
+
+    def append_binary_capped(
+        self, item_id, column_name, data: bytes, count: int, max_size: int
+    ) -> bool:
+        """Append a binary chunk of count values to a list column, up to max_size
+
+        The number of values is kept in a "<column_name>_count" column.
+        Returns False, without writing, when that count reached max_size.
+        """
+        count_column = f"{column_name}_count"
+        item = self.get(item_id) or {self.pk: item_id}
+        if item.get(count_column, 0) >= max_size:
+            return False
+        item[column_name] = list(item.get(column_name, [])) + [data]
+        item[count_column] = item.get(count_column, 0) + count
+        self.put(item)
+        return True
+
+    def increment_column(self, item_id, column_name, amount: int = 1) -> int:
+        """Add to a number column, creating it from 0, and return the new value"""
+        item = self.get(item_id) or {self.pk: item_id}
+        item[column_name] = int(item.get(column_name, 0)) + amount
+        self.put(item)
+        return item[column_name]
+
+    @abstractmethod
+    def get(self, item_id) -> Optional[dict]:
+        """Retrieve an item by id, or None if not found"""
+
+    def get_batch(self, item_ids: list[str]) -> list[dict]:
+        """Retrieve multiple items by id, skipping missing ones"""
+        items, _ = self.get_bulk_with_stats(item_ids)
+        return items
+
+    def get_bulk(self, item_ids: list[str]) -> list[dict]:
+        """Retrieve multiple items by id, skipping missing ones"""
+        items, _ = self.get_bulk_with_stats(item_ids)
+        return items
+
+    def get_bulk_with_stats(
+        self, item_ids: list[str]
+    ) -> tuple[list[dict], BatchReadStats]:
+        """Retrieve multiple items by id along with retry/drop counts"""
+        unique_ids = list(dict.fromkeys(item_ids))
+        items = [self.get(item_id) for item_id in unique_ids]
+        return [item for item in items if item is not None], BatchReadStats(
+            requested=len(unique_ids)
+        )
+
+    @abstractmethod
+    def delete(self, item_id):
+        """Delete an item by id"""
+
+    @abstractmethod
+    def dump(self) -> list[dict]:
+        """Return every item in the table"""
+
+    def scan_pages(self, segments: int = 1) -> Iterator[list[dict]]:
+        """Iterate over every item in the table, one page at a time
+
+        Backends that can scan in parallel read segments concurrently, in
+        which case pages arrive in no particular order.
+        """
+        yield self.dump()
+
+    def scan_after(
+        self, cursor: Optional[str], limit: int
+    ) -> tuple[list[dict], Optional[str]]:
+        """Read up to limit items following the cursor of a previous call
+
+        Start with a None cursor. Returns the items and the cursor to pass
+        next, None once the table is exhausted. Cursors are item ids, so
+        they can be saved and a scan resumed by another process.
+        """
+        items = sorted(self.dump(), key=lambda item: item[self.pk])
+        if cursor is not None:
+            items = [item for item in items if item[self.pk] > cursor]
+        page = items[:limit]
+        next_cursor = page[-1][self.pk] if len(items) > limit else None
+        return page, next_cursor
+
+    def scan(self, segments: int = 1) -> Iterator[dict]:
+        """Iterate over every item in the table without loading it all"""
+        for page in self.scan_pages(segments):
+            yield from page
+
+
+class Storage(ABC):
+    """Factory for the tables of a storage backend"""
+
+    @abstractmethod
+    def get_table(self, table_name: str) -> Table:
+        """Get a Table for the specified table name"""
+
+
+class DynamoStorage(Storage):
     def __init__(self, region_name=None):
         self.region_name = region_name
         if self.region_name:
@@ -24,13 +224,22 @@ class DynamoStorage:
         return DynamoTable(table_name, self.dynamodb)
 
 
-class DynamoTable:
+class DynamoTable(Table):
     def __init__(self, table_name, dynamodb):
         self.table_name = table_name
         self.table = dynamodb.Table(self.table_name)
         self.dynamodb = dynamodb
         self.pk = "id"
 
+    @property
+    def client(self):
+        """The resource's low-level client, every call goes through it
+
+        Resources are not thread safe, their clients are, so one table can serve
+        the threads of an executor.
+        """
+        return self.dynamodb.meta.client
+
     def exists(self):
         """
         Check if the DynamoDB table exists.
@@ -65,7 +274,89 @@ class DynamoTable:
         Store an item in the DynamoDB table.
         :param item: Dictionary representing the item to be stored.
         """
-        self.table.put_item(Item=item)
+        self.client.put_item(TableName=self.table_name, Item=item)
+
+    def _put_conditional(self, item: dict, **condition) -> bool:
+        client = self.client
+        try:
+            client.put_item(TableName=self.table_name, Item=item, **condition)
+            return True
+        except client.exceptions.ConditionalCheckFailedException:
+            return False
+
+    def put_if_absent(self, item: dict) -> bool:
+        """
+        Store an item unless one with the same key exists.
+        :param item: Dictionary representing the item to be stored.
+        :return: False if an item with the key was already stored.
+        """
+        return self._put_conditional(
+            item, ConditionExpression=f"attribute_not_exists({self.pk})"
+        )
+
+    def put_bulk_if_absent(self, items: list[dict]) -> list[bool]:
+        """
+        Store each item unless one with its key exists.
+        Conditional writes cannot be batched, so they run on a bounded thread pool.
+        :param items: List of dictionaries representing the items to be stored.
+        :return: Whether each item was stored, in the order of items.
+        """
+        if len(items) <= 1:
+            return [self.put_if_absent(item) for item in items]
+        with ThreadPoolExecutor(
+            max_workers=min(MAX_WRITE_WORKERS, len(items))
+        ) as executor:
+            return list(executor.map(self.put_if_absent, items))
+
+    def put_if_version(self, item: dict, version: int) -> bool:
+        """
+        Replace an item only if its stored version attribute is still version.
+        A missing item or version attribute counts as version 0.
+        :param item: Dictionary representing the item to be stored.
+        :param version: The version the stored item must have.
+        :return: False if another writer changed the item first.
+        """
+        condition = "#version = :version"
+        if version == 0:
+            condition = f"attribute_not_exists(#version) OR {condition}"
+        return self._put_conditional(
+            item,
+            ConditionExpression=condition,
+            ExpressionAttributeNames={"#version": "version"},
+            ExpressionAttributeValues={":version": version},
+        )
+
+    def put_bulk(self, items: list[dict]):
+        """
+        Store multiple items in the DynamoDB table.
+        Items are written with batch_write_item in chunks of 25, retrying any
+        UnprocessedItems with exponential backoff.
+        :param items: A list of dictionaries representing the items to be stored.
+        """
+        # A single batch cannot contain the same key twice, last write wins
+        unique_items = list({item[self.pk]: item for item in items}.values())
+        for i in range(0, len(unique_items), BATCH_WRITE_SIZE):
+            requests = [
+                {"PutRequest": {"Item": item}}
+                for item in unique_items[i : i + BATCH_WRITE_SIZE]
+            ]
+            self._batch_write(requests)
+
+    def _batch_write(self, requests: list[dict]):
+        attempt = 0
+        while requests:
+            response = self.client.batch_write_item(
+                RequestItems={self.table_name: requests}
+            )
+            requests = response.get("UnprocessedItems", {}).get(self.table_name, [])
+            if not requests:
+                return
+            attempt += 1
+            if attempt > MAX_WRITE_RETRIES:
+                raise RuntimeError(
+                    f"Failed to write {len(requests)} items to {self.table_name}"
+                )
+            time.sleep(min(0.05 * 2**attempt, 2))
 
     def update_column(self, item_id, column_name, new_val):
         """
@@ -75,7 +366,8 @@ class DynamoTable:
         :param new_val: The new value to set for the column.
         """
         try:
-            self.table.update_item(
+            self.client.update_item(
+                TableName=self.table_name,
                 Key={self.pk: item_id},
                 UpdateExpression=f"ADD {column_name} :val",
                 ExpressionAttributeValues={":val": set([new_val])},
@@ -85,8 +377,106 @@ class DynamoTable:
             # If the item does not exist, create it
             self.put({self.pk: item_id, column_name: set([new_val])})
 
+    def update_column_bulk(self, item_id, column_name, new_vals: set):
+        """
+        Add multiple values to a set column of an item in a single update.
+        The item is created if it does not exist yet.
+        :param item_id: The unique ID of the item to update.
+        :param column_name: The name of the set column to add to.
+        :param new_vals: The values to add to the set.
+        """
+        if not new_vals:
+            return
+        self.client.update_item(
+            TableName=self.table_name,
+            Key={self.pk: item_id},
+            UpdateExpression=f"ADD {column_name} :val",
+            ExpressionAttributeValues={":val": set(new_vals)},
+        )
+
+    def update_column_bulk_capped(
+        self, item_id, column_name, new_vals: set, max_size: int
+    ) -> bool:
+        """
+        Add multiple values to a set column unless it already holds max_size values.
+        The size check and the ADD are a single conditional update.
+        :param item_id: The unique ID of the item to update.
+        :param column_name: The name of the set column to add to.
+        :param new_vals: The values to add to the set.
+        :param max_size: The set size at which no more values are added.
+        :return: False if the set was full and nothing was written.
+        """
+        if not new_vals:
+            return True
+        try:
+            self.client.update_item(
+                TableName=self.table_name,
+                Key={self.pk: item_id},
+                UpdateExpression=f"ADD {column_name} :val",
+                ConditionExpression=f"attribute_not_exists({column_name}) "
+                f"OR size({column_name}) < :max_size",
+                ExpressionAttributeValues={
+                    ":val": set(new_vals),
+                    ":max_size": max_size,
+                },
+            )
+        except self.dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+            return False
+        return True
+
+    def append_binary_capped(
+        self, item_id, column_name, data: bytes, count: int, max_size: int
+    ) -> bool:
+        """
+        Append a binary chunk to a list column unless it already holds max_size values.
+        The value count is kept in "<column_name>_count", checked and updated atomically.
+        :param item_id: The unique ID of the item to update.
+        :param column_name: The name of the list column to append to.
+        :param data: The binary chunk to append.
+        :param count: The number of values in the chunk.
+        :param max_size: The value count at which no more chunks are appended.
+        :return: False if the list was full and nothing was written.
+        """
+        count_column = f"{column_name}_count"
+        try:
+            self.client.update_item(
+                TableName=self.table_name,
+                Key={self.pk: item_id},
+                UpdateExpression=f"SET {column_name} = list_append("
+                f"if_not_exists({column_name}, :empty), :chunk) "
+                f"ADD {count_column} :count",
+                ConditionExpression=f"attribute_not_exists({count_column}) "
+                f"OR {count_column} < :max_size",
+                ExpressionAttributeValues={
+                    ":empty": [],
+                    ":chunk": [data],
+                    ":count": count,
+                    ":max_size": max_size,
+                },
+            )
+        except self.dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+            return False
+        return True
+
+    def increment_column(self, item_id, column_name, amount: int = 1) -> int:
+        """
+        Atomically add to a number column, creating the item if needed.
+        :param item_id: The unique ID of the item to update.
+        :param column_name: The name of the number column.
+        :param amount: The amount to add.
+        :return: The new value of the column.
+        """
+        response = self.client.update_item(
+            TableName=self.table_name,
+            Key={self.pk: item_id},
+            UpdateExpression=f"ADD {column_name} :amount",
+            ExpressionAttributeValues={":amount": amount},
+            ReturnValues="UPDATED_NEW",
+        )
+        return int(response["Attributes"][column_name])
+
     def upsert_items_set_bulk(self, item_ids, column_name, new_val):
-        with self.table.batch_writer() as batch:
+        with BatchWriter(self.table_name, self.client) as batch:
             # Update the item or create a new item with the primary key and set the new IDs
             for item_id in item_ids:
                 batch.put_item(
@@ -102,26 +492,20 @@ class DynamoTable:
         :param item_id: The unique ID of the item to retrieve.
         :return: Dictionary representing the retrieved item, or None if not found.
         """
-        response = self.table.get_item(Key={"id": item_id})
+        response = self.client.get_item(TableName=self.table_name, Key={"id": item_id})
         if "Item" not in response or not response["Item"]:
             return None
         return clean_item(response.get("Item"))
 
     def get_batch(self, item_ids: list[str]) -> list[dict]:
         """
-        Retrieve multiple items from the DynamoDB table by their IDs.
+        Retrieve up to 100 items from the DynamoDB table by their IDs.
+        Unprocessed keys are retried with jittered backoff.
         :param item_ids: A list of unique IDs of the items to retrieve.
         :return: A list of dictionaries representing the retrieved items.
         """
-        response = self.dynamodb.batch_get_item(
-            RequestItems={
-                self.table_name: {
-                    "Keys": [{"id": item_id} for item_id in set(item_ids)],
-                }
-            }
-        )
-        items = response.get("Responses", {}).get(self.table_name, [])
-        return [clean_item(item) for item in items]
+        items, _ = self._get_chunk(list(dict.fromkeys(item_ids)))
+        return items
 
     def get_bulk(self, item_ids: list[str]) -> list[dict]:
         """
@@ -130,18 +514,70 @@ class DynamoTable:
         :param item_ids: A list of unique IDs of the items to retrieve.
         :return: A list of dictionaries representing the retrieved items.
         """
+        items, _ = self.get_bulk_with_stats(item_ids)
+        return items
+
+    def get_bulk_with_stats(
+        self, item_ids: list[str]
+    ) -> tuple[list[dict], BatchReadStats]:
+        """
+        Retrieve multiple items from the DynamoDB table by their IDs.
+        Chunks of 100 keys are read concurrently from a bounded thread pool.
+        :param item_ids: A list of unique IDs of the items to retrieve.
+        :return: The retrieved items and the retry/drop counts of the read.
+        """
+        unique_ids = list(dict.fromkeys(item_ids))
+        chunks = [
+            unique_ids[i : i + BATCH_READ_SIZE]
+            for i in range(0, len(unique_ids), BATCH_READ_SIZE)
+        ]
+        stats = BatchReadStats()
         results = []
-        for i in range(0, len(item_ids), 100):
-            batch = item_ids[i : i + 100]
-            results.extend(self.get_batch(batch))
-        return [clean_item(item) for item in results]
+        if len(chunks) <= 1:
+            chunk_results = [self._get_chunk(chunk) for chunk in chunks]
+        else:
+            with ThreadPoolExecutor(
+                max_workers=min(MAX_READ_WORKERS, len(chunks))
+            ) as executor:
+                chunk_results = list(executor.map(self._get_chunk, chunks))
+        for items, chunk_stats in chunk_results:
+            results.extend(items)
+            stats.merge(chunk_stats)
+
+        if stats.dropped:
+            logger.warning(
+                f"Dropped {stats.dropped} of {stats.requested} keys reading {self.table_name}"
+            )
+        return results, stats
+
+    def _get_chunk(self, item_ids: list[str]) -> tuple[list[dict], BatchReadStats]:
+        client = self.client
+        stats = BatchReadStats(requested=len(item_ids))
+        request = {"Keys": [{self.pk: item_id} for item_id in item_ids]}
+        items = []
+        attempt = 0
+        while request and request.get("Keys"):
+            response = client.batch_get_item(RequestItems={self.table_name: request})
+            for item in response.get("Responses", {}).get(self.table_name, []):
+                items.append(clean_item(item))
+            request = response.get("UnprocessedKeys", {}).get(self.table_name)
+            if not request or not request.get("Keys"):
+                break
+            if attempt >= MAX_READ_RETRIES:
+                stats.dropped += len(request["Keys"])
+                break
+            stats.retried += len(request["Keys"])
+            attempt += 1
+            # Full jitter backoff to spread retries under throttling
+            time.sleep(random.uniform(0, min(0.05 * 2**attempt, 1)))
+        return items, stats
 
     def delete(self, item_id):
         """
         Delete an item from the DynamoDB table by its ID.
         :param item_id: The unique ID of the item to delete.
         """
-        self.table.delete_item(Key={"id": item_id})
+        self.client.delete_item(TableName=self.table_name, Key={"id": item_id})
 
     def update(self, item_id, update_expression, expression_attribute_values):
         """
@@ -150,7 +586,8 @@ class DynamoTable:
         :param update_expression: The update expression for the update operation.
         :param expression_attribute_values: A dictionary of attribute values used in the update expression.
         """
-        self.table.update_item(
+        self.client.update_item(
+            TableName=self.table_name,
             Key={"id": item_id},
             UpdateExpression=update_expression,
             ExpressionAttributeValues=expression_attribute_values,
@@ -166,7 +603,8 @@ class DynamoTable:
         if not expression_attribute_values:
             expression_attribute_values = {}
 
-        response = self.table.query(
+        response = self.client.query(
+            TableName=self.table_name,
             KeyConditionExpression=key_condition_expression,
             ExpressionAttributeValues=expression_attribute_values,
         )
@@ -180,9 +618,91 @@ class DynamoTable:
         Perform a scan on the DynamoDB table.
         :return: A list of all items in the table.
         """
+        return [item for page in self.scan_pages() for item in page]
 
-        response = self.table.scan()
+    def scan_pages(self, segments: int = 1) -> Iterator[list[dict]]:
+        """
+        Scan the DynamoDB table, following LastEvaluatedKey past the 1MB page limit.
+        With several segments, each is scanned on its own thread and pages are
+        yielded as they arrive, holding at most two pages per segment.
+        :param segments: The number of parallel scan segments.
+        :return: An iterator over pages of items.
+        """
+        if segments <= 1:
+            yield from self._scan_segment()
+            return
 
-        items = response.get("Items", [])
+        pages: queue.Queue = queue.Queue(maxsize=2 * segments)
+        stop = threading.Event()
+        done = object()
 
-        return [clean_item(item) for item in items]
+        def put(value) -> bool:
+            while not stop.is_set():
+                try:
+                    pages.put(value, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def scan(segment: int) -> None:
+            try:
+                for page in self._scan_segment(segment, segments):
+                    if not put(page):
+                        return
+            except Exception as e:
+                put(e)
+            put(done)
+
+        threads = [
+            threading.Thread(target=scan, args=(segment,), daemon=True)
+            for segment in range(segments)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            remaining = segments
+            while remaining:
+                page = pages.get()
+                if page is done:
+                    remaining -= 1
+                elif isinstance(page, Exception):
+                    raise page
+                else:
+                    yield page
+        finally:
+            # Stop the other segments when the caller stops early or one fails
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def scan_after(
+        self, cursor: Optional[str], limit: int
+    ) -> tuple[list[dict], Optional[str]]:
+        """
+        Scan one page of up to limit items, resuming after a saved cursor.
+        :param cursor: The cursor returned by the previous call, None to start.
+        :param limit: The most items to read.
+        :return: The items and the next cursor, None at the end of the table.
+        """
+        kwargs = {"TableName": self.table_name, "Limit": limit}
+        if cursor is not None:
+            kwargs["ExclusiveStartKey"] = {self.pk: cursor}
+        response = self.client.scan(**kwargs)
+        last_key = response.get("LastEvaluatedKey")
+        items = [clean_item(item) for item in response.get("Items", [])]
+        return items, last_key[self.pk] if last_key else None
+
+    def _scan_segment(
+        self, segment: int = 0, total_segments: int = 1
+    ) -> Iterator[list[dict]]:
+        client = self.client
+        kwargs = {"TableName": self.table_name}
+        if total_segments > 1:
+            kwargs.update(Segment=segment, TotalSegments=total_segments)
+        while True:
+            response = client.scan(**kwargs)
+            yield [clean_item(item) for item in response.get("Items", [])]
+            if "LastEvaluatedKey" not in response:
+                break
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
@@ -1,15 +1,24 @@
 from dataclasses import dataclass
+from typing import Optional
 
 import numpy as np
 
+from whiplash.encoding import encode_vector
+
+
+def _encode(vector: np.ndarray, encoding: str):
+    if encoding == "base64":
+        return encode_vector(np.asarray(vector, dtype=np.float32))
+    return vector.tolist()
+
 
 @dataclass
 class Vector:
     id: str
     vector: np.ndarray
 
-    def to_dict(self):
-        return {"id": self.id, "vector": self.vector.tolist()}
+    def to_dict(self, encoding: str = "json"):
+        return {"id": self.id, "vector": _encode(self.vector, encoding)}
 
     def to_dynamo(self):
         return {"id": self.id, "vector": self.vector.astype(np.float32).tobytes()}
@@ -24,11 +33,18 @@ class Vector:
 @dataclass
 class CompVector:
     id: str
-    vector: np.ndarray
+    # None when the search did not ask for vectors
+    vector: Optional[np.ndarray]
     dist: float
 
-    def to_dict(self):
-        return {"id": self.id, "vector": self.vector.tolist(), "dist": self.dist}
+    def to_dict(self, encoding: str = "json"):
+        if self.vector is None:
+            return {"id": self.id, "dist": self.dist}
+        return {
+            "id": self.id,
+            "vector": _encode(self.vector, encoding),
+            "dist": self.dist,
+        }
 
     def __repr__(self) -> str:
         return f"{self.id}: {round(self.dist, 4)}"
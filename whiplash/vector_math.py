@@ -1,12 +1,13 @@
-from decimal import Decimal
-
 import numpy as np
 from numpy.linalg import norm
 
+METRICS = ("cosine", "dot", "l2")
+
 
 def cosine_similarity_bulk(vector1, vectors_list, k=1):
-    distances = norm(np.array(vectors_list) - np.array(vector1), axis=1)
-    closest_indices = np.argsort(distances)[:k]
+    closest_indices, _ = top_k_scores(
+        np.asarray(vector1), np.asarray(vectors_list), k, metric="cosine"
+    )
     return closest_indices
 
 
@@ -18,3 +19,84 @@ def cosine_similarity(vec1, vec2) -> float:
     if norm1 == 0 or norm2 == 0:
         return 0
     return float(np.dot(vec1, vec2) / (norm1 * norm2))
+
+
+def normalize_bulk(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize every row of matrix, leaving zero rows untouched"""
+    norms = norm(matrix, axis=-1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms != 0)
+
+
+def score_bulk(
+    query: np.ndarray, matrix: np.ndarray, metric: str = "cosine"
+) -> np.ndarray:
+    """Score every row of matrix against query in one vectorized pass
+
+    cosine and dot are similarities (higher is closer), l2 is a distance
+    (lower is closer).
+    """
+    if metric == "dot":
+        return matrix @ query
+    if metric == "l2":
+        return norm(matrix - query, axis=1)
+    if metric == "cosine":
+        query_norm = norm(query)
+        denom = norm(matrix, axis=1) * query_norm
+        dots = matrix @ query
+        scores = np.zeros_like(dots)
+        np.divide(dots, denom, out=scores, where=denom != 0)
+        if query_norm == 0:
+            # Match cosine_similarity: two zero vectors are identical
+            scores[denom == 0] = 1
+        return scores
+    raise ValueError(f"Unknown metric: {metric}")
+
+
+def score_many(
+    queries: np.ndarray, matrix: np.ndarray, metric: str = "cosine"
+) -> np.ndarray:
+    """Score every row of matrix against every query, one row per query
+
+    Every metric is computed from the single queries @ matrix.T product.
+    """
+    dots = queries @ matrix.T
+    if metric == "dot":
+        return dots
+    if metric == "l2":
+        squared = (
+            (queries**2).sum(axis=1)[:, np.newaxis] - 2 * dots + (matrix**2).sum(axis=1)
+        )
+        return np.sqrt(np.maximum(squared, 0))
+    if metric == "cosine":
+        query_norms = norm(queries, axis=1)[:, np.newaxis]
+        denom = query_norms * norm(matrix, axis=1)
+        scores = np.zeros_like(dots)
+        np.divide(dots, denom, out=scores, where=denom != 0)
+        # Match score_bulk for zero queries
+        scores[(denom == 0) & (query_norms == 0)] = 1
+        return scores
+    raise ValueError(f"Unknown metric: {metric}")
+
+
+def top_k_scores(
+    query: np.ndarray, matrix: np.ndarray, k: int, metric: str = "cosine"
+) -> tuple[np.ndarray, np.ndarray]:
+    """Find the k closest rows of matrix, returning (indices, scores) best first"""
+    return top_k_of_scores(score_bulk(query, matrix, metric), k, metric)
+
+
+def top_k_of_scores(
+    scores: np.ndarray, k: int, metric: str = "cosine"
+) -> tuple[np.ndarray, np.ndarray]:
+    """Find the k best of precomputed scores, returning (indices, scores)"""
+    # Rank on a "higher is better" key so argpartition works for every metric
+    keys = -scores if metric == "l2" else scores
+    k = min(k, len(keys))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=scores.dtype)
+    if k < len(keys):
+        indices = np.argpartition(-keys, k - 1)[:k]
+    else:
+        indices = np.arange(len(keys))
+    indices = indices[np.argsort(-keys[indices], kind="stable")]
+    return indices, scores[indices]
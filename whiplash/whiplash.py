@@ -1,12 +1,18 @@
 import logging
 import time
+from dataclasses import replace
 from typing import Optional
 
+import numpy as np
 from botocore.exceptions import ClientError
 
+from whiplash import snapshot
 from whiplash.collection import Collection
 from whiplash.collection_config import CollectionConfig
-from whiplash.storage import DynamoStorage
+from whiplash.importer import IMPORT_CHUNK_SIZE
+from whiplash.pq import MIN_TRAINING_VECTORS
+from whiplash.storage import DynamoStorage, Storage
+from whiplash.vector import Vector
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -23,6 +29,7 @@ class Whiplash:
         region,
         stage,
         project_name: str = "whiplash",
+        storage: Optional[Storage] = None,
     ) -> None:
         if not isinstance(region, str):
             raise ValueError("region must be specified as a string")
@@ -34,7 +41,7 @@ class Whiplash:
         self.region = region
         self.stage = stage
         self.project_name = project_name
-        self.storage = DynamoStorage()
+        self.storage = storage if storage is not None else DynamoStorage()
         self.metadata_table = self.storage.get_table("whiplash_metadata")
 
     def __repr__(self) -> str:
@@ -42,19 +49,21 @@ class Whiplash:
 
     def setup(self):
         self.metadata_table.create_table()
-        while True:
-            try:
-                self.metadata_table.describe_table()
-                break
-            except Exception:
-                time.sleep(1)
+        while not self.metadata_table.exists():
+            time.sleep(1)
 
     def get_all_collections(self) -> list[Collection]:
         # Get all items from metadata table
         try:
             return [
-                Collection.from_dict(collection)
+                Collection.from_dict(
+                    collection,
+                    storage=self.storage,
+                    metadata_table=self.metadata_table,
+                )
                 for collection in self.metadata_table.dump()
+                # PQ codebooks are kept in metadata items of their own
+                if "n_features" in collection
             ]
         except Exception as e:
             logger.error(f"Error getting all projects: {e}")
@@ -67,11 +76,25 @@ class Whiplash:
         n_planes: int = 6,
         bit_start: int = 8,
         bit_scale_factor: (float | int) = 2,
+        metric: str = "cosine",
+        int_ids: bool = False,
+        precision: str = "float32",
+        keep_full_precision: bool = False,
+        sketch_bits: int = 0,
+        index_type: str = "lsh",
+        pq_subvectors: int = 0,
+        training_vectors: Optional[np.ndarray] = None,
     ) -> Collection:
         # Create collection in DynamoDB
         collection = self.get_collection(collection_name)
         if collection is not None:
             raise ValueError(f"Collection already exists: {collection_name}")
+        if index_type == "pq" and (
+            training_vectors is None or len(training_vectors) < MIN_TRAINING_VECTORS
+        ):
+            raise ValueError(
+                f"pq collections need at least {MIN_TRAINING_VECTORS} training_vectors"
+            )
 
         collection_config = CollectionConfig(
             collection_name,
@@ -82,12 +105,26 @@ class Whiplash:
             n_planes,
             bit_start,
             bit_scale_factor,
+            metric=metric,
+            normalized=metric == "cosine",
+            int_ids=int_ids,
+            precision=precision,
+            keep_full_precision=keep_full_precision,
+            sketch_bits=sketch_bits,
+            index_type=index_type,
+            pq_subvectors=pq_subvectors,
         )
         collection_config.create_uniform_planes()
 
         self.metadata_table.put(collection_config.to_dynamo())
-        collection = Collection(collection_config)
+        collection = Collection(
+            collection_config,
+            storage=self.storage,
+            metadata_table=self.metadata_table,
+        )
         collection.create()
+        if training_vectors is not None:
+            collection.train_pq(training_vectors)
         return collection
 
     def get_collection(self, collection_name: str) -> Optional[Collection]:
@@ -98,4 +135,45 @@ class Whiplash:
         if collection_config is None:
             return None
 
-        return Collection.from_dict(collection_config)
+        return Collection.from_dict(
+            collection_config,
+            storage=self.storage,
+            metadata_table=self.metadata_table,
+        )
+
+    def restore_collection(
+        self,
+        path: str,
+        collection_name: Optional[str] = None,
+        chunk_size: int = IMPORT_CHUNK_SIZE,
+    ) -> Collection:
+        """Create a collection from a snapshot written by Collection.export
+
+        The collection keeps the snapshot's settings, planes and codebooks,
+        under collection_name (the exported name by default) in this
+        project and stage, so a snapshot also clones a collection. Its
+        buckets are rebuilt by inserting the vectors chunk_size at a time.
+        """
+        config, _ = snapshot.read_config(path)
+        config = replace(
+            config,
+            name=collection_name or config.name,
+            region=self.region,
+            stage=self.stage,
+            project_name=self.project_name,
+        )
+        if self.get_collection(config.name) is not None:
+            raise ValueError(f"Collection already exists: {config.name}")
+
+        self.metadata_table.put(config.to_dynamo())
+        collection = Collection(
+            config,
+            storage=self.storage,
+            metadata_table=self.metadata_table,
+        )
+        collection.create()
+        if config.pq_codebooks is not None:
+            collection.save_pq_codebooks(config.pq_codebooks)
+        for ids, matrix in snapshot.read_chunks(path, chunk_size):
+            collection.insert_many([Vector(i, row) for i, row in zip(ids, matrix)])
+        return collection